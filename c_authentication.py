@@ -1,7 +1,14 @@
+import base64
+import functools
+import hashlib
+import hmac
+import json
+import secrets
+import time
 from datetime import timedelta, datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Body, Depends, FastAPI, HTTPException
 from fastapi.params import Security
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
 from jose import jwt, JWTError
@@ -19,6 +26,7 @@ from starlette import status
 SECRET_KEY = "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = 30
 
 
 # Security models
@@ -27,6 +35,8 @@ class Token(BaseModel):
     """ OAuth2 token """
     access_token: str
     token_type: str
+    # Optional: a refresh token, to get a new access token without the password
+    refresh_token: Optional[str] = None
 
 
 class TokenData(BaseModel):
@@ -34,10 +44,14 @@ class TokenData(BaseModel):
     username: Optional[str] = None
 
     # Optional: security scopes
-    scopes: List[str] = []
+    # As a bitmask, see SCOPE_BITS below
+    scopes: int = 0
 
 # hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Tune the cost on your hardware: ~250ms per verification is a common target.
+# deprecated="auto": hashes of other schemes/costs report needs_update() = True;
+# use pwd_context.verify_and_update() at login to rehash them with the current settings
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=12)
 
 
 def verify_password(plain_password, hashed_password):
@@ -52,6 +66,32 @@ def get_password_hash(password):
 
 
 
+# JWT, fast path
+# jwt.decode() is generic: it parses the header, builds a key object, looks up the algorithm... on every request.
+# With one fixed algorithm (HS256) and one key, verifying is just an HMAC of "header.payload":
+# prepare the HMAC key once, copy() it per token.
+# Compare signatures with hmac.compare_digest() (constant time), never with ==
+_hs256_key = hmac.new(SECRET_KEY.encode(), digestmod=hashlib.sha256)
+
+
+def decode_hs256(token: str) -> dict:
+    """ Verify and decode an HS256 JWT; raise JWTError like jwt.decode() """
+    try:
+        signing_input, signature = token.encode().rsplit(b".", 1)
+        header, payload = signing_input.split(b".")
+        mac = _hs256_key.copy()
+        mac.update(signing_input)
+        if not hmac.compare_digest(mac.digest(), base64.urlsafe_b64decode(signature + b"==")):
+            raise JWTError("Invalid signature")
+        # Never trust the header's "alg": an attacker sets it (e.g. "none")
+        if json.loads(base64.urlsafe_b64decode(header + b"=="))["alg"] != ALGORITHM:
+            raise JWTError("Invalid algorithm")
+        claims = json.loads(base64.urlsafe_b64decode(payload + b"=="))
+    except (ValueError, KeyError, TypeError):
+        raise JWTError("Invalid token")
+    if not isinstance(claims.get("exp"), (int, float)) or claims["exp"] < time.time():
+        raise JWTError("Expired")
+    return claims
 
 
 # App
@@ -74,6 +114,33 @@ oauth2_scheme = OAuth2PasswordBearer(
     },
 )
 
+# Scopes, fast path
+# Intern the declared scopes into bit positions: a set of scopes is then an int.
+# Tokens carry that mask ("scp": 3) instead of a list of strings,
+# and checking a route's scopes is a single AND instead of a loop of list lookups.
+SCOPE_BITS = {
+    scope: 1 << bit
+    for bit, scope in enumerate(oauth2_scheme.model.flows.password.scopes)
+}
+
+
+def scope_mask(scopes: List[str]) -> int:
+    """ Scopes -> bitmask. KeyError on an unknown scope """
+    mask = 0
+    for scope in scopes:
+        mask |= SCOPE_BITS[scope]
+    return mask
+
+
+@functools.lru_cache()
+def compile_scopes(scopes: Tuple[str, ...]) -> Tuple[int, str]:
+    """ The scopes required by a route -> (mask, WWW-Authenticate header). Computed once per route """
+    if scopes:
+        # In case of an error, we include the scopes required (if any) as a string separated by spaces.
+        # We put that string in the WWW-Authenticate header (this is part of the spec).
+        return scope_mask(list(scopes)), 'Bearer scope="{}"'.format(" ".join(scopes))
+    return 0, "Bearer"
+
 # OAuth2 was designed so that the backend or API could be independent of the server that authenticates the user.
 # But in this case, the same FastAPI application will handle the API and the authentication.
 
@@ -139,50 +206,41 @@ async def get_current_user(
         security_scopes: SecurityScopes = Depends(),
 ):
     """ Authenticate: get an OAuth2 user """
-    # Optional: security scopes stuff for the exception
-    if security_scopes.scopes:
-        # In this exception, we include the scopes required (if any) as a string separated by spaces (using scope_str).
-        # We put that string containing the scopes in in the WWW-Authenticate header (this is part of the spec).
-        authenticate_value = f'Bearer scope="{security_scopes.scope_str}"'
-    else:
-        authenticate_value = f"Bearer"
+    # Optional: security scopes required by the API operation, compiled once per route
+    # The important and "magic" thing here is that get_current_user will have a different list of scopes to check for each path operation.
+    required, authenticate_value = compile_scopes(tuple(security_scopes.scopes))
 
-    # Prepare an exception we might need
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": authenticate_value},
-    )
+    # An exception we might need. Only built when needed: most requests don't
+    def credentials_exception(detail="Could not validate credentials"):
+        return HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=detail,
+            headers={"WWW-Authenticate": authenticate_value},
+        )
 
     # Get data from the JWT token
     try:
         # Decode the token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        # payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_hs256(token)
         # Get the username
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            raise credentials_exception()
 
         # Prepare TokenData
-        token_scopes = payload.get("scopes", [])
-        token_data = TokenData(scopes=token_scopes, username=username)
+        token_data = TokenData(scopes=payload.get("scp", 0), username=username)
     except (JWTError, ValidationError):
-        raise credentials_exception
-
-    # Optional: check scopes vs API operation scopes
-    for scope in security_scopes.scopes:  # scopes required by the API operation
-        # The important and "magic" thing here is that get_current_user will have a different list of scopes to check for each path operation.
-        if scope not in token_data.scopes:  # scopes provided by the user
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Not enough permissions",
-                headers={"WWW-Authenticate": authenticate_value},
-            )
+        raise credentials_exception()
+
+    # Optional: check scopes vs API operation scopes: all the required bits must be granted
+    if token_data.scopes & required != required:
+        raise credentials_exception("Not enough permissions")
 
     # Load a user
     user = get_user(..., username=token_data.username)
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
     return user
 
 
@@ -224,6 +282,43 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+# Refresh tokens
+# With short-lived access tokens, clients would have to send the password (and pay for bcrypt) every 30 minutes.
+# Instead, login also returns an opaque refresh token; the client exchanges it for a new access token.
+# Refresh tokens are single use: each refresh returns the next one (rotation).
+# A refresh token used twice was stolen: revoke the whole family, the tokens descending from that login.
+# Store only their hash: sha256 is enough, the token is random (no need for bcrypt)
+refresh_tokens = {}  # sha256 -> {"username", "scopes", "family", "expires", "used"}
+
+
+def create_refresh_token(username: str, scopes: int = 0, family: Optional[str] = None):
+    """ Create an opaque refresh token; store its hash """
+    token = secrets.token_urlsafe(32)
+    refresh_tokens[hashlib.sha256(token.encode()).hexdigest()] = {
+        "username": username,
+        "scopes": scopes,
+        "family": family or secrets.token_hex(16),
+        "expires": datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        "used": False,
+    }
+    return token
+
+
+def rotate_refresh_token(token: str):
+    """ Spend a refresh token: return (username, scopes, next token), or None """
+    stored = refresh_tokens.get(hashlib.sha256(token.encode()).hexdigest())
+    if stored is None or stored["expires"] < datetime.utcnow():
+        return None
+    if stored["used"]:
+        # Reuse: revoke the family
+        for key in [k for k, v in refresh_tokens.items() if v["family"] == stored["family"]]:
+            del refresh_tokens[key]
+        return None
+    # With a database: UPDATE ... SET used=true WHERE token_hash=... AND NOT used, so that only one concurrent refresh wins
+    stored["used"] = True
+    next_token = create_refresh_token(stored["username"], stored["scopes"], stored["family"])
+    return stored["username"], stored["scopes"], next_token
+
 
 # OAuth2 authentication url
 @app.post("/token", response_model=Token)
@@ -233,7 +328,6 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     # Fields: (optional) client_id, client_secret (not used here)
 
     # Authenticate
-    form_data.scopes  # optional scopes
     user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -242,6 +336,13 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Optional: scopes, requested as a space-separated string; granted as a bitmask
+    # Here, granted as requested. Check what the user may be granted in a real app
+    try:
+        scopes = scope_mask(form_data.scopes)
+    except KeyError:
+        raise HTTPException(status_code=400, detail="Invalid scope")
+
     # Token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -250,6 +351,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
             # It needs to be unique across the application
             # If you plan to provide accesses to other subjects (users, articles, etc), prefix if f'user:{login}'
             "sub": user.username,
+            "scp": scopes,
         }, expires_delta=access_token_expires
     )
 
@@ -259,6 +361,30 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
         "token_type": "bearer",
         # String containing our access token
         "access_token": access_token,
+        # Optional: refresh token
+        "refresh_token": create_refresh_token(user.username, scopes),
+    }
+
+
+# Refresh: no password, no bcrypt; just a dict (or an indexed table) lookup
+# OAuth2 sends it to the same /token url, with grant_type="refresh_token" and a "refresh_token" field
+@app.post("/token/refresh", response_model=Token)
+async def refresh(refresh_token: str = Body(..., embed=True)):
+    rotated = rotate_refresh_token(refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    username, scopes, next_refresh_token = rotated
+    access_token = create_access_token(
+        data={"sub": username, "scp": scopes}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {
+        "token_type": "bearer",
+        "access_token": access_token,
+        "refresh_token": next_refresh_token,
     }
 
 
@@ -0,0 +1,43 @@
+"""Add refresh tokens
+
+Revision ID: 3f6d8b1e2c47
+Revises: 9c3e2a7b41f5
+Create Date: 2026-10-16 16:41:08.273615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3f6d8b1e2c47"
+down_revision = "9c3e2a7b41f5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "refreshtoken",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("token_hash", sa.LargeBinary(length=32), nullable=False),
+        sa.Column("family", sa.LargeBinary(length=16), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("used_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("token_hash"),
+    )
+    op.create_index(
+        op.f("ix_refreshtoken_family"), "refreshtoken", ["family"], unique=False
+    )
+    op.create_index(
+        op.f("ix_refreshtoken_user_id"), "refreshtoken", ["user_id"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_refreshtoken_user_id"), table_name="refreshtoken")
+    op.drop_index(op.f("ix_refreshtoken_family"), table_name="refreshtoken")
+    op.drop_table("refreshtoken")
@@ -0,0 +1,32 @@
+"""Add row versions
+
+Revision ID: 5b1f0c7e9a2d
+Revises: d4867f3a4c0a
+Create Date: 2026-10-16 10:12:45.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5b1f0c7e9a2d"
+down_revision = "d4867f3a4c0a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "user",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+    op.add_column(
+        "item",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_column("item", "version")
+    op.drop_column("user", "version")
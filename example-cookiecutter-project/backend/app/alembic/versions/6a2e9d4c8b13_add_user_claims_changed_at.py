@@ -0,0 +1,39 @@
+"""Add user.claims_changed_at and deleted user tombstones
+
+Revision ID: 6a2e9d4c8b13
+Revises: 3f6d8b1e2c47
+Create Date: 2026-10-16 22:52:31.604127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "6a2e9d4c8b13"
+down_revision = "3f6d8b1e2c47"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("user", sa.Column("claims_changed_at", sa.DateTime(), nullable=True))
+    op.create_index(
+        op.f("ix_user_claims_changed_at"), "user", ["claims_changed_at"], unique=False
+    )
+    op.create_table(
+        "deleteduser",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_deleteduser_deleted_at"), "deleteduser", ["deleted_at"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_deleteduser_deleted_at"), table_name="deleteduser")
+    op.drop_table("deleteduser")
+    op.drop_index(op.f("ix_user_claims_changed_at"), table_name="user")
+    op.drop_column("user", "claims_changed_at")
@@ -0,0 +1,34 @@
+"""Index items by owner, drop unused indexes
+
+Revision ID: 9c3e2a7b41f5
+Revises: 5b1f0c7e9a2d
+Create Date: 2026-10-16 14:03:27.540917
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "9c3e2a7b41f5"
+down_revision = "5b1f0c7e9a2d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_item_owner_id_id", "item", ["owner_id", "id"], unique=False)
+    # Nothing filters on these, and the primary keys are indexed already
+    op.drop_index("ix_item_title", table_name="item")
+    op.drop_index("ix_item_description", table_name="item")
+    op.drop_index("ix_item_id", table_name="item")
+    op.drop_index("ix_user_full_name", table_name="user")
+    op.drop_index("ix_user_id", table_name="user")
+
+
+def downgrade():
+    op.create_index("ix_user_id", "user", ["id"], unique=False)
+    op.create_index("ix_user_full_name", "user", ["full_name"], unique=False)
+    op.create_index("ix_item_id", "item", ["id"], unique=False)
+    op.create_index("ix_item_description", "item", ["description"], unique=False)
+    op.create_index("ix_item_title", "item", ["title"], unique=False)
+    op.drop_index("ix_item_owner_id_id", table_name="item")
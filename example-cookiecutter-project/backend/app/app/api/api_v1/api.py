@@ -1,5 +1,8 @@
 from fastapi import APIRouter
 
+from app.api.api_v1.async_endpoints import items as async_items
+from app.api.api_v1.async_endpoints import login as async_login
+from app.api.api_v1.async_endpoints import users as async_users
 from app.api.api_v1.endpoints import items, login, users, utils
 
 api_router = APIRouter()
@@ -7,3 +10,10 @@ api_router.include_router(login.router, tags=["login"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(utils.router, prefix="/utils", tags=["utils"])
 api_router.include_router(items.router, prefix="/items", tags=["items"])
+
+# The same API, with the database routers running on the event loop
+async_api_router = APIRouter()
+async_api_router.include_router(async_login.router, tags=["login"])
+async_api_router.include_router(async_users.router, prefix="/users", tags=["users"])
+async_api_router.include_router(utils.router, prefix="/utils", tags=["utils"])
+async_api_router.include_router(async_items.router, prefix="/items", tags=["items"])
@@ -0,0 +1,168 @@
+from typing import Any, List, Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Response
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, schemas
+from app.api import async_deps as deps
+from app.api.deps import SessionReleasingRoute
+from app.api.fields import parse_fields, sparse_dump
+from app.core.config import settings
+
+router = APIRouter(route_class=SessionReleasingRoute)
+
+
+@router.get("/", response_model=List[schemas.Item])
+async def read_items(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_db),
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: schemas.Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Retrieve items.
+
+    The next page is requested by passing the `X-Next-Cursor` response header
+    back as `cursor`. `skip` is still accepted, but gets slower with depth.
+    `fields` (e.g. `id,title`) limits the columns loaded and returned.
+    """
+    columns = parse_fields(fields, schemas.Item)
+    next_cursor = None
+    if skip and cursor is None:
+        if crud.async_user.is_superuser(current_user):
+            items = await crud.async_item.get_multi(
+                db, skip=skip, limit=limit, fields=columns
+            )
+        else:
+            items = await crud.async_item.get_multi_by_owner(
+                db=db, owner_id=current_user.id, skip=skip, limit=limit, fields=columns
+            )
+    else:
+        try:
+            if crud.async_user.is_superuser(current_user):
+                items, next_cursor = await crud.async_item.get_page(
+                    db, cursor=cursor, limit=limit, fields=columns
+                )
+            else:
+                items, next_cursor = await crud.async_item.get_page_by_owner(
+                    db=db,
+                    owner_id=current_user.id,
+                    cursor=cursor,
+                    limit=limit,
+                    fields=columns,
+                )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if columns is not None:
+        content = sparse_dump(schemas.Item, columns, items)
+        return JSONResponse(content, headers=headers)
+    response.headers.update(headers)
+    return items
+
+
+@router.post("/", response_model=schemas.Item)
+async def create_item(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    item_in: schemas.ItemCreate,
+    current_user: schemas.Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Create new item.
+    """
+    item = await crud.async_item.create_with_owner(
+        db=db, obj_in=item_in, owner_id=current_user.id
+    )
+    return item
+
+
+@router.post("/bulk", response_model=schemas.ItemBulkResult)
+async def create_items_bulk(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    items_in: List[Any] = Body(..., max_items=settings.ITEMS_BULK_MAX_SIZE),
+    current_user: schemas.Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Create many items in one transaction.
+
+    Rows that fail validation are reported by their index in `errors`,
+    the valid ones are created. At most ITEMS_BULK_MAX_SIZE rows per request.
+    """
+    valid = []
+    errors = []
+    for index, data in enumerate(items_in):
+        try:
+            valid.append(schemas.ItemCreate.parse_obj(data))
+        except ValidationError as e:
+            errors.append({"index": index, "detail": e.errors()})
+    items = await crud.async_item.create_many_with_owner(
+        db=db, objs_in=valid, owner_id=current_user.id
+    )
+    return {"created": items, "errors": errors}
+
+
+@router.put("/{id}", response_model=schemas.Item)
+async def update_item(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    id: int,
+    item_in: schemas.ItemUpdate,
+    current_user: schemas.Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Update an item.
+    """
+    owner_id = None if crud.async_user.is_superuser(current_user) else current_user.id
+    item = await crud.async_item.update_owned(
+        db=db, id=id, owner_id=owner_id, obj_in=item_in
+    )
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return item
+
+
+@router.get("/{id}", response_model=schemas.Item)
+async def read_item(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    id: int,
+    fields: Optional[str] = None,
+    current_user: schemas.Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Get item by ID.
+    """
+    columns = parse_fields(fields, schemas.Item)
+    owner_id = None if crud.async_user.is_superuser(current_user) else current_user.id
+    item = await crud.async_item.get_owned(
+        db=db, id=id, owner_id=owner_id, fields=columns
+    )
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    if columns is not None:
+        return JSONResponse(sparse_dump(schemas.Item, columns, [item])[0])
+    return item
+
+
+@router.delete("/{id}", response_model=schemas.Item)
+async def delete_item(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    id: int,
+    current_user: schemas.Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Delete an item.
+    """
+    owner_id = None if crud.async_user.is_superuser(current_user) else current_user.id
+    item = await crud.async_item.remove_owned(db=db, id=id, owner_id=owner_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return item
@@ -0,0 +1,138 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app import crud, models, schemas
+from app.api import async_deps as deps
+from app.api.deps import SessionReleasingRoute, TokenRequestForm, client_ip
+from app.core import rate_limit, security
+from app.utils import (
+    generate_password_reset_token,
+    send_reset_password_email,
+    verify_password_reset_token,
+)
+
+router = APIRouter(route_class=SessionReleasingRoute)
+
+
+@router.post("/login/access-token", response_model=schemas.Token)
+async def login_access_token(
+    request: Request,
+    db: AsyncSession = Depends(deps.get_db),
+    form_data: TokenRequestForm = Depends(),
+) -> Any:
+    """
+    OAuth2 compatible token login, get an access token for future requests
+
+    Also returns a refresh token: exchange it for new tokens with
+    `grant_type=refresh_token`, or at /login/refresh-token, instead of
+    sending the password again.
+    """
+    if form_data.grant_type == "refresh_token":
+        return await refresh_access_token(db=db, refresh_token=form_data.refresh_token)
+    # Before bcrypt: throttled attempts cost no CPU
+    rate_limit.login_by_ip.hit(client_ip(request))
+    rate_limit.login_by_account.hit(form_data.username.lower())
+    user = await crud.async_user.authenticate(
+        db, email=form_data.username, password=form_data.password
+    )
+    if not user:
+        raise HTTPException(status_code=400, detail="Incorrect email or password")
+    elif not crud.async_user.is_active(user):
+        raise HTTPException(status_code=400, detail="Inactive user")
+    refresh_token = await crud.async_refresh_token.issue(db, user_id=user.id)
+    return _tokens(user, refresh_token)
+
+
+@router.post("/login/refresh-token", response_model=schemas.Token)
+async def refresh_access_token(
+    db: AsyncSession = Depends(deps.get_db), refresh_token: str = Body(..., embed=True),
+) -> Any:
+    """
+    Exchange a refresh token for new access and refresh tokens
+
+    The refresh token can only be used once. Using it again revokes all the
+    refresh tokens descending from the same login, unless it was just spent,
+    as by a concurrent refresh: that use is only refused.
+    """
+    owner_id = await crud.async_refresh_token.owner(db, token=refresh_token)
+    user = None if owner_id is None else await crud.async_user.get(db, id=owner_id)
+    if not user:
+        raise HTTPException(status_code=400, detail="Invalid refresh token")
+    # Before spending it: the token of an inactive user stays as it was
+    if not crud.async_user.is_active(user):
+        raise HTTPException(status_code=400, detail="Inactive user")
+    next_refresh_token = await crud.async_refresh_token.rotate(db, token=refresh_token)
+    if next_refresh_token is None:
+        raise HTTPException(status_code=400, detail="Invalid refresh token")
+    return _tokens(user, next_refresh_token)
+
+
+def _tokens(user: models.User, refresh_token: str) -> Dict[str, str]:
+    return {
+        "access_token": security.create_user_access_token(user),
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+    }
+
+
+@router.post("/login/test-token", response_model=schemas.User)
+async def test_token(current_user: models.User = Depends(deps.get_current_user)) -> Any:
+    """
+    Test access token
+    """
+    return current_user
+
+
+@router.post("/password-recovery/{email}", response_model=schemas.Msg)
+async def recover_password(
+    email: str, request: Request, db: AsyncSession = Depends(deps.get_db)
+) -> Any:
+    """
+    Password Recovery
+    """
+    # Whether the account exists or not: throttling only the sent emails
+    # would tell which addresses have one
+    rate_limit.password_recovery_by_ip.hit(client_ip(request))
+    rate_limit.password_recovery_by_account.hit(email.lower())
+    user = await crud.async_user.get_by_email(db, email=email)
+
+    if not user:
+        raise HTTPException(
+            status_code=404,
+            detail="The user with this username does not exist in the system.",
+        )
+    password_reset_token = generate_password_reset_token(email=email)
+    await run_in_threadpool(
+        send_reset_password_email,
+        email_to=user.email,
+        email=email,
+        token=password_reset_token,
+    )
+    return {"msg": "Password recovery email sent"}
+
+
+@router.post("/reset-password/", response_model=schemas.Msg)
+async def reset_password(
+    token: str = Body(...),
+    new_password: str = Body(...),
+    db: AsyncSession = Depends(deps.get_db),
+) -> Any:
+    """
+    Reset password
+    """
+    email = verify_password_reset_token(token)
+    if not email:
+        raise HTTPException(status_code=400, detail="Invalid token")
+    user = await crud.async_user.get_by_email(db, email=email)
+    if not user:
+        raise HTTPException(
+            status_code=404,
+            detail="The user with this username does not exist in the system.",
+        )
+    elif not crud.async_user.is_active(user):
+        raise HTTPException(status_code=400, detail="Inactive user")
+    await crud.async_user.update(db, db_obj=user, obj_in={"password": new_password})
+    return {"msg": "Password updated successfully"}
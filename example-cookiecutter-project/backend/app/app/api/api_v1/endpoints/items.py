@@ -1,30 +1,65 @@
-from typing import Any, List
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Response
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
-from app import crud, models, schemas
+from app import crud, schemas
 from app.api import deps
+from app.api.fields import parse_fields, sparse_dump
+from app.core.config import settings
 
-router = APIRouter()
+router = APIRouter(route_class=deps.SessionReleasingRoute)
 
 
 @router.get("/", response_model=List[schemas.Item])
 def read_items(
+    response: Response,
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: schemas.Principal = Depends(deps.get_current_active_principal),
 ) -> Any:
     """
     Retrieve items.
+
+    The next page is requested by passing the `X-Next-Cursor` response header
+    back as `cursor`. `skip` is still accepted, but gets slower with depth.
+    `fields` (e.g. `id,title`) limits the columns loaded and returned.
     """
-    if crud.user.is_superuser(current_user):
-        items = crud.item.get_multi(db, skip=skip, limit=limit)
+    columns = parse_fields(fields, schemas.Item)
+    next_cursor = None
+    if skip and cursor is None:
+        if crud.user.is_superuser(current_user):
+            items = crud.item.get_multi(db, skip=skip, limit=limit, fields=columns)
+        else:
+            items = crud.item.get_multi_by_owner(
+                db=db, owner_id=current_user.id, skip=skip, limit=limit, fields=columns
+            )
     else:
-        items = crud.item.get_multi_by_owner(
-            db=db, owner_id=current_user.id, skip=skip, limit=limit
-        )
+        try:
+            if crud.user.is_superuser(current_user):
+                items, next_cursor = crud.item.get_page(
+                    db, cursor=cursor, limit=limit, fields=columns
+                )
+            else:
+                items, next_cursor = crud.item.get_page_by_owner(
+                    db=db,
+                    owner_id=current_user.id,
+                    cursor=cursor,
+                    limit=limit,
+                    fields=columns,
+                )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if columns is not None:
+        content = sparse_dump(schemas.Item, columns, items)
+        return JSONResponse(content, headers=headers)
+    response.headers.update(headers)
     return items
 
 
@@ -33,7 +68,7 @@ def create_item(
     *,
     db: Session = Depends(deps.get_db),
     item_in: schemas.ItemCreate,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: schemas.Principal = Depends(deps.get_current_active_principal),
 ) -> Any:
     """
     Create new item.
@@ -42,23 +77,47 @@ def create_item(
     return item
 
 
+@router.post("/bulk", response_model=schemas.ItemBulkResult)
+def create_items_bulk(
+    *,
+    db: Session = Depends(deps.get_db),
+    items_in: List[Any] = Body(..., max_items=settings.ITEMS_BULK_MAX_SIZE),
+    current_user: schemas.Principal = Depends(deps.get_current_active_principal),
+) -> Any:
+    """
+    Create many items in one transaction.
+
+    Rows that fail validation are reported by their index in `errors`,
+    the valid ones are created. At most ITEMS_BULK_MAX_SIZE rows per request.
+    """
+    valid = []
+    errors = []
+    for index, data in enumerate(items_in):
+        try:
+            valid.append(schemas.ItemCreate.parse_obj(data))
+        except ValidationError as e:
+            errors.append({"index": index, "detail": e.errors()})
+    items = crud.item.create_many_with_owner(
+        db=db, objs_in=valid, owner_id=current_user.id
+    )
+    return {"created": items, "errors": errors}
+
+
 @router.put("/{id}", response_model=schemas.Item)
 def update_item(
     *,
     db: Session = Depends(deps.get_db),
     id: int,
     item_in: schemas.ItemUpdate,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: schemas.Principal = Depends(deps.get_current_active_principal),
 ) -> Any:
     """
     Update an item.
     """
-    item = crud.item.get(db=db, id=id)
+    owner_id = None if crud.user.is_superuser(current_user) else current_user.id
+    item = crud.item.update_owned(db=db, id=id, owner_id=owner_id, obj_in=item_in)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
-    if not crud.user.is_superuser(current_user) and (item.owner_id != current_user.id):
-        raise HTTPException(status_code=400, detail="Not enough permissions")
-    item = crud.item.update(db=db, db_obj=item, obj_in=item_in)
     return item
 
 
@@ -67,16 +126,19 @@ def read_item(
     *,
     db: Session = Depends(deps.get_db),
     id: int,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    fields: Optional[str] = None,
+    current_user: schemas.Principal = Depends(deps.get_current_active_principal),
 ) -> Any:
     """
     Get item by ID.
     """
-    item = crud.item.get(db=db, id=id)
+    columns = parse_fields(fields, schemas.Item)
+    owner_id = None if crud.user.is_superuser(current_user) else current_user.id
+    item = crud.item.get_owned(db=db, id=id, owner_id=owner_id, fields=columns)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
-    if not crud.user.is_superuser(current_user) and (item.owner_id != current_user.id):
-        raise HTTPException(status_code=400, detail="Not enough permissions")
+    if columns is not None:
+        return JSONResponse(sparse_dump(schemas.Item, columns, [item])[0])
     return item
 
 
@@ -85,15 +147,13 @@ def delete_item(
     *,
     db: Session = Depends(deps.get_db),
     id: int,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: schemas.Principal = Depends(deps.get_current_active_principal),
 ) -> Any:
     """
     Delete an item.
     """
-    item = crud.item.get(db=db, id=id)
+    owner_id = None if crud.user.is_superuser(current_user) else current_user.id
+    item = crud.item.remove_owned(db=db, id=id, owner_id=owner_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
-    if not crud.user.is_superuser(current_user) and (item.owner_id != current_user.id):
-        raise HTTPException(status_code=400, detail="Not enough permissions")
-    item = crud.item.remove(db=db, id=id)
     return item
@@ -1,31 +1,38 @@
-from datetime import timedelta
-from typing import Any
+from typing import Any, Dict
 
-from fastapi import APIRouter, Body, Depends, HTTPException
-from fastapi.security import OAuth2PasswordRequestForm
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
-from app.core import security
-from app.core.config import settings
-from app.core.security import get_password_hash
+from app.core import rate_limit, security
 from app.utils import (
     generate_password_reset_token,
     send_reset_password_email,
     verify_password_reset_token,
 )
 
-router = APIRouter()
+router = APIRouter(route_class=deps.SessionReleasingRoute)
 
 
 @router.post("/login/access-token", response_model=schemas.Token)
 def login_access_token(
-    db: Session = Depends(deps.get_db), form_data: OAuth2PasswordRequestForm = Depends()
+    request: Request,
+    db: Session = Depends(deps.get_db),
+    form_data: deps.TokenRequestForm = Depends(),
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests
+
+    Also returns a refresh token: exchange it for new tokens with
+    `grant_type=refresh_token`, or at /login/refresh-token, instead of
+    sending the password again.
     """
+    if form_data.grant_type == "refresh_token":
+        return refresh_access_token(db=db, refresh_token=form_data.refresh_token)
+    # Before bcrypt: throttled attempts cost no CPU
+    rate_limit.login_by_ip.hit(deps.client_ip(request))
+    rate_limit.login_by_account.hit(form_data.username.lower())
     user = crud.user.authenticate(
         db, email=form_data.username, password=form_data.password
     )
@@ -33,12 +40,39 @@ def login_access_token(
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     elif not crud.user.is_active(user):
         raise HTTPException(status_code=400, detail="Inactive user")
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    refresh_token = crud.refresh_token.issue(db, user_id=user.id)
+    return _tokens(user, refresh_token)
+
+
+@router.post("/login/refresh-token", response_model=schemas.Token)
+def refresh_access_token(
+    db: Session = Depends(deps.get_db), refresh_token: str = Body(..., embed=True),
+) -> Any:
+    """
+    Exchange a refresh token for new access and refresh tokens
+
+    The refresh token can only be used once. Using it again revokes all the
+    refresh tokens descending from the same login, unless it was just spent,
+    as by a concurrent refresh: that use is only refused.
+    """
+    owner_id = crud.refresh_token.owner(db, token=refresh_token)
+    user = None if owner_id is None else crud.user.get(db, id=owner_id)
+    if not user:
+        raise HTTPException(status_code=400, detail="Invalid refresh token")
+    # Before spending it: the token of an inactive user stays as it was
+    if not crud.user.is_active(user):
+        raise HTTPException(status_code=400, detail="Inactive user")
+    next_refresh_token = crud.refresh_token.rotate(db, token=refresh_token)
+    if next_refresh_token is None:
+        raise HTTPException(status_code=400, detail="Invalid refresh token")
+    return _tokens(user, next_refresh_token)
+
+
+def _tokens(user: models.User, refresh_token: str) -> Dict[str, str]:
     return {
-        "access_token": security.create_access_token(
-            user.id, expires_delta=access_token_expires
-        ),
+        "access_token": security.create_user_access_token(user),
         "token_type": "bearer",
+        "refresh_token": refresh_token,
     }
 
 
@@ -51,10 +85,16 @@ def test_token(current_user: models.User = Depends(deps.get_current_user)) -> An
 
 
 @router.post("/password-recovery/{email}", response_model=schemas.Msg)
-def recover_password(email: str, db: Session = Depends(deps.get_db)) -> Any:
+def recover_password(
+    email: str, request: Request, db: Session = Depends(deps.get_db)
+) -> Any:
     """
     Password Recovery
     """
+    # Whether the account exists or not: throttling only the sent emails
+    # would tell which addresses have one
+    rate_limit.password_recovery_by_ip.hit(deps.client_ip(request))
+    rate_limit.password_recovery_by_account.hit(email.lower())
     user = crud.user.get_by_email(db, email=email)
 
     if not user:
@@ -89,8 +129,5 @@ def reset_password(
         )
     elif not crud.user.is_active(user):
         raise HTTPException(status_code=400, detail="Inactive user")
-    hashed_password = get_password_hash(new_password)
-    user.hashed_password = hashed_password
-    db.add(user)
-    db.commit()
+    crud.user.update(db, db_obj=user, obj_in={"password": new_password})
     return {"msg": "Password updated successfully"}
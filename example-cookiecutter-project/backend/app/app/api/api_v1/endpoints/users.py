@@ -1,29 +1,54 @@
-from typing import Any, List
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException, Response
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from pydantic.networks import EmailStr
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
+from app.api.bulk import drop_existing, log_progress, parse_users, taken_since
+from app.api.fields import parse_fields, sparse_dump
 from app.core.config import settings
-from app.utils import send_new_account_email
+from app.utils import send_new_account_email, send_new_account_emails
 
-router = APIRouter()
+router = APIRouter(route_class=deps.SessionReleasingRoute)
 
 
 @router.get("/", response_model=List[schemas.User])
 def read_users(
+    response: Response,
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: models.User = Depends(deps.get_current_active_superuser),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: schemas.Principal = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
     Retrieve users.
+
+    The next page is requested by passing the `X-Next-Cursor` response header
+    back as `cursor`. `skip` is still accepted, but gets slower with depth.
+    `fields` (e.g. `id,email`) limits the columns loaded and returned.
     """
-    users = crud.user.get_multi(db, skip=skip, limit=limit)
+    columns = parse_fields(fields, schemas.User)
+    next_cursor = None
+    if skip and cursor is None:
+        users = crud.user.get_multi(db, skip=skip, limit=limit, fields=columns)
+    else:
+        try:
+            users, next_cursor = crud.user.get_page(
+                db, cursor=cursor, limit=limit, fields=columns
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if columns is not None:
+        content = sparse_dump(schemas.User, columns, users)
+        return JSONResponse(content, headers=headers)
+    response.headers.update(headers)
     return users
 
 
@@ -32,18 +57,17 @@ def create_user(
     *,
     db: Session = Depends(deps.get_db),
     user_in: schemas.UserCreate,
-    current_user: models.User = Depends(deps.get_current_active_superuser),
+    current_user: schemas.Principal = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
     Create new user.
     """
-    user = crud.user.get_by_email(db, email=user_in.email)
-    if user:
+    user = crud.user.create_if_absent(db, obj_in=user_in)
+    if not user:
         raise HTTPException(
             status_code=400,
             detail="The user with this username already exists in the system.",
         )
-    user = crud.user.create(db, obj_in=user_in)
     if settings.EMAILS_ENABLED and user_in.email:
         send_new_account_email(
             email_to=user_in.email, username=user_in.email, password=user_in.password
@@ -51,6 +75,39 @@ def create_user(
     return user
 
 
+@router.post("/bulk", response_model=schemas.UserBulkResult)
+def create_users_bulk(
+    *,
+    db: Session = Depends(deps.get_db),
+    users_in: List[Any] = Body(..., max_items=settings.USERS_BULK_MAX_SIZE),
+    background_tasks: BackgroundTasks,
+    current_user: schemas.Principal = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Create many users in one transaction.
+
+    Rows that fail validation or whose email is taken, in the system, by a
+    concurrent request or earlier in the request, are reported by their index
+    in `errors`; the others are created. Passwords are hashed in parallel, and
+    the new account emails are sent after the response. At most
+    USERS_BULK_MAX_SIZE rows per request.
+    """
+    valid, errors = parse_users(users_in)
+    existing = crud.user.get_existing_emails(
+        db, emails=[user_in.email for _, user_in in valid]
+    )
+    new = drop_existing(valid, existing, errors)
+    users = crud.user.create_many(
+        db, objs_in=[user_in for _, user_in in new], progress=log_progress
+    )
+    created = drop_existing(new, taken_since(new, users), errors)
+    if settings.EMAILS_ENABLED:
+        background_tasks.add_task(
+            send_new_account_emails, [user_in for _, user_in in created]
+        )
+    return {"created": users, "errors": errors}
+
+
 @router.put("/me", response_model=schemas.User)
 def update_user_me(
     *,
@@ -102,33 +159,38 @@ def create_user_open(
             status_code=403,
             detail="Open user registration is forbidden on this server",
         )
-    user = crud.user.get_by_email(db, email=email)
-    if user:
+    user_in = schemas.UserCreate(password=password, email=email, full_name=full_name)
+    user = crud.user.create_if_absent(db, obj_in=user_in)
+    if not user:
         raise HTTPException(
             status_code=400,
             detail="The user with this username already exists in the system",
         )
-    user_in = schemas.UserCreate(password=password, email=email, full_name=full_name)
-    user = crud.user.create(db, obj_in=user_in)
     return user
 
 
 @router.get("/{user_id}", response_model=schemas.User)
 def read_user_by_id(
     user_id: int,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    fields: Optional[str] = None,
+    current_user: schemas.Principal = Depends(deps.get_current_active_principal),
     db: Session = Depends(deps.get_db),
 ) -> Any:
     """
     Get a specific user by id.
     """
-    user = crud.user.get(db, id=user_id)
-    if user == current_user:
-        return user
-    if not crud.user.is_superuser(current_user):
+    columns = parse_fields(fields, schemas.User)
+    user = crud.user.get(
+        db, id=user_id, fields=None if columns is None else columns + ("id",)
+    )
+    # Not `user == current_user`: either may be a detached copy from the cache
+    is_self = user is not None and user.id == current_user.id
+    if not is_self and not crud.user.is_superuser(current_user):
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
+    if user is not None and columns is not None:
+        return JSONResponse(sparse_dump(schemas.User, columns, [user])[0])
     return user
 
 
@@ -138,7 +200,7 @@ def update_user(
     db: Session = Depends(deps.get_db),
     user_id: int,
     user_in: schemas.UserUpdate,
-    current_user: models.User = Depends(deps.get_current_active_superuser),
+    current_user: schemas.Principal = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
     Update a user.
@@ -1,20 +1,24 @@
-from typing import Any
+from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
-from app import models, schemas
+from app import schemas
 from app.api import deps
 from app.core.celery_app import celery_app
+from app.core.hashing import password_hasher
+from app.core.rate_limit import limiters
+from app.crud.cache import caches
+from app.db.session import pool_health, pool_metrics, replicas
 from app.utils import send_test_email
 
-router = APIRouter()
+router = APIRouter(route_class=deps.SessionReleasingRoute)
 
 
 @router.post("/test-celery/", response_model=schemas.Msg, status_code=201)
 def test_celery(
     msg: schemas.Msg,
-    current_user: models.User = Depends(deps.get_current_active_superuser),
+    current_user: schemas.Principal = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
     Test Celery worker.
@@ -26,10 +30,65 @@ def test_celery(
 @router.post("/test-email/", response_model=schemas.Msg, status_code=201)
 def test_email(
     email_to: EmailStr,
-    current_user: models.User = Depends(deps.get_current_active_superuser),
+    current_user: schemas.Principal = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
     Test emails.
     """
     send_test_email(email_to=email_to)
     return {"msg": "Test email sent"}
+
+
+@router.get("/cache-stats/", response_model=Dict[str, Dict[str, int]])
+def cache_stats(
+    current_user: schemas.Principal = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Counters of the CRUD identity caches, by table.
+    """
+    return {namespace: cache.stats() for namespace, cache in caches.items()}
+
+
+@router.get("/password-hash-stats/", response_model=Dict[str, float])
+def password_hash_stats(
+    current_user: schemas.Principal = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Queue depth, wait time and hash time of the password hashing processes.
+    """
+    return password_hasher.stats()
+
+
+@router.get("/rate-limit-stats/", response_model=Dict[str, Dict[str, int]])
+def rate_limit_stats(
+    current_user: schemas.Principal = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Allowed and rejected hits of the rate limiters of this process.
+    """
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+@router.get("/db-pool-stats/", response_model=Dict[str, Dict[str, Any]])
+def db_pool_stats(
+    current_user: schemas.Principal = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Connections, checkout waits and health checks of this process's database
+    pools, by engine.
+    """
+    return {
+        name: {**metrics.stats(), **pool_health[name].stats()}
+        for name, metrics in pool_metrics.items()
+    }
+
+
+@router.get("/db-replica-stats/", response_model=List[Dict[str, Optional[float]]])
+def db_replica_stats(
+    current_user: schemas.Principal = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Lag and reads of each read replica, in DB_REPLICA_URIS order. The lag of
+    a replica that could not be reached is null.
+    """
+    return replicas.stats()
@@ -0,0 +1,77 @@
+from typing import AsyncGenerator
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, models, schemas
+from app.api.deps import decode_token, reusable_oauth2, session_factory
+from app.core.revocation import revocations
+from app.core.token_cache import token_cache
+from app.db.lazy import AsyncLazySession
+from app.db.session import AsyncSessionLocal
+
+
+async def get_db(request: Request, response: Response) -> AsyncGenerator:
+    db = request.state.db = AsyncLazySession(
+        session_factory(AsyncSessionLocal, request, response)
+    )
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_db), token: str = Depends(reusable_oauth2)
+) -> models.User:
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+    token_data = decode_token(token)
+    user = await crud.async_user.get(db, id=token_data.sub)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    token_cache.set(token, user, exp=token_data.exp)
+    return user
+
+
+async def get_current_principal(
+    db: AsyncSession = Depends(get_db), token: str = Depends(reusable_oauth2)
+) -> schemas.Principal:
+    token_data = decode_token(token)
+    if token_data.act is not None and not revocations.maybe_revoked(token_data.sub):
+        return schemas.Principal(
+            id=token_data.sub,
+            is_active=token_data.act,
+            is_superuser=bool(token_data.su),
+        )
+    user = await get_current_user(db=db, token=token)
+    return schemas.Principal(
+        id=user.id, is_active=user.is_active, is_superuser=user.is_superuser
+    )
+
+
+async def get_current_active_principal(
+    principal: schemas.Principal = Depends(get_current_principal),
+) -> schemas.Principal:
+    if not crud.async_user.is_active(principal):
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+
+async def get_current_active_user(
+    current_user: models.User = Depends(get_current_user),
+) -> models.User:
+    if not crud.async_user.is_active(current_user):
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
+
+
+async def get_current_active_superuser(
+    principal: schemas.Principal = Depends(get_current_principal),
+) -> schemas.Principal:
+    if not crud.async_user.is_superuser(principal):
+        raise HTTPException(
+            status_code=400, detail="The user doesn't have enough privileges"
+        )
+    return principal
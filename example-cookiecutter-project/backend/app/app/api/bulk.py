@@ -0,0 +1,67 @@
+import logging
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+from pydantic import ValidationError
+
+from app import schemas
+
+logger = logging.getLogger(__name__)
+
+EMAIL_TAKEN = "The user with this username already exists in the system."
+
+
+def parse_users(
+    users_in: Sequence[Any],
+) -> Tuple[List[Tuple[int, schemas.UserCreate]], List[Dict[str, Any]]]:
+    """
+    Split the rows of a bulk request into users to create, by their index,
+    and errors: invalid rows, and repeats of an email earlier in the request.
+    """
+    valid = []
+    errors: List[Dict[str, Any]] = []
+    seen: Set[str] = set()
+    for index, data in enumerate(users_in):
+        try:
+            user_in = schemas.UserCreate.parse_obj(data)
+        except ValidationError as e:
+            errors.append({"index": index, "detail": e.errors()})
+            continue
+        if user_in.email in seen:
+            errors.append({"index": index, "detail": "Duplicate email in request"})
+            continue
+        seen.add(user_in.email)
+        valid.append((index, user_in))
+    return valid, errors
+
+
+def drop_existing(
+    valid: List[Tuple[int, schemas.UserCreate]],
+    existing: Set[str],
+    errors: List[Dict[str, Any]],
+) -> List[Tuple[int, schemas.UserCreate]]:
+    """
+    The users whose email is not taken, reporting the others in `errors`.
+    """
+    new = []
+    for index, user_in in valid:
+        if user_in.email in existing:
+            errors.append({"index": index, "detail": EMAIL_TAKEN})
+        else:
+            new.append((index, user_in))
+    errors.sort(key=lambda error: error["index"])
+    return new
+
+
+def taken_since(
+    new: List[Tuple[int, schemas.UserCreate]], users: Sequence[Any]
+) -> Set[str]:
+    """
+    The emails of `new` that no user was created with, out of the `users`
+    created: taken by a concurrent request since they were looked up.
+    """
+    created = {user.email for user in users}
+    return {str(user_in.email) for _, user_in in new} - created
+
+
+def log_progress(done: int, total: int) -> None:
+    logger.info(f"Bulk user creation: {done}/{total} passwords hashed")
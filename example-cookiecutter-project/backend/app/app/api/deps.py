@@ -1,14 +1,20 @@
-from typing import Generator
+import time
+from functools import partial
+from typing import Any, Callable, Coroutine, Generator
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Form, HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt
 from pydantic import ValidationError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app import crud, models, schemas
-from app.core import security
 from app.core.config import settings
+from app.core.revocation import revocations
+from app.core.token_cache import token_cache
+from app.core.token_codec import TokenError, token_codec
+from app.db.lazy import AsyncLazySession, LazySession
 from app.db.session import SessionLocal
 
 reusable_oauth2 = OAuth2PasswordBearer(
@@ -16,33 +22,168 @@ reusable_oauth2 = OAuth2PasswordBearer(
 )
 
 
-def get_db() -> Generator:
+class TokenRequestForm:
+    """
+    OAuth2 token request: the password grant of OAuth2PasswordRequestForm (the
+    default grant), or the refresh_token grant, which needs no password.
+    """
+
+    def __init__(
+        self,
+        grant_type: str = Form("password", regex="^(password|refresh_token)$"),
+        username: str = Form(""),
+        password: str = Form(""),
+        refresh_token: str = Form(""),
+        scope: str = Form(""),
+    ):
+        self.grant_type = grant_type
+        self.username = username
+        self.password = password
+        self.refresh_token = refresh_token
+        self.scopes = scope.split()
+
+
+def client_ip(request: Request) -> str:
+    # The proxy's address behind one, unless uvicorn runs with --proxy-headers
+    return request.client.host if request.client else "unknown"
+
+
+# Until when a client that wrote reads from the primary, as a UNIX timestamp
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+
+def route_reads(request: Request, response: Response) -> bool:
+    """
+    Whether the reads of the request may go to a replica: for GET requests,
+    unless the client wrote recently.
+
+    A write request pins the client to the primary for as long as a replica
+    may lag, through a cookie: it reads its own writes. Clients that keep no
+    cookies can send it back themselves.
+    """
+    if request.method not in ("GET", "HEAD"):
+        until = time.time() + settings.DB_REPLICA_MAX_LAG
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            str(until),
+            max_age=int(settings.DB_REPLICA_MAX_LAG) + 1,
+            httponly=True,
+        )
+        return False
+    try:
+        until = float(request.cookies.get(READ_PRIMARY_COOKIE, 0))
+    except ValueError:
+        until = 0
+    return until < time.time()
+
+
+def session_factory(
+    sessionmaker: Callable[..., Any], request: Request, response: Response
+) -> Callable[[], Any]:
+    if settings.DB_REPLICA_URIS and route_reads(request, response):
+        return partial(sessionmaker, info={"read_only": True})
+    return sessionmaker
+
+
+def get_db(request: Request, response: Response) -> Generator:
+    """
+    The session of the request, opened on first use: requests that do not
+    query, or only on some branches, take nothing from the pool.
+    """
+    db = request.state.db = LazySession(
+        session_factory(SessionLocal, request, response)
+    )
     try:
-        db = SessionLocal()
         yield db
     finally:
         db.close()
 
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
-) -> models.User:
+async def release_session(request: Request) -> None:
+    db = getattr(request.state, "db", None)
+    if db is None or not db.opened:
+        return
+    if isinstance(db, AsyncLazySession):
+        await db.close()
+    else:
+        await run_in_threadpool(db.close)
+
+
+class SessionReleasingRoute(APIRoute):
+    """
+    Closes the session of the request, giving its connection back to the
+    pool, as soon as the response is built.
+
+    Dependencies are torn down only once the response is sent, and after its
+    background tasks: a slow client or an email would keep the connection.
+    A background task given the session opens it again, until the teardown.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def release_session_handler(request: Request) -> Response:
+            try:
+                return await handler(request)
+            finally:
+                await release_session(request)
+
+        return release_session_handler
+
+
+def decode_token(token: str) -> schemas.TokenPayload:
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        token_data = schemas.TokenPayload(**payload)
-    except (jwt.JWTError, ValidationError):
+        payload = token_codec.decode(token)
+        return schemas.TokenPayload(**payload)
+    except (TokenError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
+
+
+def get_current_user(
+    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
+) -> models.User:
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+    token_data = decode_token(token)
     user = crud.user.get(db, id=token_data.sub)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    token_cache.set(token, user, exp=token_data.exp)
     return user
 
 
+def get_current_principal(
+    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
+) -> schemas.Principal:
+    """
+    The principal of the token, from its claims if it has some that are still
+    valid, without any database access. Otherwise, from its user.
+    """
+    token_data = decode_token(token)
+    if token_data.act is not None and not revocations.maybe_revoked(token_data.sub):
+        return schemas.Principal(
+            id=token_data.sub,
+            is_active=token_data.act,
+            is_superuser=bool(token_data.su),
+        )
+    user = get_current_user(db=db, token=token)
+    return schemas.Principal(
+        id=user.id, is_active=user.is_active, is_superuser=user.is_superuser
+    )
+
+
+def get_current_active_principal(
+    principal: schemas.Principal = Depends(get_current_principal),
+) -> schemas.Principal:
+    if not crud.user.is_active(principal):
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+
 def get_current_active_user(
     current_user: models.User = Depends(get_current_user),
 ) -> models.User:
@@ -52,10 +193,10 @@ def get_current_active_user(
 
 
 def get_current_active_superuser(
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
-    if not crud.user.is_superuser(current_user):
+    principal: schemas.Principal = Depends(get_current_principal),
+) -> schemas.Principal:
+    if not crud.user.is_superuser(principal):
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
-    return current_user
+    return principal
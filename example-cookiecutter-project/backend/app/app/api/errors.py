@@ -0,0 +1,48 @@
+from fastapi import Request
+from sqlalchemy.orm.exc import StaleDataError
+from starlette.responses import JSONResponse
+
+from app.core.hashing import PasswordHashPoolBusy
+from app.core.rate_limit import RateLimited
+from app.crud.crud_item import NotOwnedError
+
+
+async def stale_data_handler(request: Request, exc: StaleDataError) -> JSONResponse:
+    """
+    A concurrent write got there first: the client should reload and retry.
+    """
+    return JSONResponse(
+        status_code=409,
+        content={"detail": "The resource was modified by another request"},
+    )
+
+
+async def not_owned_handler(request: Request, exc: NotOwnedError) -> JSONResponse:
+    """
+    The item exists, but the current user may not access it.
+    """
+    return JSONResponse(status_code=400, content={"detail": "Not enough permissions"})
+
+
+async def password_hash_busy_handler(
+    request: Request, exc: PasswordHashPoolBusy
+) -> JSONResponse:
+    """
+    Too many logins or sign-ups at once: shed them rather than queue forever.
+    """
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many password checks in progress, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
+async def rate_limited_handler(request: Request, exc: RateLimited) -> JSONResponse:
+    """
+    Too many attempts from this client, or on this account.
+    """
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many attempts, retry later"},
+        headers={"Retry-After": str(max(int(exc.retry_after), 1))},
+    )
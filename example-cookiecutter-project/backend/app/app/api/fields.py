@@ -0,0 +1,54 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel, create_model
+
+
+def parse_fields(
+    fields: Optional[str], schema: Type[BaseModel]
+) -> Optional[Tuple[str, ...]]:
+    """
+    Parse a `fields=a,b` query parameter into field names of `schema`.
+
+    The names come back in schema order, so that each field set maps to one
+    response model whatever order they were requested in.
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",")} - {""}
+    unknown = requested - set(schema.__fields__)
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    if not requested:
+        raise HTTPException(status_code=400, detail="No fields requested")
+    return tuple(name for name in schema.__fields__ if name in requested)
+
+
+@lru_cache(maxsize=256)
+def sparse_model(schema: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    A copy of `schema` restricted to `fields`, built once per field set.
+    """
+    definitions: Dict[str, Any] = {}
+    for name in fields:
+        field = schema.__fields__[name]
+        definitions[name] = (
+            field.outer_type_,
+            field.default if not field.required else ...,
+        )
+    return create_model(
+        f"{schema.__name__}Fields", __config__=schema.__config__, **definitions
+    )
+
+
+def sparse_dump(
+    schema: Type[BaseModel], fields: Tuple[str, ...], objs: Sequence[Any]
+) -> List[Dict[str, Any]]:
+    """
+    Serialize ORM objects or rows with only the requested fields.
+    """
+    model = sparse_model(schema, fields)
+    return [model.from_orm(obj).dict() for obj in objs]
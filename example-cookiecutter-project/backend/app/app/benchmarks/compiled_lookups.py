@@ -0,0 +1,133 @@
+"""
+Measure what the hot CRUD lookups spend on building and compiling their SQL.
+
+For `get`, `get_by_email` and `get_multi_by_owner`, times per call:
+
+* compile: the `db.query(...).filter(...)` they used to run, compiled anew
+* query: the same with SQLAlchemy's compiled cache, as they used to run
+* lambda: the lambda statements they run now
+
+first without a database, up to the statement being ready to execute, then
+executed against the database of the settings:
+
+    $ python -m app.benchmarks.compiled_lookups [iterations]
+"""
+import logging
+import secrets
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy.orm import Query, Session
+
+from app import crud, models, schemas
+from app.crud.base import _by_id
+from app.crud.crud_item import _by_owner
+from app.crud.crud_user import _by_email
+from app.db.session import SessionLocal, engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODES = ("compile", "query", "lambda")
+REPEAT = 5
+
+
+def microseconds(func: Callable[[], Any], iterations: int) -> float:
+    """
+    Time per call, the best of REPEAT runs: slower ones measure interruptions.
+    """
+    func()
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        timings.append((time.perf_counter() - start) / iterations * 1e6)
+    return min(timings)
+
+
+def lookups(db: Session, user: models.User) -> Dict[str, Tuple[Callable, Callable]]:
+    """
+    By lookup, the legacy query and the lambda statement it is now.
+    """
+    return {
+        "get": (
+            lambda: db.query(models.User).filter(models.User.id == user.id),
+            lambda: _by_id(models.User, user.id),
+        ),
+        "get_by_email": (
+            lambda: db.query(models.User).filter(models.User.email == user.email),
+            lambda: _by_email(user.email),
+        ),
+        "get_multi_by_owner": (
+            lambda: db.query(models.Item)
+            .filter(models.Item.owner_id == user.id)
+            .offset(0)
+            .limit(100),
+            lambda: _by_owner(user.id, 0, 100, []),
+        ),
+    }
+
+
+def prepare(query: Callable[[], Query], stmt: Callable[[], Any]) -> List[Callable]:
+    """
+    Build each statement up to what executing it starts with: the compiled
+    form, or the cache key that finds it in the compiled cache.
+    """
+    return [
+        lambda: query().statement.compile(dialect=engine.dialect),
+        lambda: query().statement._generate_cache_key(),  # type: ignore
+        lambda: stmt()._generate_cache_key(),
+    ]
+
+
+def execute(
+    query: Callable[[], Query], stmt: Callable[[], Any], db: Session
+) -> List[Callable]:
+    return [
+        lambda: query().execution_options(compiled_cache=None).all(),
+        lambda: query().all(),
+        lambda: db.execute(stmt()).scalars().all(),
+    ]
+
+
+def report(title: str, timings: Dict[str, List[float]]) -> None:
+    logger.info(title)
+    logger.info(f"  {'lookup':<20}" + "".join(f"{mode:>10}" for mode in MODES))
+    for name, (compiled, cached, lambdas) in timings.items():
+        logger.info(
+            f"  {name:<20}{compiled:>8.1f}us{cached:>8.1f}us{lambdas:>8.1f}us"
+            f"  {cached - lambdas:.1f}us/call saved"
+        )
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    db = SessionLocal()
+    user_in = schemas.UserCreate(
+        email=f"{secrets.token_hex(8)}@example.com", password=secrets.token_hex(8)
+    )
+    user = crud.user.create(db, obj_in=user_in)
+    try:
+        statements = lookups(db, user)
+        report(
+            "Building the statement",
+            {
+                name: [microseconds(f, iterations) for f in prepare(*pair)]
+                for name, pair in statements.items()
+            },
+        )
+        report(
+            "Executing it",
+            {
+                name: [microseconds(f, iterations) for f in execute(*pair, db)]
+                for name, pair in statements.items()
+            },
+        )
+    finally:
+        crud.user.remove(db, id=user.id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Count the statements each write path of the CRUD layer sends to the database.
+
+Compares the ORM add/commit/refresh sequence the CRUD classes used to run with
+the current single-statement `RETURNING` implementation. Every operation runs
+in a fresh session, the way its endpoint runs it (updates load the item first):
+
+    $ python -m app.benchmarks.crud_statements
+"""
+import logging
+import secrets
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from sqlalchemy.event import listen, remove
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.db.session import SessionLocal, engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def random_lower_string() -> str:
+    return secrets.token_hex(16)
+
+
+@contextmanager
+def counting() -> Iterator[Dict[str, int]]:
+    counts = {"statements": 0, "commits": 0}
+
+    def on_execute(*args: Any) -> None:
+        counts["statements"] += 1
+
+    def on_commit(*args: Any) -> None:
+        counts["commits"] += 1
+
+    listen(engine, "before_cursor_execute", on_execute)
+    listen(engine, "commit", on_commit)
+    try:
+        yield counts
+    finally:
+        remove(engine, "before_cursor_execute", on_execute)
+        remove(engine, "commit", on_commit)
+
+
+def orm_create(db: Session, owner_id: int) -> models.Item:
+    db_obj = models.Item(title=random_lower_string(), owner_id=owner_id)  # type: ignore
+    db.add(db_obj)
+    db.commit()
+    db.refresh(db_obj)
+    return db_obj
+
+
+def orm_update(db: Session, id: int) -> Any:
+    db_obj = db.query(models.Item).get(id)
+    assert db_obj
+    db_obj.title = random_lower_string()
+    db.add(db_obj)
+    db.commit()
+    db.refresh(db_obj)
+    return db_obj
+
+
+def orm_remove(db: Session, id: int) -> Any:
+    db_obj = db.query(models.Item).get(id)
+    db.delete(db_obj)
+    db.commit()
+    return db_obj
+
+
+def crud_create(db: Session, owner_id: int) -> models.Item:
+    item_in = schemas.ItemCreate(title=random_lower_string())
+    return crud.item.create_with_owner(db, obj_in=item_in, owner_id=owner_id)
+
+
+def crud_update(db: Session, id: int) -> Any:
+    db_obj = crud.item.get(db, id=id)
+    assert db_obj
+    item_in = schemas.ItemUpdate(title=random_lower_string())
+    return crud.item.update(db, db_obj=db_obj, obj_in=item_in)
+
+
+def crud_remove(db: Session, id: int) -> Any:
+    return crud.item.remove(db, id=id)
+
+
+def measure(
+    create: Callable[[Session, int], models.Item],
+    update: Callable[[Session, int], Any],
+    remove: Callable[[Session, int], Any],
+    owner_id: int,
+) -> List[Tuple[str, Dict[str, int]]]:
+    results = []
+    with counting() as counts:
+        item = create(SessionLocal(), owner_id)
+    results.append(("create", counts))
+    with counting() as counts:
+        update(SessionLocal(), item.id)
+    results.append(("update", counts))
+    with counting() as counts:
+        remove(SessionLocal(), item.id)
+    results.append(("remove", counts))
+    return results
+
+
+def main() -> None:
+    db = SessionLocal()
+    user_in = schemas.UserCreate(
+        email=f"{random_lower_string()}@example.com", password=random_lower_string()
+    )
+    owner = crud.user.create(db, obj_in=user_in)
+    before = measure(orm_create, orm_update, orm_remove, owner.id)
+    after = measure(crud_create, crud_update, crud_remove, owner.id)
+    crud.user.remove(db, id=owner.id)
+
+    logger.info(f"{'operation':<10}{'before':>16}{'after':>16}")
+    for (operation, old), (_, new) in zip(before, after):
+        logger.info(
+            f"{operation:<10}"
+            f"{old['statements']:>6} + {old['commits']} commit"
+            f"{new['statements']:>6} + {new['commits']} commit"
+        )
+
+
+if __name__ == "__main__":
+    main()
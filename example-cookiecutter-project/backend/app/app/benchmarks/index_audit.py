@@ -0,0 +1,259 @@
+"""
+Audit the query plans of the statements the CRUD layer sends to the database.
+
+Seeds users and items, runs the CRUD read and write paths while recording
+their SQL, then runs `EXPLAIN` on each statement with its own parameters.
+It flags:
+
+* sequential scans that filter rows, where an index should have been used
+  (unfiltered scans, as in `get_multi` with only an OFFSET, are expected)
+* non-unique indexes of the audited tables that no plan uses, which every
+  write pays for anyway
+
+The seeded rows are deleted afterwards. Exits with status 1 on any finding,
+so it can gate a deploy:
+
+    $ python -m app.benchmarks.index_audit
+"""
+import json
+import logging
+import secrets
+import sys
+from contextlib import contextmanager, suppress
+from typing import Any, Callable, Dict, Iterator, List, Set, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.event import listen, remove
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.core.revocation import revocations
+from app.crud.crud_item import NotOwnedError
+from app.db.session import SessionLocal, engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+USERS = 200
+ITEMS_PER_USER = 50
+BATCH_SIZE = 1000
+
+TABLES = [models.User.__table__, models.Item.__table__]  # type: ignore
+
+Statement = Tuple[str, str, Any]
+
+
+def random_lower_string() -> str:
+    return secrets.token_hex(16)
+
+
+@contextmanager
+def recording(current: Dict[str, str]) -> Iterator[List[Statement]]:
+    """
+    Collect the reads, updates and deletes sent to the database, tagged with
+    the label of the CRUD path that was running.
+    """
+    statements: List[Statement] = []
+
+    def on_execute(
+        conn: Any,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        if not executemany and statement.lstrip().upper().startswith(
+            ("SELECT", "UPDATE", "DELETE")
+        ):
+            statements.append((current["label"], statement, parameters))
+
+    listen(engine, "before_cursor_execute", on_execute)
+    try:
+        yield statements
+    finally:
+        remove(engine, "before_cursor_execute", on_execute)
+
+
+def seed(db: Session) -> Tuple[List[int], List[int]]:
+    """
+    Insert the audit users and their items, and refresh the planner statistics.
+    """
+    user_table, item_table = TABLES
+    users = [
+        dict(
+            email=f"{random_lower_string()}@audit.example.com",
+            hashed_password=random_lower_string(),
+            is_active=True,
+            is_superuser=False,
+        )
+        for _ in range(USERS)
+    ]
+    stmt = user_table.insert().values(users).returning(user_table.c.id)
+    owner_ids = [row.id for row in db.execute(stmt)]
+    items = [
+        dict(title=random_lower_string(), owner_id=owner_id)
+        for owner_id in owner_ids
+        for _ in range(ITEMS_PER_USER)
+    ]
+    item_ids: List[int] = []
+    for start in range(0, len(items), BATCH_SIZE):
+        end = start + BATCH_SIZE
+        batch = items[start:end]
+        stmt = item_table.insert().values(batch).returning(item_table.c.id)
+        item_ids.extend(row.id for row in db.execute(stmt))
+    db.commit()
+    for table in TABLES:
+        db.execute(text(f'ANALYZE "{table.name}"'))
+    db.commit()
+    return owner_ids, item_ids
+
+
+def unseed(db: Session, owner_ids: List[int]) -> None:
+    user_table, item_table = TABLES
+    db.execute(item_table.delete().where(item_table.c.owner_id.in_(owner_ids)))
+    db.execute(user_table.delete().where(user_table.c.id.in_(owner_ids)))
+    db.commit()
+
+
+def crud_paths(
+    owner_id: int, other_id: int, item_ids: List[int]
+) -> List[Tuple[str, Callable[[Session], Any]]]:
+    """
+    The CRUD calls to audit, the way the endpoints make them.
+
+    Each one gets its own item, so that none is served by the identity cache.
+    """
+
+    def next_page(get_page: Callable[..., Any]) -> Any:
+        _, cursor = get_page(limit=10)
+        return get_page(cursor=cursor, limit=10)
+
+    def not_owned(db: Session) -> None:
+        with suppress(NotOwnedError):
+            crud.item.get_owned(db, id=item_ids[4], owner_id=other_id)
+
+    def users_with_items(db: Session) -> None:
+        users, _ = crud.user.get_page(db, limit=10)
+        crud.user.load_related(db, users, "items")
+
+    return [
+        ("item.get", lambda db: crud.item.get(db, id=item_ids[0])),
+        ("item.get_multi", lambda db: crud.item.get_multi(db, skip=100)),
+        (
+            "item.get_page",
+            lambda db: next_page(lambda **kw: crud.item.get_page(db, **kw)),
+        ),
+        (
+            "item.get_multi_by_owner",
+            lambda db: crud.item.get_multi_by_owner(db, owner_id=owner_id, skip=5),
+        ),
+        (
+            "item.get_page_by_owner",
+            lambda db: next_page(
+                lambda **kw: crud.item.get_page_by_owner(db, owner_id=owner_id, **kw)
+            ),
+        ),
+        (
+            "item.get_owned",
+            lambda db: crud.item.get_owned(db, id=item_ids[1], owner_id=owner_id),
+        ),
+        ("item.get_owned (not owned)", not_owned),
+        (
+            "item.update_owned",
+            lambda db: crud.item.update_owned(
+                db, id=item_ids[2], owner_id=owner_id, obj_in={"title": "audited"}
+            ),
+        ),
+        (
+            "item.remove_owned",
+            lambda db: crud.item.remove_owned(db, id=item_ids[3], owner_id=owner_id),
+        ),
+        ("user.get", lambda db: crud.user.get(db, id=other_id)),
+        (
+            "user.get_by_email",
+            lambda db: crud.user.get_by_email(db, email="audit@example.com"),
+        ),
+        ("user.get_page + items", users_with_items),
+        ("revocations.sync", lambda db: revocations.sync()),
+    ]
+
+
+def explain(statement: str, parameters: Any) -> Dict[str, Any]:
+    with engine.connect() as conn:
+        result = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def plan_nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def audit(statements: List[Statement]) -> Tuple[List[str], Set[str]]:
+    """
+    Explain each distinct statement; return the findings and the indexes used.
+    """
+    table_names = {table.name for table in TABLES}
+    findings = []
+    used: Set[str] = set()
+    seen: Set[str] = set()
+    for label, statement, parameters in statements:
+        if statement in seen:
+            continue
+        seen.add(statement)
+        nodes = list(plan_nodes(explain(statement, parameters)))
+        logger.info(f"{label:<28}{' > '.join(node['Node Type'] for node in nodes)}")
+        for node in nodes:
+            if "Index Name" in node:
+                used.add(node["Index Name"])
+            if (
+                node["Node Type"] == "Seq Scan"
+                and node.get("Relation Name") in table_names
+                and "Filter" in node
+            ):
+                findings.append(
+                    f"{label}: sequential scan of {node['Relation Name']} "
+                    f"filtering on {node['Filter']}"
+                )
+    return findings, used
+
+
+def unused_indexes(used: Set[str]) -> List[str]:
+    inspector = inspect(engine)
+    return [
+        f"{table.name}: index {index['name']} is not used by any plan"
+        for table in TABLES
+        for index in inspector.get_indexes(table.name)
+        # Unique indexes enforce a constraint, whether queries use them or not
+        if not index["unique"] and index["name"] not in used
+    ]
+
+
+def main() -> None:
+    db = SessionLocal()
+    owner_ids, item_ids = seed(db)
+    owner_items = item_ids[:ITEMS_PER_USER]
+    current = {"label": ""}
+    try:
+        with recording(current) as statements:
+            for label, run in crud_paths(owner_ids[0], owner_ids[1], owner_items):
+                current["label"] = label
+                run(SessionLocal())
+        findings, used = audit(statements)
+    finally:
+        unseed(db, owner_ids)
+    findings.extend(unused_indexes(used))
+    for finding in findings:
+        logger.warning(finding)
+    if findings:
+        sys.exit(1)
+    logger.info("No sequential scans or unused indexes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compare the throughput of the HS256 codec with python-jose.
+
+Times encoding, decoding, and batch decoding with `decode_many`, on the
+tokens the API issues:
+
+    $ python -m app.benchmarks.jwt_codec [iterations]
+"""
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from jose import jwt
+
+from app.core.token_codec import HS256Codec
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+KEY = "benchmark-secret-key"
+BATCH_SIZE = 100
+
+
+def claims() -> Dict[str, Any]:
+    expire = datetime.utcnow() + timedelta(minutes=15)
+    return {"exp": expire, "sub": "42", "act": True, "su": False}
+
+
+def ops_per_second(func: Callable[[], Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return iterations / (time.perf_counter() - start)
+
+
+def report(name: str, jose_ops: float, codec_ops: float) -> None:
+    logger.info(
+        f"{name:<14}jose {jose_ops:>10,.0f}/s  codec {codec_ops:>10,.0f}/s  "
+        f"x{codec_ops / jose_ops:.1f}"
+    )
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    codec = HS256Codec(KEY)
+    payload = claims()
+    token = codec.encode(payload)
+    if jwt.decode(token, KEY, algorithms=["HS256"]) != codec.decode(token):
+        sys.exit("The codec and python-jose disagree")
+    tokens: List[str] = [token] * BATCH_SIZE
+
+    report(
+        "encode",
+        ops_per_second(lambda: jwt.encode(payload, KEY, algorithm="HS256"), iterations),
+        ops_per_second(lambda: codec.encode(payload), iterations),
+    )
+    report(
+        "decode",
+        ops_per_second(
+            lambda: jwt.decode(token, KEY, algorithms=["HS256"]), iterations
+        ),
+        ops_per_second(lambda: codec.decode(token), iterations),
+    )
+    batches = max(iterations // BATCH_SIZE, 1)
+    jose_batch = ops_per_second(
+        lambda: [jwt.decode(t, KEY, algorithms=["HS256"]) for t in tokens], batches
+    )
+    codec_batch = ops_per_second(lambda: codec.decode_many(tokens), batches)
+    report("decode_many", jose_batch * BATCH_SIZE, codec_batch * BATCH_SIZE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Measure password verification latency for bcrypt and argon2 costs on this machine.
+
+Logins spend most of their time verifying the password, so this is the
+latency a login pays. For each scheme, suggests the most expensive settings
+that verify within the target (milliseconds, 250 by default):
+
+    $ python -m app.benchmarks.password_hashing [target_ms]
+
+argon2 is measured only when its backend (argon2-cffi) is installed.
+"""
+import logging
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from passlib.hash import argon2, bcrypt
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PASSWORD = "correct horse battery staple"
+REPEAT = 5
+
+BCRYPT_ROUNDS = range(10, 16)
+ARGON2_TIME_COSTS = range(1, 5)
+# KiB
+ARGON2_MEMORY_COSTS = [19456, 65536, 102400]
+ARGON2_PARALLELISM = 8
+
+
+def verify_ms(handler: Any) -> float:
+    """
+    Median time to verify a password against a hash made by `handler`.
+    """
+    hashed = handler.hash(PASSWORD)
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        handler.verify(PASSWORD, hashed)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def measure_bcrypt() -> List[Tuple[Dict[str, int], float]]:
+    results = []
+    for rounds in BCRYPT_ROUNDS:
+        elapsed = verify_ms(bcrypt.using(rounds=rounds))
+        results.append(({"PASSWORD_BCRYPT_ROUNDS": rounds}, elapsed))
+        logger.info(f"bcrypt rounds={rounds:<26}{elapsed:>8.1f} ms")
+    return results
+
+
+def measure_argon2() -> List[Tuple[Dict[str, int], float]]:
+    results = []
+    for memory_cost in ARGON2_MEMORY_COSTS:
+        for time_cost in ARGON2_TIME_COSTS:
+            handler = argon2.using(
+                time_cost=time_cost,
+                memory_cost=memory_cost,
+                parallelism=ARGON2_PARALLELISM,
+            )
+            elapsed = verify_ms(handler)
+            config = {
+                "PASSWORD_ARGON2_TIME_COST": time_cost,
+                "PASSWORD_ARGON2_MEMORY_COST": memory_cost,
+                "PASSWORD_ARGON2_PARALLELISM": ARGON2_PARALLELISM,
+            }
+            results.append((config, elapsed))
+            logger.info(
+                f"argon2 time_cost={time_cost} memory_cost={memory_cost:<8}"
+                f"{elapsed:>8.1f} ms"
+            )
+    return results
+
+
+def suggest(
+    results: List[Tuple[Dict[str, int], float]], target_ms: float
+) -> Optional[Tuple[Dict[str, int], float]]:
+    """
+    The slowest settings still within the target: the costliest to attack.
+    """
+    within = [result for result in results if result[1] <= target_ms]
+    if not within:
+        return None
+    return max(within, key=lambda result: result[1])
+
+
+def main() -> None:
+    target_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 250.0
+    measured = {"bcrypt": measure_bcrypt()}
+    if argon2.has_backend():
+        measured["argon2"] = measure_argon2()
+    else:
+        logger.info("argon2: no backend installed, skipped")
+
+    for scheme, results in measured.items():
+        suggestion = suggest(results, target_ms)
+        if suggestion is None:
+            logger.info(f"{scheme}: no settings verify within {target_ms:.0f} ms")
+            continue
+        config, elapsed = suggestion
+        logger.info(f"{scheme}: {elapsed:.1f} ms per verification with")
+        logger.info(f"    PASSWORD_HASH_SCHEME={scheme}")
+        for name, value in config.items():
+            logger.info(f"    {name}={value}")
+
+
+if __name__ == "__main__":
+    main()
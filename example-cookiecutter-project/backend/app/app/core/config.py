@@ -9,6 +9,11 @@ class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # Refresh tokens are single use: each refresh returns the next one
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # A token spent this recently is refused without revoking its family: the
+    # same client refreshing twice at once, rather than a copy of the token
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS: int = 10
     SERVER_NAME: str
     SERVER_HOST: AnyHttpUrl
     # BACKEND_CORS_ORIGINS is a JSON-formatted list of origins
@@ -51,6 +56,62 @@ class Settings(BaseSettings):
             path=f"/{values.get('POSTGRES_DB') or ''}",
         )
 
+    # The same database, through the asyncio driver used by the async endpoints
+    ASYNC_SQLALCHEMY_DATABASE_URI: Optional[str] = None
+
+    @validator("ASYNC_SQLALCHEMY_DATABASE_URI", pre=True)
+    def assemble_async_db_connection(
+        cls, v: Optional[str], values: Dict[str, Any]
+    ) -> Any:
+        if isinstance(v, str):
+            return v
+        uri = str(values.get("SQLALCHEMY_DATABASE_URI"))
+        return uri.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+    # Serve the login, users and items routers from their async versions
+    ASYNC_ENDPOINTS: bool = False
+
+    # Connection pool of each engine, per worker process: DB_POOL_SIZE
+    # connections kept open, up to DB_MAX_OVERFLOW more under load. A checkout
+    # waits DB_POOL_TIMEOUT seconds at most, and connections are replaced
+    # after DB_POOL_RECYCLE seconds (-1: never)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = -1
+    # How dead connections are found: "pre_ping" tests each one as it is checked
+    # out, at the cost of a round trip; "background" pings the idle ones every
+    # DB_POOL_HEALTH_CHECK_INTERVAL seconds instead (see app.db.health)
+    DB_POOL_HEALTH_CHECK: str = "pre_ping"
+    DB_POOL_HEALTH_CHECK_INTERVAL: float = 30.0
+    # Statements asyncpg prepares on the server and keeps, per connection. Set
+    # to 0 behind PgBouncer in transaction mode, which cannot keep them
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+
+    # Read replicas, as a JSON list of URIs: GET requests read from one of them,
+    # picked "round_robin" or by "least_connections", unless it lags more than
+    # DB_REPLICA_MAX_LAG seconds behind (measured every DB_REPLICA_LAG_INTERVAL).
+    # A client that wrote reads from the primary for DB_REPLICA_MAX_LAG seconds
+    DB_REPLICA_URIS: List[str] = []
+    DB_REPLICA_BALANCING: str = "round_robin"
+    DB_REPLICA_MAX_LAG: float = 5.0
+    DB_REPLICA_LAG_INTERVAL: float = 5.0
+    ASYNC_DB_REPLICA_URIS: Optional[List[str]] = None
+
+    @validator("ASYNC_DB_REPLICA_URIS", pre=True)
+    def assemble_async_replica_uris(
+        cls, v: Optional[List[str]], values: Dict[str, Any]
+    ) -> Any:
+        if v is not None:
+            # Each is measured through the replica of DB_REPLICA_URIS at its index
+            if len(v) != len(values.get("DB_REPLICA_URIS", [])):
+                raise ValueError("needs one URI per URI of DB_REPLICA_URIS")
+            return v
+        return [
+            uri.replace("postgresql://", "postgresql+asyncpg://", 1)
+            for uri in values.get("DB_REPLICA_URIS", [])
+        ]
+
     SMTP_TLS: bool = True
     SMTP_PORT: Optional[int] = None
     SMTP_HOST: Optional[str] = None
@@ -82,6 +143,59 @@ class Settings(BaseSettings):
     FIRST_SUPERUSER_PASSWORD: str
     USERS_OPEN_REGISTRATION: bool = False
 
+    # Identity cache in front of CRUDBase.get: "" (disabled), "memory" or "redis"
+    CRUD_CACHE_BACKEND: str = ""
+    CRUD_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CRUD_CACHE_MAX_SIZE: int = 10000
+    CRUD_CACHE_DEFAULT_TTL: int = 60
+    # Seconds to keep a row, by table name
+    CRUD_CACHE_TTL: Dict[str, int] = {"user": 60, "item": 30}
+
+    # Seconds to trust a verified access token without decoding it again (0: off)
+    TOKEN_CACHE_TTL: int = 60
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+
+    # Put is_active and is_superuser in access tokens, so that authorization
+    # needs no database read unless they changed since (see app.core.revocation).
+    # Such tokens last ACCESS_TOKEN_CLAIMS_EXPIRE_MINUTES: refresh them instead
+    ACCESS_TOKEN_CLAIMS: bool = False
+    ACCESS_TOKEN_CLAIMS_EXPIRE_MINUTES: int = 15
+    # Seconds between two loads of the users whose claims changed
+    TOKEN_REVOCATION_SYNC_INTERVAL: int = 10
+
+    # Processes running bcrypt, and how many more jobs may wait for them
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 32
+    # Seconds a job may wait for a worker before being answered with a 503
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = 5.0
+
+    # Sliding-window limits of login attempts and password recovery emails, by
+    # client IP and by account, over windows of seconds. Counted in-process
+    # (""), or in Redis ("redis") to share them between workers
+    RATE_LIMIT_BACKEND: str = ""
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/1"
+    LOGIN_RATE_LIMIT_PER_IP: int = 30
+    LOGIN_RATE_LIMIT_PER_ACCOUNT: int = 10
+    LOGIN_RATE_LIMIT_WINDOW: int = 60
+    PASSWORD_RECOVERY_RATE_LIMIT_PER_IP: int = 10
+    PASSWORD_RECOVERY_RATE_LIMIT_PER_ACCOUNT: int = 3
+    PASSWORD_RECOVERY_RATE_LIMIT_WINDOW: int = 3600
+
+    # Password hash for new hashes: "bcrypt" or "argon2".
+    # Stored hashes of the other scheme, or with other parameters, are
+    # rehashed at the next login. Tune with `python -m app.benchmarks.password_hashing`
+    PASSWORD_HASH_SCHEME: str = "bcrypt"
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_ARGON2_TIME_COST: int = 2
+    # KiB
+    PASSWORD_ARGON2_MEMORY_COST: int = 102400
+    PASSWORD_ARGON2_PARALLELISM: int = 8
+
+    # Rows a POST /items/bulk request may carry
+    ITEMS_BULK_MAX_SIZE: int = 1000
+    # Rows a POST /users/bulk request may carry: each costs a password hash
+    USERS_BULK_MAX_SIZE: int = 100
+
     class Config:
         case_sensitive = True
 
@@ -0,0 +1,211 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.security import (
+    get_password_hash,
+    verify_and_update_password,
+    verify_password,
+)
+
+# Workers start from a fresh interpreter, not as a fork of a process that may
+# have request threads and their locks, or open database connections
+_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+class PasswordHashPoolBusy(Exception):
+    """
+    The password hashing pool is full, or a job waited past its deadline.
+    """
+
+
+def _run(
+    func: Callable[..., Any], args: Tuple[Any, ...], deadline: float
+) -> Tuple[Any, float, float]:
+    """
+    Run a hashing job in a worker process, unless it was queued for too long.
+
+    Returns the result, when the job started, and how long it took.
+    """
+    started = time.time()
+    if started > deadline:
+        raise PasswordHashPoolBusy("Password hashing job expired in the queue")
+    result = func(*args)
+    return result, started, time.time() - started
+
+
+def _hash_all(passwords: List[str]) -> List[str]:
+    return [get_password_hash(password) for password in passwords]
+
+
+def _chunks(passwords: Sequence[str], size: int) -> List[List[str]]:
+    chunks = []
+    for start in range(0, len(passwords), size):
+        end = start + size
+        chunks.append(list(passwords[start:end]))
+    return chunks
+
+
+class PasswordHashPool:
+    """
+    bcrypt hashing and verification in a dedicated pool of processes.
+
+    Keeps logins and sign-ups from taking the request threads (and the GIL)
+    the rest of the API runs on. At most `workers + queue_size` jobs are in
+    flight: more raise PasswordHashPoolBusy at once, and jobs that wait longer
+    than `timeout` seconds for a worker raise it instead of running late.
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout: float):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.timeout = timeout
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.expired = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.hash_seconds = 0.0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _submit(self, func: Callable[..., Any], *args: Any) -> Future:
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                raise PasswordHashPoolBusy("Password hashing is saturated")
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(_START_METHOD),
+                )
+            self.in_flight += 1
+            submitted = time.time()
+            future = self._executor.submit(_run, func, args, submitted + self.timeout)
+        future.add_done_callback(partial(self._done, submitted))
+        return future
+
+    def _done(self, submitted: float, future: Future) -> None:
+        error = None if future.cancelled() else future.exception()
+        with self._lock:
+            self.in_flight -= 1
+            if isinstance(error, PasswordHashPoolBusy):
+                self.expired += 1
+            elif error is None and not future.cancelled():
+                _, started, hash_time = future.result()
+                wait = max(started - submitted, 0.0)
+                self.completed += 1
+                self.wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+                self.hash_seconds += hash_time
+
+    def hash(self, password: str) -> str:
+        return self._submit(get_password_hash, password).result()[0]
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return self._submit(verify_password, password, hashed_password).result()[0]
+
+    def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        future = self._submit(verify_and_update_password, password, hashed_password)
+        return future.result()[0]
+
+    def hash_many(
+        self,
+        passwords: Sequence[str],
+        *,
+        chunk_size: int = 8,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> List[str]:
+        """
+        Hash many passwords on all the workers, `chunk_size` per job.
+
+        At most one chunk per worker is in flight, so that the logins queued
+        meanwhile run between two chunks rather than after the whole batch.
+        `progress` is called with the count hashed so far and the total.
+        """
+        hashed: List[str] = []
+        pending: Deque[Future] = deque()
+        for chunk in _chunks(passwords, chunk_size):
+            if len(pending) >= self.workers:
+                hashed.extend(pending.popleft().result()[0])
+                if progress is not None:
+                    progress(len(hashed), len(passwords))
+            pending.append(self._submit(_hash_all, chunk))
+        while pending:
+            hashed.extend(pending.popleft().result()[0])
+            if progress is not None:
+                progress(len(hashed), len(passwords))
+        return hashed
+
+    async def ahash(self, password: str) -> str:
+        future = self._submit(get_password_hash, password)
+        return (await asyncio.wrap_future(future))[0]
+
+    async def ahash_many(
+        self,
+        passwords: Sequence[str],
+        *,
+        chunk_size: int = 8,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> List[str]:
+        hashed: List[str] = []
+        pending: Deque[Future] = deque()
+        for chunk in _chunks(passwords, chunk_size):
+            if len(pending) >= self.workers:
+                hashed.extend((await asyncio.wrap_future(pending.popleft()))[0])
+                if progress is not None:
+                    progress(len(hashed), len(passwords))
+            pending.append(self._submit(_hash_all, chunk))
+        while pending:
+            hashed.extend((await asyncio.wrap_future(pending.popleft()))[0])
+            if progress is not None:
+                progress(len(hashed), len(passwords))
+        return hashed
+
+    async def averify(self, password: str, hashed_password: str) -> bool:
+        future = self._submit(verify_password, password, hashed_password)
+        return (await asyncio.wrap_future(future))[0]
+
+    async def averify_and_update(
+        self, password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        future = self._submit(verify_and_update_password, password, hashed_password)
+        return (await asyncio.wrap_future(future))[0]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                "in_flight": self.in_flight,
+                "queue_depth": max(self.in_flight - self.workers, 0),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "expired": self.expired,
+                "mean_wait_seconds": self.wait_seconds / completed,
+                "max_wait_seconds": self.max_wait_seconds,
+                "mean_hash_seconds": self.hash_seconds / completed,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+password_hasher = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT,
+)
@@ -0,0 +1,158 @@
+import math
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+
+class RateLimited(Exception):
+    """
+    Too many hits on a limiter's key: retry in `retry_after` seconds.
+    """
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Rate limit {name} exceeded")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class MemoryCounters:
+    """
+    In-process counters with expiry, for a single worker.
+    """
+
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self._counters: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, ttl: float) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expires, count = self._counters.get(key, (now + ttl, 0))
+            if expires < now:
+                expires, count = now + ttl, 0
+            self._counters[key] = (expires, count + 1)
+            if len(self._counters) > self.max_size:
+                self._prune(now)
+            return count + 1
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            expires, count = self._counters.get(key, (0.0, 0))
+            return count if expires >= time.monotonic() else 0
+
+    def _prune(self, now: float) -> None:
+        self._counters = {
+            key: entry for key, entry in self._counters.items() if entry[0] >= now
+        }
+
+
+class RedisCounters:
+    """
+    Counters in Redis, or anything with its incr/expire/get API, shared by
+    all the workers.
+    """
+
+    def __init__(self, client: Any, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    def incr(self, key: str, ttl: float) -> int:
+        name = self.prefix + key
+        count = self.client.incr(name)
+        if count == 1:
+            self.client.expire(name, math.ceil(ttl))
+        return count
+
+    def get(self, key: str) -> int:
+        value = self.client.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+
+class SlidingWindowLimiter:
+    """
+    At most `limit` hits per key in any `window` seconds, approximately.
+
+    Counts hits in fixed windows, and weighs the previous window's count by
+    how much of it the sliding window still covers: two counters per key,
+    whatever the rate. Rejected hits count too, so that a client has to slow
+    down rather than retry in a loop.
+    """
+
+    def __init__(self, name: str, limit: int, window: int, backend: Any):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.backend = backend
+        self.allowed = 0
+        self.rejected = 0
+
+    def hit(self, key: str, now: Optional[float] = None) -> None:
+        """
+        Count a hit on `key`; raise RateLimited if it is over the limit.
+        """
+        # Wall clock: the windows have to line up across processes
+        now = time.time() if now is None else now
+        current = int(now // self.window)
+        elapsed = now - current * self.window
+        prefix = f"{self.name}:{key}:"
+        count = self.backend.incr(f"{prefix}{current}", 2 * self.window)
+        previous = self.backend.get(f"{prefix}{current - 1}")
+        if previous * (1 - elapsed / self.window) + count > self.limit:
+            self.rejected += 1
+            raise RateLimited(self.name, retry_after=self.window - elapsed)
+        self.allowed += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "limit": self.limit,
+            "window": self.window,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+_backend: Any = None
+limiters: Dict[str, SlidingWindowLimiter] = {}
+
+
+def get_backend() -> Any:
+    global _backend
+    if _backend is None:
+        if settings.RATE_LIMIT_BACKEND == "redis":
+            import redis  # type: ignore
+
+            _backend = RedisCounters(
+                redis.Redis.from_url(settings.RATE_LIMIT_REDIS_URL)
+            )
+        else:
+            _backend = MemoryCounters()
+    return _backend
+
+
+def build_limiter(name: str, limit: int, window: int) -> SlidingWindowLimiter:
+    limiter = SlidingWindowLimiter(name, limit, window, get_backend())
+    limiters[name] = limiter
+    return limiter
+
+
+login_by_ip = build_limiter(
+    "login:ip", settings.LOGIN_RATE_LIMIT_PER_IP, settings.LOGIN_RATE_LIMIT_WINDOW
+)
+login_by_account = build_limiter(
+    "login:account",
+    settings.LOGIN_RATE_LIMIT_PER_ACCOUNT,
+    settings.LOGIN_RATE_LIMIT_WINDOW,
+)
+password_recovery_by_ip = build_limiter(
+    "password-recovery:ip",
+    settings.PASSWORD_RECOVERY_RATE_LIMIT_PER_IP,
+    settings.PASSWORD_RECOVERY_RATE_LIMIT_WINDOW,
+)
+password_recovery_by_account = build_limiter(
+    "password-recovery:account",
+    settings.PASSWORD_RECOVERY_RATE_LIMIT_PER_ACCOUNT,
+    settings.PASSWORD_RECOVERY_RATE_LIMIT_WINDOW,
+)
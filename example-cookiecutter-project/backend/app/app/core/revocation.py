@@ -0,0 +1,163 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.sql import Executable
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.deleted_user import DeletedUser
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    A set of keys that answers "maybe" or "no": never a false negative, and
+    false positives at about `error_rate` once it holds `capacity` keys.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        size = -capacity * math.log(error_rate) / math.log(2) ** 2
+        self.size = max(int(math.ceil(size)), 1024)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: Any) -> Iterable[int]:
+        # Double hashing: k positions out of two independent 64-bit hashes
+        digest = hashlib.blake2b(str(key).encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key: Any) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: Any) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class RevocationList:
+    """
+    The users whose access token claims may be outdated.
+
+    A user whose is_active or is_superuser changes gets a new
+    `claims_changed_at`, and a deleted user a `DeletedUser` tombstone: the
+    claims of their tokens issued before are not to be trusted until those
+    expire, `window` later at most. A background thread loads those users
+    from the database every `interval` seconds into a bloom filter, so that a
+    check costs a few hashes. Writes made by this process are revoked at once;
+    the other processes see them at their next sync.
+
+    A false positive, or a list that could not sync for two intervals, only
+    sends the check to the database.
+    """
+
+    def __init__(self, window: timedelta, interval: float):
+        self.window = window
+        self.interval = interval
+        self._filter: Optional[BloomFilter] = None
+        self._synced = 0.0
+        # Revoked here, by monotonic expiry: kept across syncs, since the next
+        # one may run before the write is committed
+        self._local: Dict[Any, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def maybe_revoked(self, user_id: Any) -> bool:
+        with self._lock:
+            stale = time.monotonic() - self._synced > 2 * self.interval
+            if self._filter is None or stale:
+                return True
+            return user_id in self._filter
+
+    def revoke(self, *user_ids: Any) -> None:
+        expires = time.monotonic() + self.window.total_seconds()
+        with self._lock:
+            for user_id in user_ids:
+                self._local[user_id] = expires
+                if self._filter is not None:
+                    self._filter.add(user_id)
+
+    def tombstone(self, user_id: Any) -> List[Executable]:
+        """
+        The statements recording the deletion of `user_id` for the other
+        processes, to run in the transaction that deletes it: a `DeletedUser`
+        row takes the place of the user's, and those past the window go.
+        """
+        now = datetime.utcnow()
+        table = DeletedUser.__table__  # type: ignore
+        return [
+            delete(table).where(table.c.deleted_at <= now - self.window),
+            insert(table).values(id=user_id, deleted_at=now),
+        ]
+
+    def sync(self) -> None:
+        """
+        Rebuild the filter from the users whose claims changed, or who were
+        deleted, within the window.
+        """
+        since = datetime.utcnow() - self.window
+        db = SessionLocal()
+        try:
+            changed = select(User.id).where(User.claims_changed_at > since)
+            stmt = changed.union_all(
+                select(DeletedUser.id).where(DeletedUser.deleted_at > since)
+            )
+            revoked = [row.id for row in db.execute(stmt)]
+        finally:
+            db.close()
+        now = time.monotonic()
+        with self._lock:
+            self._local = {
+                user_id: expires
+                for user_id, expires in self._local.items()
+                if expires > now
+            }
+            bloom = BloomFilter(len(revoked) + len(self._local))
+            for user_id in [*revoked, *self._local]:
+                bloom.add(user_id)
+            self._filter = bloom
+            self._synced = now
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="token-revocations", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("Could not sync the revoked access tokens")
+            if self._stop.wait(self.interval):
+                return
+
+
+revocations = RevocationList(
+    window=timedelta(minutes=settings.ACCESS_TOKEN_CLAIMS_EXPIRE_MINUTES),
+    interval=settings.TOKEN_REVOCATION_SYNC_INTERVAL,
+)
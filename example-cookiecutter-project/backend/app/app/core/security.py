@@ -1,19 +1,47 @@
+import hashlib
+import secrets
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Dict, Optional, Tuple, Union
 
-from jose import jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.token_codec import token_codec
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def build_password_context() -> CryptContext:
+    """
+    Hash with the configured scheme and cost, and mark any other hash as
+    needing an update: other schemes, and the same scheme with other costs.
+    """
+    schemes = ["bcrypt", "argon2"]
+    schemes.sort(key=lambda scheme: scheme != settings.PASSWORD_HASH_SCHEME)
+    bcrypt_rounds = settings.PASSWORD_BCRYPT_ROUNDS
+    argon2_rounds = settings.PASSWORD_ARGON2_TIME_COST
+    return CryptContext(
+        schemes=schemes,
+        deprecated="auto",
+        bcrypt__default_rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        bcrypt__max_rounds=bcrypt_rounds,
+        argon2__default_rounds=argon2_rounds,
+        argon2__min_rounds=argon2_rounds,
+        argon2__max_rounds=argon2_rounds,
+        argon2__memory_cost=settings.PASSWORD_ARGON2_MEMORY_COST,
+        argon2__parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+    )
+
+
+pwd_context = build_password_context()
 
 
 ALGORITHM = "HS256"
 
 
 def create_access_token(
-    subject: Union[str, Any], expires_delta: timedelta = None
+    subject: Union[str, Any],
+    expires_delta: Optional[timedelta] = None,
+    claims: Optional[Dict[str, Any]] = None,
 ) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -21,14 +49,50 @@ def create_access_token(
         expire = datetime.utcnow() + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    to_encode = {"exp": expire, "sub": str(subject), **(claims or {})}
+    return token_codec.encode(to_encode)
+
+
+def create_user_access_token(user: Any) -> str:
+    """
+    An access token for the user. With ACCESS_TOKEN_CLAIMS, it also carries
+    whether they are active and superuser, and expires sooner.
+    """
+    if not settings.ACCESS_TOKEN_CLAIMS:
+        return create_access_token(user.id)
+    return create_access_token(
+        user.id,
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_CLAIMS_EXPIRE_MINUTES),
+        claims={"act": bool(user.is_active), "su": bool(user.is_superuser)},
+    )
+
+
+def create_refresh_token() -> str:
+    """
+    A new opaque refresh token. Only its `refresh_token_digest` is stored.
+    """
+    return secrets.token_urlsafe(32)
+
+
+def refresh_token_digest(token: str) -> bytes:
+    # The token is random: a plain hash is enough, no need for a password hash
+    return hashlib.sha256(token.encode()).digest()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password, and hash it again if the stored hash is outdated.
+
+    Returns whether it matched, and the new hash to store, if any.
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
@@ -0,0 +1,115 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import settings
+from app.models.user import User
+
+Snapshot = Tuple[Tuple[str, Any], ...]
+# What the auth dependencies and the endpoints returning the current user read:
+# never the password hash
+FIELDS = (
+    "id",
+    "email",
+    "full_name",
+    "is_active",
+    "is_superuser",
+    "version",
+    "claims_changed_at",
+)
+# Expiry (monotonic clock), user id, snapshot
+Entry = Tuple[float, int, Snapshot]
+
+
+class TokenCache:
+    """
+    The users of recently verified access tokens, by token digest.
+
+    A hit needs neither the JWT signature check nor the user SELECT. Entries
+    are immutable snapshots of the user's `FIELDS` and live until the token
+    expires or for `ttl` seconds, whichever comes first. Writes to a user drop
+    its entries in this process only: other workers may serve the previous
+    snapshot until their entries expire.
+    """
+
+    def __init__(self, ttl: int, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Entry]" = OrderedDict()
+        self._by_user: Dict[int, Set[bytes]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[User]:
+        """
+        A new detached copy of the token's user, or None on a miss.
+        """
+        if self.ttl <= 0:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, user_id, snapshot = entry
+            if expires < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+        user = User(**dict(snapshot))
+        make_transient_to_detached(user)
+        return user
+
+    def set(self, token: str, user: User, exp: Optional[int] = None) -> None:
+        """
+        Remember the user of a verified token, `exp` being its expiry timestamp.
+        """
+        lifetime = float(self.ttl)
+        if exp is not None:
+            lifetime = min(lifetime, exp - time.time())
+        if lifetime <= 0:
+            return
+        snapshot = tuple((field, getattr(user, field)) for field in FIELDS)
+        key = self._key(token)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + lifetime, user.id, snapshot)
+            self._by_user.setdefault(user.id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, *user_ids: Any) -> None:
+        """
+        Forget the tokens of these users, whose rows just changed.
+        """
+        with self._lock:
+            for user_id in user_ids:
+                for key in self._by_user.pop(user_id, set()):
+                    self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _drop(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_user.get(entry[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[entry[1]]
+
+
+token_cache = TokenCache(
+    ttl=settings.TOKEN_CACHE_TTL, max_size=settings.TOKEN_CACHE_MAX_SIZE
+)
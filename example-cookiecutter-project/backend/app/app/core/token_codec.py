@@ -0,0 +1,142 @@
+import base64
+import binascii
+import calendar
+import hashlib
+import hmac
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+
+# The header python-jose writes for HS256, byte for byte
+_HEADER = {"alg": "HS256", "typ": "JWT"}
+_TIME_CLAIMS = ("exp", "iat", "nbf")
+
+
+class TokenError(Exception):
+    """
+    The token is malformed, not signed with our key, expired or not yet valid.
+    """
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    try:
+        return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+    except (binascii.Error, ValueError):
+        raise TokenError("Invalid base64 segment")
+
+
+def _json(data: Any) -> bytes:
+    return json.dumps(data, separators=(",", ":"), sort_keys=True).encode()
+
+
+def _timestamp(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return calendar.timegm(value.utctimetuple())
+    return value
+
+
+def _number(claims: Dict[str, Any], name: str) -> Optional[float]:
+    value = claims.get(name)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TokenError(f"The {name} claim must be a number")
+    return value
+
+
+class HS256Codec:
+    """
+    JWT encoding and decoding, for HS256 with one key only.
+
+    Produces and accepts the same tokens as `jose.jwt` with
+    `algorithms=["HS256"]`, without its generic machinery. The HMAC key is
+    set up once and copied for each token. The header is compared as bytes
+    and only parsed when a token was made by another library. `exp` is
+    required, and `exp` and `nbf` must be numbers.
+    """
+
+    def __init__(self, key: str, leeway: int = 0):
+        self._mac = hmac.new(key.encode(), digestmod=hashlib.sha256)
+        self._header = _b64encode(_json(_HEADER))
+        self.leeway = leeway
+
+    def _signature(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        payload = {
+            name: _timestamp(value) if name in _TIME_CLAIMS else value
+            for name, value in claims.items()
+        }
+        signing_input = self._header + b"." + _b64encode(_json(payload))
+        signature = _b64encode(self._signature(signing_input))
+        return (signing_input + b"." + signature).decode()
+
+    def decode(self, token: str, *, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        The claims of a valid token; raise TokenError otherwise.
+        """
+        try:
+            raw = token.encode("ascii")
+        except (UnicodeEncodeError, AttributeError):
+            raise TokenError("Invalid token")
+        signing_input, _, signature = raw.rpartition(b".")
+        header, _, payload = signing_input.partition(b".")
+        if not header or not payload or b"." in payload:
+            raise TokenError("Invalid token")
+        if header != self._header:
+            try:
+                parsed = json.loads(_b64decode(header))
+            except ValueError:
+                raise TokenError("Invalid header")
+            if not isinstance(parsed, dict) or parsed.get("alg") != "HS256":
+                raise TokenError("The token is not signed with HS256")
+        if not hmac.compare_digest(
+            self._signature(signing_input), _b64decode(signature)
+        ):
+            raise TokenError("Invalid signature")
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            raise TokenError("Invalid payload")
+        if not isinstance(claims, dict):
+            raise TokenError("Invalid payload")
+        self._check_times(claims, time.time() if now is None else now)
+        return claims
+
+    def decode_many(self, tokens: Iterable[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        The claims of each token, or None for the invalid ones.
+
+        Reads the clock once for the whole batch.
+        """
+        now = time.time()
+        decoded: List[Optional[Dict[str, Any]]] = []
+        for token in tokens:
+            try:
+                decoded.append(self.decode(token, now=now))
+            except TokenError:
+                decoded.append(None)
+        return decoded
+
+    def _check_times(self, claims: Dict[str, Any], now: float) -> None:
+        exp = _number(claims, "exp")
+        if exp is None:
+            raise TokenError("The exp claim is required")
+        if exp <= now - self.leeway:
+            raise TokenError("The token has expired")
+        nbf = _number(claims, "nbf")
+        if nbf is not None and nbf > now + self.leeway:
+            raise TokenError("The token is not yet valid")
+
+
+token_codec = HS256Codec(settings.SECRET_KEY)
@@ -1,4 +1,8 @@
+from .async_crud_item import item as async_item
+from .async_crud_refresh_token import refresh_token as async_refresh_token
+from .async_crud_user import user as async_user
 from .crud_item import item
+from .crud_refresh_token import refresh_token
 from .crud_user import user
 
 # For a new basic set of CRUD operations you could just do
@@ -0,0 +1,364 @@
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+    cast,
+)
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import inspect, select
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.sql import Select
+
+from app.crud.base import (
+    _INSERTED,
+    CreateSchemaType,
+    ModelType,
+    UpdateSchemaType,
+    _after_cursor,
+    _assign_related,
+    _by_id,
+    _changed_values,
+    _column_values,
+    _conflict_insert,
+    _conflict_key,
+    _eager,
+    _entities,
+    _has_dependents,
+    _relationship,
+    _reports_inserted,
+    _rows,
+    _split_page,
+    _supports_returning,
+    _update_statement,
+    _upsert_values,
+    _with_keys,
+)
+from app.crud.cache import IdentityCache
+
+
+class AsyncCRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    def __init__(
+        self,
+        model: Type[ModelType],
+        cache: Optional[IdentityCache] = None,
+        load: Sequence[str] = (),
+    ):
+        """
+        CRUDBase counterpart for an `AsyncSession`.
+
+        **Parameters**
+
+        * `model`: A SQLAlchemy model class
+        * `cache`: An optional identity cache in front of `get`
+        * `load`: The relationships the list reads load by default. Lazy
+          loading does not work under asyncio, so anything serialized must be here
+        """
+        self.model = model
+        self.cache = cache
+        self.load = tuple(load)
+
+    async def get(
+        self, db: AsyncSession, id: Any, fields: Optional[Sequence[str]] = None
+    ) -> Optional[ModelType]:
+        if self.cache is not None:
+            row = self.cache.get(id)
+            if row is not None:
+                return self._detached(row)
+        if fields is None:
+            stmt = _by_id(self.model, id)
+        else:
+            stmt = select(*_entities(self.model, fields)).where(self.model.id == id)
+        db_obj = _rows(await db.execute(stmt), fields).first()
+        if self.cache is not None and db_obj is not None and fields is None:
+            self.cache.set(id, _column_values(db_obj))
+        return db_obj
+
+    def _invalidate(self, *ids: Any) -> None:
+        if self.cache is not None and ids:
+            self.cache.invalidate(*ids)
+
+    async def get_multi(
+        self,
+        db: AsyncSession,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        load: Optional[Sequence[str]] = None,
+    ) -> List[ModelType]:
+        stmt = select(*_entities(self.model, fields)).offset(skip).limit(limit)
+        stmt = stmt.options(*self._eager(fields, load))
+        return _rows(await db.execute(stmt), fields).all()
+
+    def _eager(
+        self, fields: Optional[Sequence[str]], load: Optional[Sequence[str]]
+    ) -> List[Any]:
+        return _eager(self.model, fields, self.load if load is None else load)
+
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        load: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        Keyset pagination ordered by `id`, see `CRUDBase.get_page`.
+        """
+        keys = [self.model.id]
+        stmt = select(*_entities(self.model, _with_keys(fields, keys)))
+        stmt = stmt.options(*self._eager(fields, load))
+        return await self._keyset_page(
+            db, stmt, keys=keys, cursor=cursor, limit=limit, fields=fields
+        )
+
+    async def _keyset_page(
+        self,
+        db: AsyncSession,
+        stmt: Select,
+        *,
+        keys: Sequence[Any],
+        cursor: Optional[str],
+        limit: int,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        if cursor is not None:
+            stmt = stmt.where(_after_cursor(keys, cursor))
+        result = await db.execute(stmt.order_by(*keys).limit(limit + 1))
+        return _split_page(_rows(result, fields).all(), keys, limit)
+
+    async def load_related(
+        self, db: AsyncSession, objs: Sequence[ModelType], name: str
+    ) -> None:
+        """
+        Load the relationship `name` of all `objs` with a single query.
+        """
+        prop, local_attr, remote, remote_attr = _relationship(self.model, name)
+        keys = {getattr(obj, local_attr) for obj in objs} - {None}
+        related: List[Any] = []
+        if keys:
+            stmt = select(prop.mapper.class_).where(remote.in_(keys))
+            related = (await db.execute(stmt)).scalars().all()
+        _assign_related(objs, prop, local_attr, related, remote_attr)
+
+    async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
+        obj_in_data = jsonable_encoder(obj_in)
+        return await self._insert_one(db, obj_in_data)
+
+    async def _insert_one(self, db: AsyncSession, row: Dict[str, Any]) -> ModelType:
+        db_objs = await self._insert_many(db, [row], batch_size=1)
+        return db_objs[0]
+
+    async def create_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[CreateSchemaType],
+        batch_size: int = 1000,
+    ) -> List[ModelType]:
+        rows = [jsonable_encoder(obj_in) for obj_in in objs_in]
+        return await self._insert_many(db, rows, batch_size=batch_size)
+
+    async def _insert_many(
+        self, db: AsyncSession, rows: List[Dict[str, Any]], *, batch_size: int
+    ) -> List[ModelType]:
+        if not rows:
+            return []
+        if not _supports_returning(db.sync_session):
+            db_objs = [self.model(**row) for row in rows]  # type: ignore
+            db.add_all(db_objs)
+            await db.flush()
+            await db.commit()
+            self._invalidate(*[db_obj.id for db_obj in db_objs])
+            return db_objs
+        table = self.model.__table__  # type: ignore
+        returned: List[Dict[str, Any]] = []
+        for start in range(0, len(rows), batch_size):
+            end = start + batch_size
+            stmt = table.insert().values(rows[start:end]).returning(*table.columns)
+            result = await db.execute(stmt)
+            returned.extend(dict(row._mapping) for row in result)
+        await db.commit()
+        self._invalidate(*[row["id"] for row in returned])
+        return [self._detached(row) for row in returned]
+
+    async def _insert_many_if_absent(
+        self,
+        db: AsyncSession,
+        rows: List[Dict[str, Any]],
+        conflict: Optional[Sequence[str]],
+        *,
+        batch_size: int,
+    ) -> List[ModelType]:
+        if not rows:
+            return []
+        table = self.model.__table__  # type: ignore
+        if not _supports_returning(db.sync_session):
+            # One row at a time, for the key of each row inserted
+            ids = []
+            for row in rows:
+                stmt = _conflict_insert(db.sync_session, table, row)
+                stmt = stmt.on_conflict_do_nothing(index_elements=conflict)
+                result = cast(CursorResult, await db.execute(stmt))
+                if result.rowcount == 1:
+                    ids.append(result.inserted_primary_key[0])
+            inserted = await db.execute(select(table).where(table.c.id.in_(ids)))
+            returned = [dict(row._mapping) for row in inserted]
+        else:
+            returned = []
+            for start in range(0, len(rows), batch_size):
+                end = start + batch_size
+                stmt = _conflict_insert(db.sync_session, table, rows[start:end])
+                stmt = stmt.on_conflict_do_nothing(index_elements=conflict)
+                batch = await db.execute(stmt.returning(*table.columns))
+                returned.extend(dict(row._mapping) for row in batch)
+        await db.commit()
+        self._invalidate(*[row["id"] for row in returned])
+        return [self._detached(row) for row in returned]
+
+    async def create_if_absent(
+        self,
+        db: AsyncSession,
+        *,
+        obj_in: CreateSchemaType,
+        conflict: Optional[Sequence[str]] = None,
+    ) -> Optional[ModelType]:
+        """
+        Create the row unless it breaks a unique constraint, see
+        `CRUDBase.create_if_absent`.
+        """
+        return await self._insert_if_absent(db, jsonable_encoder(obj_in), conflict)
+
+    async def _insert_if_absent(
+        self, db: AsyncSession, row: Dict[str, Any], conflict: Optional[Sequence[str]],
+    ) -> Optional[ModelType]:
+        table = self.model.__table__  # type: ignore
+        stmt = _conflict_insert(db.sync_session, table, row).on_conflict_do_nothing(
+            index_elements=conflict
+        )
+        if not _supports_returning(db.sync_session):
+            result = cast(CursorResult, await db.execute(stmt))
+            if result.rowcount != 1:
+                await db.commit()
+                return None
+            id = result.inserted_primary_key[0]
+            found = (await db.execute(select(table).where(table.c.id == id))).first()
+        else:
+            found = (await db.execute(stmt.returning(*table.columns))).first()
+        await db.commit()
+        if found is None:
+            return None
+        self._invalidate(found.id)
+        return self._detached(dict(found._mapping))
+
+    async def upsert(
+        self,
+        db: AsyncSession,
+        *,
+        obj_in: Union[CreateSchemaType, Dict[str, Any]],
+        conflict: Sequence[str],
+        update: Optional[Sequence[str]] = None,
+    ) -> Tuple[ModelType, bool]:
+        """
+        Create the row or update the one it conflicts with, see `CRUDBase.upsert`.
+        """
+        row = obj_in if isinstance(obj_in, dict) else jsonable_encoder(obj_in)
+        table = self.model.__table__  # type: ignore
+        stmt = _conflict_insert(db.sync_session, table, row)
+        if _reports_inserted(db.sync_session):
+            values = _upsert_values(table, row, conflict, update, stmt.excluded)
+            stmt = stmt.on_conflict_do_update(index_elements=conflict, set_=values)
+            result = await db.execute(stmt.returning(*table.columns, _INSERTED))
+            found = dict(result.one()._mapping)
+            inserted = found.pop("_inserted")
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=conflict)
+            inserted = cast(CursorResult, await db.execute(stmt)).rowcount == 1
+            key = _conflict_key(table, row, conflict)
+            if not inserted:
+                values = _upsert_values(table, row, conflict, update, row)
+                await db.execute(table.update().where(*key).values(values))
+            result = await db.execute(select(table).where(*key))
+            found = dict(result.one()._mapping)
+        await db.commit()
+        self._invalidate(found["id"])
+        return self._detached(found), inserted
+
+    def _detached(self, row: Dict[str, Any]) -> ModelType:
+        db_obj = self.model(**row)  # type: ignore
+        make_transient_to_detached(db_obj)
+        return db_obj
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: ModelType,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+    ) -> ModelType:
+        """
+        Write the changed columns only, with a version check, see `CRUDBase.update`.
+        """
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+        table = self.model.__table__  # type: ignore
+        changed = _changed_values(db_obj, table, update_data)
+        if not changed:
+            return db_obj
+        # Expired on rollback, and an expired attribute cannot load here
+        identity = inspect(db_obj).identity
+        id = identity[0] if identity else db_obj.id
+        if not _supports_returning(db.sync_session):
+            for field, value in changed.items():
+                setattr(db_obj, field, value)
+            db.add(db_obj)
+            try:
+                await db.commit()
+            except StaleDataError:
+                await db.rollback()
+                raise
+            finally:
+                self._invalidate(id)
+            await db.refresh(db_obj)
+            return db_obj
+        row = (await db.execute(_update_statement(table, id, db_obj, changed))).first()
+        if row is None:
+            await db.rollback()
+            self._invalidate(id)
+            raise StaleDataError(f"{table.name} {id} was changed or deleted")
+        await db.commit()
+        self._invalidate(id)
+        for field, value in row._mapping.items():
+            set_committed_value(db_obj, field, value)
+        return db_obj
+
+    async def remove(self, db: AsyncSession, *, id: int) -> Optional[ModelType]:
+        if not _supports_returning(db.sync_session) or _has_dependents(self.model):
+            obj = await db.get(self.model, id)
+            await db.delete(obj)
+            await db.commit()
+            self._invalidate(id)
+            return obj
+        table = self.model.__table__  # type: ignore
+        stmt = table.delete().where(table.c.id == id).returning(*table.columns)
+        row = (await db.execute(stmt)).first()
+        await db.commit()
+        self._invalidate(id)
+        if row is None:
+            return None
+        return self._detached(dict(row._mapping))
@@ -0,0 +1,176 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.async_base import AsyncCRUDBase
+from app.crud.base import (
+    _column_values,
+    _entities,
+    _rows,
+    _supports_returning,
+    _with_keys,
+)
+from app.crud.cache import build_cache
+from app.crud.crud_item import (
+    NotOwnedError,
+    _by_owner,
+    _explain_miss,
+    _owned_delete_statement,
+    _owned_update_statement,
+    _owned_values,
+)
+from app.models.item import Item
+from app.schemas.item import ItemCreate, ItemUpdate
+
+
+class AsyncCRUDItem(AsyncCRUDBase[Item, ItemCreate, ItemUpdate]):
+    async def create_with_owner(
+        self, db: AsyncSession, *, obj_in: ItemCreate, owner_id: int
+    ) -> Item:
+        obj_in_data = jsonable_encoder(obj_in)
+        return await self._insert_one(db, dict(obj_in_data, owner_id=owner_id))
+
+    async def create_many_with_owner(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[ItemCreate],
+        owner_id: int,
+        batch_size: int = 1000,
+    ) -> List[Item]:
+        rows = [dict(jsonable_encoder(obj_in), owner_id=owner_id) for obj_in in objs_in]
+        return await self._insert_many(db, rows, batch_size=batch_size)
+
+    async def get_multi_by_owner(
+        self,
+        db: AsyncSession,
+        *,
+        owner_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        load: Optional[Sequence[str]] = None,
+    ) -> List[Item]:
+        if fields is None:
+            stmt = _by_owner(owner_id, skip, limit, self._eager(fields, load))
+            return (await db.execute(stmt)).scalars().all()
+        query = select(*_entities(Item, fields)).where(Item.owner_id == owner_id)
+        result = await db.execute(query.offset(skip).limit(limit))
+        return _rows(result, fields).all()
+
+    async def get_page_by_owner(
+        self,
+        db: AsyncSession,
+        *,
+        owner_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        load: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Item], Optional[str]]:
+        keys = [Item.owner_id, Item.id]
+        stmt = select(*_entities(Item, _with_keys(fields, keys)))
+        stmt = stmt.options(*self._eager(fields, load))
+        stmt = stmt.where(Item.owner_id == owner_id)
+        return await self._keyset_page(
+            db, stmt, keys=keys, cursor=cursor, limit=limit, fields=fields
+        )
+
+    async def get_owned(
+        self,
+        db: AsyncSession,
+        *,
+        id: int,
+        owner_id: Optional[int],
+        fields: Optional[Sequence[str]] = None,
+    ) -> Optional[Item]:
+        """
+        Item `id` if `owner_id` owns it, see `CRUDItem.get_owned`.
+        """
+        if owner_id is None:
+            return await self.get(db, id=id, fields=fields)
+        if self.cache is not None:
+            row = self.cache.get(id)
+            if row is not None:
+                if row["owner_id"] != owner_id:
+                    raise NotOwnedError(f"item {id} belongs to another user")
+                return self._detached(row)
+        return await self._load_owned(db, id=id, owner_id=owner_id, fields=fields)
+
+    async def _load_owned(
+        self,
+        db: AsyncSession,
+        *,
+        id: int,
+        owner_id: Optional[int],
+        fields: Optional[Sequence[str]] = None,
+    ) -> Optional[Item]:
+        stmt = select(*_entities(Item, fields)).where(Item.id == id)
+        if owner_id is not None:
+            stmt = stmt.where(Item.owner_id == owner_id)
+        db_obj = _rows(await db.execute(stmt), fields).first()
+        if db_obj is None:
+            _explain_miss(id, owner_id, await self._owner_of(db, id))
+            return None
+        if self.cache is not None and fields is None:
+            self.cache.set(id, _column_values(db_obj))
+        return db_obj
+
+    async def update_owned(
+        self,
+        db: AsyncSession,
+        *,
+        id: int,
+        owner_id: Optional[int],
+        obj_in: Union[ItemUpdate, Dict[str, Any]],
+    ) -> Optional[Item]:
+        """
+        Update item `id` if `owner_id` owns it, see `CRUDItem.update_owned`.
+        """
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+        values = _owned_values(update_data)
+        if not values or not _supports_returning(db.sync_session):
+            db_obj = await self._load_owned(db, id=id, owner_id=owner_id)
+            if db_obj is None:
+                return None
+            return await self.update(db, db_obj=db_obj, obj_in=update_data)
+        stmt = _owned_update_statement(id, owner_id, values, update_data.get("version"))
+        row = (await db.execute(stmt)).first()
+        if row is None:
+            await db.rollback()
+            _explain_miss(id, owner_id, await self._owner_of(db, id))
+            return None
+        await db.commit()
+        self._invalidate(id)
+        return self._detached(dict(row._mapping))
+
+    async def remove_owned(
+        self, db: AsyncSession, *, id: int, owner_id: Optional[int]
+    ) -> Optional[Item]:
+        """
+        Delete item `id` if `owner_id` owns it, see `CRUDItem.remove_owned`.
+        """
+        if not _supports_returning(db.sync_session):
+            if await self.get_owned(db, id=id, owner_id=owner_id) is None:
+                return None
+            return await self.remove(db, id=id)
+        row = (await db.execute(_owned_delete_statement(id, owner_id))).first()
+        if row is None:
+            await db.rollback()
+            _explain_miss(id, owner_id, await self._owner_of(db, id))
+            return None
+        await db.commit()
+        self._invalidate(id)
+        return self._detached(dict(row._mapping))
+
+    async def _owner_of(self, db: AsyncSession, id: int) -> Any:
+        result = await db.execute(select(Item.owner_id).where(Item.id == id))
+        return result.first()
+
+
+item = AsyncCRUDItem(Item, cache=build_cache("item"))
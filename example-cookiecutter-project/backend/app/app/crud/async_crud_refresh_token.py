@@ -0,0 +1,63 @@
+import secrets
+from datetime import datetime
+from typing import Any, Optional, cast
+
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import refresh_token_digest
+from app.crud.base import _supports_returning
+from app.crud.crud_refresh_token import (
+    _claim_statement,
+    _new_row,
+    _owner_statement,
+    _prune_statement,
+    _revoke_reused_statement,
+)
+from app.models.refresh_token import RefreshToken
+
+
+class AsyncCRUDRefreshToken:
+    async def issue(
+        self, db: AsyncSession, *, user_id: int, family: Optional[bytes] = None
+    ) -> str:
+        now = datetime.utcnow()
+        token, row = _new_row(user_id, family or secrets.token_bytes(16), now)
+        await db.execute(_prune_statement(user_id, now))
+        await db.execute(RefreshToken.__table__.insert().values(row))  # type: ignore
+        await db.commit()
+        return token
+
+    async def owner(self, db: AsyncSession, *, token: str) -> Optional[int]:
+        stmt = _owner_statement(refresh_token_digest(token))
+        found = (await db.execute(stmt)).first()
+        return None if found is None else found.user_id
+
+    async def rotate(self, db: AsyncSession, *, token: str) -> Optional[str]:
+        token_hash = refresh_token_digest(token)
+        now = datetime.utcnow()
+        claimed = await self._claim(db, token_hash, now)
+        if claimed is None:
+            await db.execute(_revoke_reused_statement(token_hash, now))
+            await db.commit()
+            return None
+        new_token, row = _new_row(claimed.user_id, claimed.family, now)
+        await db.execute(RefreshToken.__table__.insert().values(row))  # type: ignore
+        await db.commit()
+        return new_token
+
+    async def _claim(
+        self, db: AsyncSession, token_hash: bytes, now: datetime
+    ) -> Optional[Any]:
+        table = RefreshToken.__table__  # type: ignore
+        stmt = _claim_statement(token_hash, now)
+        if _supports_returning(db.sync_session):
+            stmt = stmt.returning(table.c.user_id, table.c.family)
+            return (await db.execute(stmt)).first()
+        found = (await db.execute(_owner_statement(token_hash))).first()
+        if found is None or cast(CursorResult, await db.execute(stmt)).rowcount != 1:
+            return None
+        return found
+
+
+refresh_token = AsyncCRUDRefreshToken()
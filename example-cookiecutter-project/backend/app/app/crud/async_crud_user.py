@@ -0,0 +1,133 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Union
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core.hashing import password_hasher
+from app.core.revocation import revocations
+from app.core.token_cache import token_cache
+from app.crud.async_base import AsyncCRUDBase
+from app.crud.cache import build_cache
+from app.crud.crud_user import (
+    _by_email,
+    _claims_changed,
+    _email_conflict,
+    _new_user_row,
+)
+from app.models.user import User
+from app.schemas.token import Principal
+from app.schemas.user import UserCreate, UserUpdate
+
+
+class AsyncCRUDUser(AsyncCRUDBase[User, UserCreate, UserUpdate]):
+    # bcrypt is CPU-bound: it runs in the hashing processes to keep the loop free
+
+    async def get_by_email(self, db: AsyncSession, *, email: str) -> Optional[User]:
+        result = await db.execute(_by_email(email))
+        return result.scalars().first()
+
+    async def create(self, db: AsyncSession, *, obj_in: UserCreate) -> User:
+        hashed_password = await password_hasher.ahash(obj_in.password)
+        return await self._insert_one(db, _new_user_row(obj_in, hashed_password))
+
+    async def create_if_absent(
+        self,
+        db: AsyncSession,
+        *,
+        obj_in: UserCreate,
+        conflict: Optional[Sequence[str]] = ("email",),
+    ) -> Optional[User]:
+        if _email_conflict(conflict) and await self.get_by_email(
+            db, email=obj_in.email
+        ):
+            return None
+        hashed_password = await password_hasher.ahash(obj_in.password)
+        row = _new_user_row(obj_in, hashed_password)
+        return await self._insert_if_absent(db, row, conflict)
+
+    async def get_existing_emails(
+        self, db: AsyncSession, *, emails: Iterable[str]
+    ) -> Set[str]:
+        emails = list(set(emails))
+        if not emails:
+            return set()
+        result = await db.execute(select(User.email).where(User.email.in_(emails)))
+        return set(result.scalars())
+
+    async def create_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[UserCreate],
+        batch_size: int = 1000,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> List[User]:
+        hashed = await password_hasher.ahash_many(
+            [obj_in.password for obj_in in objs_in], progress=progress
+        )
+        rows = [_new_user_row(obj_in, h) for obj_in, h in zip(objs_in, hashed)]
+        return await self._insert_many_if_absent(
+            db, rows, ("email",), batch_size=batch_size
+        )
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: User,
+        obj_in: Union[UserUpdate, Dict[str, Any]],
+    ) -> User:
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+        if update_data.get("password"):
+            hashed_password = await password_hasher.ahash(update_data["password"])
+            del update_data["password"]
+            update_data["hashed_password"] = hashed_password
+        if _claims_changed(db_obj, update_data):
+            update_data["claims_changed_at"] = datetime.utcnow()
+            revocations.revoke(db_obj.id)
+        return await super().update(db, db_obj=db_obj, obj_in=update_data)
+
+    async def remove(self, db: AsyncSession, *, id: int) -> Optional[User]:
+        for stmt in revocations.tombstone(id):
+            await db.execute(stmt)
+        revocations.revoke(id)
+        return await super().remove(db, id=id)
+
+    def _invalidate(self, *ids: Any) -> None:
+        super()._invalidate(*ids)
+        token_cache.invalidate(*ids)
+
+    async def authenticate(
+        self, db: AsyncSession, *, email: str, password: str
+    ) -> Optional[User]:
+        user = await self.get_by_email(db, email=email)
+        if not user:
+            return None
+        valid, new_hash = await password_hasher.averify_and_update(
+            password, user.hashed_password
+        )
+        if not valid:
+            return None
+        if new_hash is not None:
+            # Hashed with outdated parameters, see `CRUDUser.authenticate`
+            try:
+                user = await super().update(
+                    db, db_obj=user, obj_in={"hashed_password": new_hash}
+                )
+            except StaleDataError:
+                pass
+        return user
+
+    def is_active(self, user: Union[User, Principal]) -> bool:
+        return user.is_active
+
+    def is_superuser(self, user: Union[User, Principal]) -> bool:
+        return user.is_superuser
+
+
+user = AsyncCRUDUser(User, cache=build_cache("user"))
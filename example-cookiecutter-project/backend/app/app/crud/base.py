@@ -1,9 +1,46 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import base64
+import json
+from collections import defaultdict
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    Boolean,
+    Table,
+    inspect,
+    lambda_stmt,
+    literal_column,
+    select,
+    tuple_,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import CursorResult, Result
+from sqlalchemy.orm import (
+    Query,
+    RelationshipProperty,
+    Session,
+    make_transient_to_detached,
+    selectinload,
+)
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm.interfaces import MANYTOONE
+from sqlalchemy.sql import Executable, Update
 
+from app.crud.cache import IdentityCache
 from app.db.base_class import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
@@ -11,8 +48,243 @@ CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encode the sort key of the last row of a page into an opaque cursor.
+    """
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Decode a cursor made by `encode_cursor`; raise ValueError if it is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def _after_cursor(keys: Sequence[Any], cursor: str) -> Any:
+    """
+    The criterion selecting the rows that sort after `cursor`.
+    """
+    values = decode_cursor(cursor, len(keys))
+    if len(keys) == 1:
+        return keys[0] > values[0]
+    return tuple_(*keys) > tuple_(*values)
+
+
+def _split_page(
+    rows: List[Any], keys: Sequence[Any], limit: int
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Cut a page fetched with one extra row and make the next cursor out of it.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], key.key) for key in keys])
+
+
+def _entities(model: Type[Base], fields: Optional[Sequence[str]]) -> List[Any]:
+    """
+    What to select: the whole model, or only the columns named in `fields`.
+
+    With `fields` the queries return plain rows instead of model instances.
+    """
+    if fields is None:
+        return [model]
+    return [getattr(model, field) for field in dict.fromkeys(fields)]
+
+
+def _rows(result: Result, fields: Optional[Sequence[str]]) -> Any:
+    """
+    Model instances, or plain rows when only some `fields` were selected.
+    """
+    return result if fields is not None else result.scalars()
+
+
+def _by_id(model: Type[Base], id: Any) -> Executable:
+    """
+    `SELECT` of the `model` row `id`.
+
+    A lambda statement: it is built, and its cache key computed, once per
+    model. Later calls only swap in `id` and hit the compiled cache.
+    """
+    # An Executable, though not to the SQLAlchemy stubs
+    return cast(Executable, lambda_stmt(lambda: select(model).where(model.id == id)))
+
+
+def _with_keys(
+    fields: Optional[Sequence[str]], keys: Sequence[Any]
+) -> Optional[List[str]]:
+    """
+    The `fields` to select, plus any sort key a page cursor is built from.
+    """
+    if fields is None:
+        return None
+    return list(fields) + [key.key for key in keys if key.key not in fields]
+
+
+def _eager(
+    model: Type[Base], fields: Optional[Sequence[str]], load: Sequence[str]
+) -> List[Any]:
+    """
+    Loader options fetching the `load` relationships of a page in one more query.
+
+    Column-only selects (`fields`) have no relationships to load.
+    """
+    if fields is not None:
+        return []
+    return [selectinload(getattr(model, name)) for name in load]
+
+
+def _relationship(
+    model: Type[Base], name: str
+) -> Tuple[RelationshipProperty, str, Any, str]:
+    """
+    The relationship `name` of `model`, with the attribute on each side of its
+    join and the related column to filter on.
+    """
+    prop = inspect(model).relationships[name]
+    ((local, remote),) = prop.local_remote_pairs
+    local_attr = prop.parent.get_property_by_column(local).key
+    remote_attr = prop.mapper.get_property_by_column(remote).key
+    return prop, local_attr, remote, remote_attr
+
+
+def _assign_related(
+    objs: Sequence[Any],
+    prop: RelationshipProperty,
+    local_attr: str,
+    related: Sequence[Any],
+    remote_attr: str,
+) -> None:
+    """
+    Set the relationship on each of `objs` from one batch of `related` rows.
+    """
+    groups: Dict[Any, List[Any]] = defaultdict(list)
+    for related_obj in related:
+        groups[getattr(related_obj, remote_attr)].append(related_obj)
+    for obj in objs:
+        matches = groups.get(getattr(obj, local_attr), [])
+        value = matches if prop.uselist else (matches[0] if matches else None)
+        set_committed_value(obj, prop.key, value)
+
+
+def _supports_returning(db: Session) -> bool:
+    # Postgres. SQLAlchemy 1.4 emits no RETURNING on SQLite, even on 3.35+
+    # which has it: SQLite always takes the ORM fallbacks
+    return bool(db.get_bind().dialect.implicit_returning)
+
+
+def _column_values(db_obj: Any) -> Dict[str, Any]:
+    mapper = inspect(db_obj).mapper
+    return {attr.key: getattr(db_obj, attr.key) for attr in mapper.column_attrs}
+
+
+def _changed_values(
+    db_obj: Any, table: Table, update_data: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    The columns of `update_data` whose value differs from the loaded one.
+    """
+    if "version" in table.c:
+        expected = update_data.get("version")
+        if expected is not None and expected != db_obj.version:
+            raise StaleDataError(
+                f"{table.name} {db_obj.id} is not at version {expected}"
+            )
+    loaded = inspect(db_obj).dict
+    return {
+        field: value
+        for field, value in update_data.items()
+        if field in table.c
+        and field != "version"
+        and (field not in loaded or loaded[field] != value)
+    }
+
+
+def _update_statement(
+    table: Table, id: Any, db_obj: Any, changed: Dict[str, Any]
+) -> Update:
+    stmt = table.update().where(table.c.id == id).values(changed)
+    if "version" in table.c:
+        stmt = stmt.where(table.c.version == db_obj.version).values(
+            version=table.c.version + 1
+        )
+    return stmt.returning(*table.columns)
+
+
+_CONFLICT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# Postgres only: a row inserted, rather than updated, has no deleting transaction
+_INSERTED = literal_column("xmax = 0", Boolean).label("_inserted")
+
+
+def _conflict_insert(
+    db: Session, table: Table, row: Union[Dict[str, Any], List[Dict[str, Any]]]
+) -> Any:
+    """
+    An `INSERT` of `row`, or of a list of rows, that takes `ON CONFLICT`
+    clauses, for the dialect: a postgresql or sqlite `Insert`, whose stubs
+    type those clauses as optional.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect not in _CONFLICT_INSERTS:
+        raise NotImplementedError(f"No INSERT ... ON CONFLICT on {dialect}")
+    return _CONFLICT_INSERTS[dialect](table).values(row)
+
+
+def _reports_inserted(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _upsert_values(
+    table: Table,
+    row: Dict[str, Any],
+    conflict: Sequence[str],
+    update: Optional[Sequence[str]],
+    source: Any,
+) -> Dict[str, Any]:
+    """
+    What an upsert writes over a conflicting row: the `update` columns, by
+    default all those of `row` but the conflict key, taken from `source`.
+    """
+    if update is None:
+        update = [name for name in row if name not in conflict and name != "id"]
+    values = {name: source[name] for name in update}
+    if "version" in table.c:
+        values["version"] = table.c.version + 1
+    return values
+
+
+def _conflict_key(
+    table: Table, row: Dict[str, Any], conflict: Sequence[str]
+) -> List[Any]:
+    return [table.c[name] == row[name] for name in conflict]
+
+
+def _has_dependents(model: Type[Base]) -> bool:
+    return any(
+        relationship.direction is not MANYTOONE
+        for relationship in inspect(model).relationships
+    )
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
-    def __init__(self, model: Type[ModelType]):
+    def __init__(
+        self,
+        model: Type[ModelType],
+        cache: Optional[IdentityCache] = None,
+        load: Sequence[str] = (),
+    ):
         """
         CRUD object with default methods to Create, Read, Update, Delete (CRUD).
 
@@ -20,23 +292,273 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
         * `model`: A SQLAlchemy model class
         * `schema`: A Pydantic model (schema) class
+        * `cache`: An optional identity cache in front of `get`
+        * `load`: The relationships the list reads load by default, in one
+          extra query per page instead of one per row
         """
         self.model = model
+        self.cache = cache
+        self.load = tuple(load)
+
+    def get(
+        self, db: Session, id: Any, fields: Optional[Sequence[str]] = None
+    ) -> Optional[ModelType]:
+        if self.cache is not None:
+            # Cache hits come back detached from the session
+            row = self.cache.get(id)
+            if row is not None:
+                return self._detached(row)
+        if fields is None:
+            stmt = _by_id(self.model, id)
+        else:
+            stmt = select(*_entities(self.model, fields)).where(self.model.id == id)
+        db_obj = _rows(db.execute(stmt), fields).first()
+        if self.cache is not None and db_obj is not None and fields is None:
+            self.cache.set(id, _column_values(db_obj))
+        return db_obj
 
-    def get(self, db: Session, id: Any) -> Optional[ModelType]:
-        return db.query(self.model).filter(self.model.id == id).first()
+    def _invalidate(self, *ids: Any) -> None:
+        if self.cache is not None and ids:
+            self.cache.invalidate(*ids)
 
     def get_multi(
-        self, db: Session, *, skip: int = 0, limit: int = 100
+        self,
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        load: Optional[Sequence[str]] = None,
     ) -> List[ModelType]:
-        return db.query(self.model).offset(skip).limit(limit).all()
+        query = db.query(*_entities(self.model, fields))
+        query = query.options(*self._eager(fields, load))
+        return query.offset(skip).limit(limit).all()
+
+    def _eager(
+        self, fields: Optional[Sequence[str]], load: Optional[Sequence[str]]
+    ) -> List[Any]:
+        return _eager(self.model, fields, self.load if load is None else load)
+
+    def get_page(
+        self,
+        db: Session,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        load: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        Keyset pagination ordered by `id`.
+
+        Returns the page and the cursor of the next one (None on the last page).
+        """
+        keys = [self.model.id]
+        query = db.query(*_entities(self.model, _with_keys(fields, keys)))
+        query = query.options(*self._eager(fields, load))
+        return self._keyset_page(query, keys=keys, cursor=cursor, limit=limit)
+
+    def _keyset_page(
+        self, query: Query, *, keys: Sequence[Any], cursor: Optional[str], limit: int,
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        if cursor is not None:
+            query = query.filter(_after_cursor(keys, cursor))
+        # Fetch one extra row to know whether there is a next page
+        rows = query.order_by(*keys).limit(limit + 1).all()
+        return _split_page(rows, keys, limit)
+
+    def load_related(self, db: Session, objs: Sequence[ModelType], name: str) -> None:
+        """
+        Load the relationship `name` of all `objs` with a single query.
+
+        For objects that did not come from an eager-loading read, such as
+        cache hits: they are detached and could not lazy-load it anyway.
+        """
+        prop, local_attr, remote, remote_attr = _relationship(self.model, name)
+        keys = {getattr(obj, local_attr) for obj in objs} - {None}
+        related: List[Any] = []
+        if keys:
+            related = db.query(prop.mapper.class_).filter(remote.in_(keys)).all()
+        _assign_related(objs, prop, local_attr, related, remote_attr)
 
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
-        db_obj = self.model(**obj_in_data)  # type: ignore
-        db.add(db_obj)
+        return self._insert_one(db, obj_in_data)
+
+    def _insert_one(self, db: Session, row: Dict[str, Any]) -> ModelType:
+        if not _supports_returning(db):
+            db_obj = self.model(**row)  # type: ignore
+            db.add(db_obj)
+            db.commit()
+            db.refresh(db_obj)
+            self._invalidate(db_obj.id)
+            return db_obj
+        # INSERT ... RETURNING hands back the generated values: no refresh needed
+        return self._insert_many(db, [row], batch_size=1)[0]
+
+    def create_many(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[CreateSchemaType],
+        batch_size: int = 1000,
+    ) -> List[ModelType]:
+        """
+        Create many rows in a single transaction.
+
+        Rows go out as multi-row `INSERT ... RETURNING`, `batch_size` rows per
+        statement, so there are no per-row commits or refreshes. Without
+        RETURNING, the ORM adds them all and fetches their keys in one flush.
+        """
+        rows = [jsonable_encoder(obj_in) for obj_in in objs_in]
+        return self._insert_many(db, rows, batch_size=batch_size)
+
+    def _insert_many(
+        self, db: Session, rows: List[Dict[str, Any]], *, batch_size: int
+    ) -> List[ModelType]:
+        if not rows:
+            return []
+        if not _supports_returning(db):
+            # Let the ORM fetch the generated keys row by row instead,
+            # and keep the loaded values by detaching before the commit
+            db_objs = [self.model(**row) for row in rows]  # type: ignore
+            db.add_all(db_objs)
+            db.flush()
+            for db_obj in db_objs:
+                db.expunge(db_obj)
+            db.commit()
+            self._invalidate(*[db_obj.id for db_obj in db_objs])
+            return db_objs
+        table = self.model.__table__  # type: ignore
+        returned: List[Dict[str, Any]] = []
+        for start in range(0, len(rows), batch_size):
+            end = start + batch_size
+            stmt = table.insert().values(rows[start:end]).returning(*table.columns)
+            returned.extend(dict(row._mapping) for row in db.execute(stmt))
         db.commit()
-        db.refresh(db_obj)
+        self._invalidate(*[row["id"] for row in returned])
+        return [self._detached(row) for row in returned]
+
+    def _insert_many_if_absent(
+        self,
+        db: Session,
+        rows: List[Dict[str, Any]],
+        conflict: Optional[Sequence[str]],
+        *,
+        batch_size: int,
+    ) -> List[ModelType]:
+        """
+        Insert the `rows` that break no unique constraint, over the `conflict`
+        columns or any, with `INSERT ... ON CONFLICT DO NOTHING`: those inserted.
+        """
+        if not rows:
+            return []
+        table = self.model.__table__  # type: ignore
+        if not _supports_returning(db):
+            # One row at a time, for the key of each row inserted
+            ids = []
+            for row in rows:
+                stmt = _conflict_insert(db, table, row)
+                stmt = stmt.on_conflict_do_nothing(index_elements=conflict)
+                result = cast(CursorResult, db.execute(stmt))
+                if result.rowcount == 1:
+                    ids.append(result.inserted_primary_key[0])
+            inserted = db.execute(select(table).where(table.c.id.in_(ids)))
+            returned = [dict(row._mapping) for row in inserted]
+        else:
+            returned = []
+            for start in range(0, len(rows), batch_size):
+                end = start + batch_size
+                stmt = _conflict_insert(db, table, rows[start:end])
+                stmt = stmt.on_conflict_do_nothing(index_elements=conflict)
+                batch = db.execute(stmt.returning(*table.columns))
+                returned.extend(dict(row._mapping) for row in batch)
+        db.commit()
+        self._invalidate(*[row["id"] for row in returned])
+        return [self._detached(row) for row in returned]
+
+    def create_if_absent(
+        self,
+        db: Session,
+        *,
+        obj_in: CreateSchemaType,
+        conflict: Optional[Sequence[str]] = None,
+    ) -> Optional[ModelType]:
+        """
+        Create the row unless it breaks a unique constraint: the row, or None.
+
+        A single `INSERT ... ON CONFLICT DO NOTHING` on the constraint over the
+        `conflict` columns, or on any: unlike a lookup followed by `create`,
+        concurrent calls can neither both create the row nor fail on it.
+        """
+        return self._insert_if_absent(db, jsonable_encoder(obj_in), conflict)
+
+    def _insert_if_absent(
+        self, db: Session, row: Dict[str, Any], conflict: Optional[Sequence[str]]
+    ) -> Optional[ModelType]:
+        table = self.model.__table__  # type: ignore
+        stmt = _conflict_insert(db, table, row).on_conflict_do_nothing(
+            index_elements=conflict
+        )
+        if not _supports_returning(db):
+            result = cast(CursorResult, db.execute(stmt))
+            if result.rowcount != 1:
+                db.commit()
+                return None
+            id = result.inserted_primary_key[0]
+            found = db.execute(select(table).where(table.c.id == id)).first()
+        else:
+            found = db.execute(stmt.returning(*table.columns)).first()
+        db.commit()
+        if found is None:
+            return None
+        self._invalidate(found.id)
+        return self._detached(dict(found._mapping))
+
+    def upsert(
+        self,
+        db: Session,
+        *,
+        obj_in: Union[CreateSchemaType, Dict[str, Any]],
+        conflict: Sequence[str],
+        update: Optional[Sequence[str]] = None,
+    ) -> Tuple[ModelType, bool]:
+        """
+        Create the row, or update the one it conflicts with on the `conflict`
+        columns: the row, and whether it was created.
+
+        The `update` columns are written, by default all those given but
+        `conflict`. On Postgres this is one `INSERT ... ON CONFLICT DO UPDATE`;
+        on SQLite, which has a single writer, the insert then the update.
+        """
+        row = obj_in if isinstance(obj_in, dict) else jsonable_encoder(obj_in)
+        table = self.model.__table__  # type: ignore
+        stmt = _conflict_insert(db, table, row)
+        if _reports_inserted(db):
+            values = _upsert_values(table, row, conflict, update, stmt.excluded)
+            stmt = stmt.on_conflict_do_update(index_elements=conflict, set_=values)
+            found = dict(
+                db.execute(stmt.returning(*table.columns, _INSERTED)).one()._mapping
+            )
+            inserted = found.pop("_inserted")
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=conflict)
+            inserted = cast(CursorResult, db.execute(stmt)).rowcount == 1
+            key = _conflict_key(table, row, conflict)
+            if not inserted:
+                values = _upsert_values(table, row, conflict, update, row)
+                db.execute(table.update().where(*key).values(values))
+            found = dict(db.execute(select(table).where(*key)).one()._mapping)
+        db.commit()
+        self._invalidate(found["id"])
+        return self._detached(found), inserted
+
+    def _detached(self, row: Dict[str, Any]) -> ModelType:
+        """
+        Build a detached instance from a full row, as if it had been loaded.
+        """
+        db_obj = self.model(**row)  # type: ignore
+        make_transient_to_detached(db_obj)
         return db_obj
 
     def update(
@@ -44,23 +566,65 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db: Session,
         *,
         db_obj: ModelType,
-        obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
     ) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
+        """
+        Write the changed columns only, in one `UPDATE ... RETURNING`.
+
+        When the table has a `version` column the row must still be at the
+        version `db_obj` was loaded with (or the `version` given in `obj_in`),
+        otherwise StaleDataError is raised instead of waiting on row locks.
+        """
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
-        db.add(db_obj)
+        table = self.model.__table__  # type: ignore
+        changed = _changed_values(db_obj, table, update_data)
+        if not changed:
+            return db_obj
+        # The identity survives expiration, unlike `db_obj.id` which would reload it
+        identity = inspect(db_obj).identity
+        id = identity[0] if identity else db_obj.id
+        if not _supports_returning(db):
+            # The mapper's version_id_col makes the ORM check the version
+            for field, value in changed.items():
+                setattr(db_obj, field, value)
+            db.add(db_obj)
+            try:
+                db.commit()
+            except StaleDataError:
+                db.rollback()
+                raise
+            finally:
+                self._invalidate(id)
+            db.refresh(db_obj)
+            return db_obj
+        row = db.execute(_update_statement(table, id, db_obj, changed)).first()
+        if row is None:
+            db.rollback()
+            self._invalidate(id)
+            raise StaleDataError(f"{table.name} {id} was changed or deleted")
+        # Only once committed: a read in between would cache the old row again
         db.commit()
-        db.refresh(db_obj)
+        self._invalidate(id)
+        for field, value in row._mapping.items():
+            set_committed_value(db_obj, field, value)
         return db_obj
 
-    def remove(self, db: Session, *, id: int) -> ModelType:
-        obj = db.query(self.model).get(id)
-        db.delete(obj)
+    def remove(self, db: Session, *, id: int) -> Optional[ModelType]:
+        if not _supports_returning(db) or _has_dependents(self.model):
+            # Let the ORM take care of the dependent rows
+            obj = db.query(self.model).get(id)
+            db.delete(obj)
+            db.commit()
+            self._invalidate(id)
+            return obj
+        table = self.model.__table__  # type: ignore
+        stmt = table.delete().where(table.c.id == id).returning(*table.columns)
+        row = db.execute(stmt).first()
         db.commit()
-        return obj
+        self._invalidate(id)
+        if row is None:
+            return None
+        return self._detached(dict(row._mapping))
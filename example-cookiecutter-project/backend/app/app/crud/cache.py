@@ -0,0 +1,210 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+Row = Dict[str, Any]
+
+
+class MemoryBackend:
+    """
+    In-process LRU store with per-entry expiry.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, Row]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Row]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, row = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(row)
+
+    def set(self, key: str, row: Row, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, dict(row))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    raise TypeError(f"Cannot cache a {type(value).__name__}")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if obj.keys() == {"$datetime"}:
+        return datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+class RedisBackend:
+    """
+    Store rows as JSON in Redis, or anything with the same get/set/delete API.
+
+    Datetimes are tagged, to come back as such rather than as strings. Unlike
+    pickle, reading a value runs no code that a writer to Redis could choose.
+
+    Expiry and eviction happen on the server, so `evictions` stays at 0.
+    """
+
+    def __init__(self, client: Any, prefix: str = "crud:"):
+        self.client = client
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Row]:
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return json.loads(value, object_hook=_decode)
+
+    def set(self, key: str, row: Row, ttl: int) -> None:
+        self.client.set(self.prefix + key, json.dumps(row, default=_encode), ex=ttl)
+
+    def delete(self, *keys: str) -> None:
+        self.client.delete(*[self.prefix + key for key in keys])
+
+
+class LocalRedis:
+    """
+    A stand-in for a Redis client, for tests and single-process setups.
+    """
+
+    def __init__(self) -> None:
+        self._values: Dict[str, Tuple[Optional[float], bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._values.get(name)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._values[name]
+                return None
+            return value
+
+    def set(self, name: str, value: Any, ex: Optional[int] = None) -> bool:
+        if isinstance(value, str):
+            value = value.encode()
+        expires = time.monotonic() + ex if ex is not None else None
+        with self._lock:
+            self._values[name] = (expires, value)
+        return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(self._values.pop(name, None) is not None for name in names)
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        with self._lock:
+            expires, value = self._values.get(name, (None, b"0"))
+            if expires is not None and expires < time.monotonic():
+                expires, value = None, b"0"
+            count = int(value) + amount
+            self._values[name] = (expires, str(count).encode())
+            return count
+
+    def expire(self, name: str, time_: int) -> bool:
+        with self._lock:
+            entry = self._values.get(name)
+            if entry is None:
+                return False
+            self._values[name] = (time.monotonic() + time_, entry[1])
+            return True
+
+
+class IdentityCache:
+    """
+    Read-through cache of one model's rows by primary key.
+
+    Holds plain column values, never session-bound objects.
+    """
+
+    def __init__(self, namespace: str, backend: Any, ttl: int):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _key(self, id: Any) -> str:
+        return f"{self.namespace}:{id}"
+
+    def get(self, id: Any) -> Optional[Row]:
+        row = self.backend.get(self._key(id))
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return row
+
+    def set(self, id: Any, row: Row) -> None:
+        self.backend.set(self._key(id), row, self.ttl)
+
+    def invalidate(self, *ids: Any) -> None:
+        self.invalidations += len(ids)
+        self.backend.delete(*[self._key(id) for id in ids])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self.backend.evictions,
+        }
+
+
+_backend: Any = None
+caches: Dict[str, IdentityCache] = {}
+
+
+def get_backend() -> Any:
+    global _backend
+    if _backend is None:
+        if settings.CRUD_CACHE_BACKEND == "redis":
+            import redis  # type: ignore
+
+            client = redis.Redis.from_url(settings.CRUD_CACHE_REDIS_URL)
+            _backend = RedisBackend(client)
+        else:
+            _backend = MemoryBackend(max_size=settings.CRUD_CACHE_MAX_SIZE)
+    return _backend
+
+
+def build_cache(namespace: str) -> Optional[IdentityCache]:
+    """
+    The identity cache for a model, or None when caching is not configured.
+    """
+    if not settings.CRUD_CACHE_BACKEND:
+        return None
+    if namespace in caches:
+        return caches[namespace]
+    ttl = settings.CRUD_CACHE_TTL.get(namespace, settings.CRUD_CACHE_DEFAULT_TTL)
+    cache = IdentityCache(namespace, get_backend(), ttl)
+    caches[namespace] = cache
+    return cache
@@ -1,34 +1,261 @@
-from typing import List
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union, cast
 
 from fastapi.encoders import jsonable_encoder
+from sqlalchemy import case, lambda_stmt, or_, select
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.sql import Delete, Executable, Update
 
-from app.crud.base import CRUDBase
+from app.crud.base import (
+    CRUDBase,
+    _column_values,
+    _entities,
+    _supports_returning,
+    _with_keys,
+)
+from app.crud.cache import build_cache
 from app.models.item import Item
 from app.schemas.item import ItemCreate, ItemUpdate
 
 
+class NotOwnedError(Exception):
+    """
+    The item exists, but belongs to another user.
+    """
+
+
+def _by_owner(
+    owner_id: int, skip: int, limit: int, options: Sequence[Any]
+) -> Executable:
+    """
+    A page of the items of `owner_id`, as a lambda statement built and
+    compiled once per set of loader `options`.
+    """
+    stmt = lambda_stmt(
+        lambda: select(Item).where(Item.owner_id == owner_id).offset(skip).limit(limit)
+    )
+    if options:
+        stmt = stmt.add_criteria(
+            lambda s: s.options(*options), track_on=[tuple(options)]
+        )
+    return cast(Executable, stmt)
+
+
+def _owned_update_statement(
+    id: int, owner_id: Optional[int], values: Dict[str, Any], version: Optional[int]
+) -> Update:
+    """
+    `UPDATE ... RETURNING` of item `id`, matching only if `owner_id` owns it
+    (any owner when None) and it is still at `version`, if given.
+
+    The `version` moves on only if one of the `values` differs from the stored
+    one, as `CRUDBase.update` writes nothing then.
+    """
+    table = Item.__table__  # type: ignore
+    changed = or_(*[table.c[field].is_distinct_from(v) for field, v in values.items()])
+    stmt = table.update().where(table.c.id == id)
+    if owner_id is not None:
+        stmt = stmt.where(table.c.owner_id == owner_id)
+    if version is not None:
+        stmt = stmt.where(table.c.version == version)
+    stmt = stmt.values(values).values(
+        version=case((changed, table.c.version + 1), else_=table.c.version)
+    )
+    return stmt.returning(*table.columns)
+
+
+def _owned_delete_statement(id: int, owner_id: Optional[int]) -> Delete:
+    table = Item.__table__  # type: ignore
+    stmt = table.delete().where(table.c.id == id)
+    if owner_id is not None:
+        stmt = stmt.where(table.c.owner_id == owner_id)
+    return stmt.returning(*table.columns)
+
+
+def _owned_values(update_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The columns of `update_data` an owner-scoped UPDATE sets, all but `version`.
+    """
+    table = Item.__table__  # type: ignore
+    return {
+        field: value
+        for field, value in update_data.items()
+        if field in table.c and field != "version"
+    }
+
+
+def _explain_miss(id: int, owner_id: Optional[int], found: Any) -> None:
+    """
+    Why an owner-scoped statement matched no row, given the `(owner_id,)` row
+    of the item if it exists: it is missing (returns), or raises NotOwnedError
+    when another user owns it, StaleDataError when a concurrent write won.
+    """
+    if found is None:
+        return
+    if owner_id is not None and found.owner_id != owner_id:
+        raise NotOwnedError(f"item {id} belongs to another user")
+    raise StaleDataError(f"item {id} was changed or deleted")
+
+
 class CRUDItem(CRUDBase[Item, ItemCreate, ItemUpdate]):
     def create_with_owner(
         self, db: Session, *, obj_in: ItemCreate, owner_id: int
     ) -> Item:
         obj_in_data = jsonable_encoder(obj_in)
-        db_obj = self.model(**obj_in_data, owner_id=owner_id)
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
+        return self._insert_one(db, dict(obj_in_data, owner_id=owner_id))
+
+    def create_many_with_owner(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[ItemCreate],
+        owner_id: int,
+        batch_size: int = 1000,
+    ) -> List[Item]:
+        rows = [dict(jsonable_encoder(obj_in), owner_id=owner_id) for obj_in in objs_in]
+        return self._insert_many(db, rows, batch_size=batch_size)
 
     def get_multi_by_owner(
-        self, db: Session, *, owner_id: int, skip: int = 0, limit: int = 100
+        self,
+        db: Session,
+        *,
+        owner_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        load: Optional[Sequence[str]] = None,
     ) -> List[Item]:
+        if fields is None:
+            stmt = _by_owner(owner_id, skip, limit, self._eager(fields, load))
+            return db.execute(stmt).scalars().all()
         return (
-            db.query(self.model)
+            db.query(*_entities(self.model, fields))
             .filter(Item.owner_id == owner_id)
             .offset(skip)
             .limit(limit)
             .all()
         )
 
+    def get_page_by_owner(
+        self,
+        db: Session,
+        *,
+        owner_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        load: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Item], Optional[str]]:
+        """
+        Keyset pagination over one owner's items, ordered by `(owner_id, id)`.
+        """
+        keys = [Item.owner_id, Item.id]
+        query = db.query(*_entities(self.model, _with_keys(fields, keys)))
+        query = query.options(*self._eager(fields, load))
+        query = query.filter(Item.owner_id == owner_id)
+        return self._keyset_page(query, keys=keys, cursor=cursor, limit=limit)
+
+    def get_owned(
+        self,
+        db: Session,
+        *,
+        id: int,
+        owner_id: Optional[int],
+        fields: Optional[Sequence[str]] = None,
+    ) -> Optional[Item]:
+        """
+        Item `id` if `owner_id` owns it (any owner when None), in one statement.
+
+        The owner is part of the WHERE clause. Only on a miss does a second,
+        primary key lookup tell a missing item (None) from one of another user
+        (NotOwnedError).
+        """
+        if owner_id is None:
+            return self.get(db, id=id, fields=fields)
+        if self.cache is not None:
+            row = self.cache.get(id)
+            if row is not None:
+                if row["owner_id"] != owner_id:
+                    raise NotOwnedError(f"item {id} belongs to another user")
+                return self._detached(row)
+        return self._load_owned(db, id=id, owner_id=owner_id, fields=fields)
+
+    def _load_owned(
+        self,
+        db: Session,
+        *,
+        id: int,
+        owner_id: Optional[int],
+        fields: Optional[Sequence[str]] = None,
+    ) -> Optional[Item]:
+        query = db.query(*_entities(self.model, fields)).filter(Item.id == id)
+        if owner_id is not None:
+            query = query.filter(Item.owner_id == owner_id)
+        db_obj = query.first()
+        if db_obj is None:
+            _explain_miss(id, owner_id, self._owner_of(db, id))
+            return None
+        if self.cache is not None and fields is None:
+            self.cache.set(id, _column_values(db_obj))
+        return db_obj
+
+    def update_owned(
+        self,
+        db: Session,
+        *,
+        id: int,
+        owner_id: Optional[int],
+        obj_in: Union[ItemUpdate, Dict[str, Any]],
+    ) -> Optional[Item]:
+        """
+        Update item `id` if `owner_id` owns it, in one `UPDATE ... RETURNING`.
+
+        The owner and the expected `version` are checked by the UPDATE itself;
+        errors are those of `get_owned`, plus StaleDataError on a version clash.
+        With no fields to write, or no RETURNING, the item is read then handed
+        to `update`.
+        """
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+        values = _owned_values(update_data)
+        if not values or not _supports_returning(db):
+            db_obj = self._load_owned(db, id=id, owner_id=owner_id)
+            if db_obj is None:
+                return None
+            return self.update(db, db_obj=db_obj, obj_in=update_data)
+        stmt = _owned_update_statement(id, owner_id, values, update_data.get("version"))
+        row = db.execute(stmt).first()
+        if row is None:
+            db.rollback()
+            _explain_miss(id, owner_id, self._owner_of(db, id))
+            return None
+        db.commit()
+        self._invalidate(id)
+        return self._detached(dict(row._mapping))
+
+    def remove_owned(
+        self, db: Session, *, id: int, owner_id: Optional[int]
+    ) -> Optional[Item]:
+        """
+        Delete item `id` if `owner_id` owns it, with a single `DELETE ... RETURNING`.
+        """
+        if not _supports_returning(db):
+            if self.get_owned(db, id=id, owner_id=owner_id) is None:
+                return None
+            return self.remove(db, id=id)
+        row = db.execute(_owned_delete_statement(id, owner_id)).first()
+        if row is None:
+            db.rollback()
+            _explain_miss(id, owner_id, self._owner_of(db, id))
+            return None
+        db.commit()
+        self._invalidate(id)
+        return self._detached(dict(row._mapping))
+
+    def _owner_of(self, db: Session, id: int) -> Any:
+        return db.query(Item.owner_id).filter(Item.id == id).first()
+
 
-item = CRUDItem(Item)
+item = CRUDItem(Item, cache=build_cache("item"))
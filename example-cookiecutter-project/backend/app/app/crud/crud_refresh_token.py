@@ -0,0 +1,138 @@
+import secrets
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple, cast
+
+from sqlalchemy import select
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Delete, Select, Update
+
+from app.core.config import settings
+from app.core.security import create_refresh_token, refresh_token_digest
+from app.crud.base import _supports_returning
+from app.models.refresh_token import RefreshToken
+
+
+def _new_row(user_id: int, family: bytes, now: datetime) -> Tuple[str, Dict[str, Any]]:
+    """
+    A new refresh token of `family`, and the row that stores it.
+    """
+    token = create_refresh_token()
+    row = dict(
+        token_hash=refresh_token_digest(token),
+        family=family,
+        user_id=user_id,
+        expires_at=now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    return token, row
+
+
+def _prune_statement(user_id: int, now: datetime) -> Delete:
+    table = RefreshToken.__table__  # type: ignore
+    return table.delete().where(table.c.user_id == user_id, table.c.expires_at <= now)
+
+
+def _claim_statement(token_hash: bytes, now: datetime) -> Update:
+    """
+    Spend the token, if it is neither spent nor expired: of concurrent claims,
+    only one matches.
+    """
+    table = RefreshToken.__table__  # type: ignore
+    return (
+        table.update()
+        .where(
+            table.c.token_hash == token_hash,
+            table.c.used_at.is_(None),
+            table.c.expires_at > now,
+        )
+        .values(used_at=now)
+    )
+
+
+def _owner_statement(token_hash: bytes) -> Select:
+    table = RefreshToken.__table__  # type: ignore
+    return select(table.c.user_id, table.c.family).where(
+        table.c.token_hash == token_hash
+    )
+
+
+def _revoke_reused_statement(token_hash: bytes, now: datetime) -> Delete:
+    """
+    Delete the family of the token if it was spent already, before the grace
+    window: within it, it is the concurrent claim that spent it.
+    """
+    table = RefreshToken.__table__  # type: ignore
+    grace = timedelta(seconds=settings.REFRESH_TOKEN_REUSE_GRACE_SECONDS)
+    spent = select(table.c.family).where(
+        table.c.token_hash == token_hash, table.c.used_at <= now - grace
+    )
+    return table.delete().where(table.c.family.in_(spent.scalar_subquery()))
+
+
+class CRUDRefreshToken:
+    """
+    Single-use refresh tokens, stored as their SHA-256 digest.
+
+    Refreshing spends the token and issues the next one of its family, the
+    tokens descending from one password login. A spent token presented again
+    has been copied, by an attacker or from a client that kept it: the whole
+    family is revoked, and both have to log in with the password again.
+    Unless it was spent within REFRESH_TOKEN_REUSE_GRACE_SECONDS, by the
+    concurrent refresh of the same client: only this refresh is refused.
+    """
+
+    def issue(
+        self, db: Session, *, user_id: int, family: Optional[bytes] = None
+    ) -> str:
+        """
+        A new refresh token for the user, starting a new family unless given one.
+
+        Also drops the user's expired tokens, so that the table only keeps
+        those that can still be presented.
+        """
+        now = datetime.utcnow()
+        token, row = _new_row(user_id, family or secrets.token_bytes(16), now)
+        db.execute(_prune_statement(user_id, now))
+        db.execute(RefreshToken.__table__.insert().values(row))  # type: ignore
+        db.commit()
+        return token
+
+    def owner(self, db: Session, *, token: str) -> Optional[int]:
+        """
+        The user of a refresh token, spent or not, or None if it is unknown.
+        """
+        found = db.execute(_owner_statement(refresh_token_digest(token))).first()
+        return None if found is None else found.user_id
+
+    def rotate(self, db: Session, *, token: str) -> Optional[str]:
+        """
+        Spend a refresh token: the next one, or None if the token is unknown,
+        expired or spent already (revoking its family).
+        """
+        token_hash = refresh_token_digest(token)
+        now = datetime.utcnow()
+        claimed = self._claim(db, token_hash, now)
+        if claimed is None:
+            db.execute(_revoke_reused_statement(token_hash, now))
+            db.commit()
+            return None
+        new_token, row = _new_row(claimed.user_id, claimed.family, now)
+        db.execute(RefreshToken.__table__.insert().values(row))  # type: ignore
+        db.commit()
+        return new_token
+
+    def _claim(self, db: Session, token_hash: bytes, now: datetime) -> Optional[Any]:
+        """
+        The `(user_id, family)` of the token, if this call spent it.
+        """
+        table = RefreshToken.__table__  # type: ignore
+        stmt = _claim_statement(token_hash, now)
+        if _supports_returning(db):
+            return db.execute(stmt.returning(table.c.user_id, table.c.family)).first()
+        found = db.execute(_owner_statement(token_hash)).first()
+        if found is None or cast(CursorResult, db.execute(stmt)).rowcount != 1:
+            return None
+        return found
+
+
+refresh_token = CRUDRefreshToken()
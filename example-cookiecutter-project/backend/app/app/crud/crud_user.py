@@ -1,28 +1,125 @@
-from typing import Any, Dict, Optional, Union
+from datetime import datetime
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Union,
+    cast,
+)
 
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.sql import Executable
 
-from app.core.security import get_password_hash, verify_password
+from app.core.hashing import password_hasher
+from app.core.revocation import revocations
+from app.core.token_cache import token_cache
 from app.crud.base import CRUDBase
+from app.crud.cache import build_cache
 from app.models.user import User
+from app.schemas.token import Principal
 from app.schemas.user import UserCreate, UserUpdate
 
 
+def _claims_changed(db_obj: User, update_data: Dict[str, Any]) -> bool:
+    """
+    Whether the update changes what access tokens claim about the user.
+    """
+    return any(
+        field in update_data
+        and update_data[field] is not None
+        and update_data[field] != getattr(db_obj, field)
+        for field in ("is_active", "is_superuser")
+    )
+
+
+def _new_user_row(obj_in: UserCreate, hashed_password: str) -> Dict[str, Any]:
+    return dict(
+        email=obj_in.email,
+        hashed_password=hashed_password,
+        full_name=obj_in.full_name,
+        is_superuser=obj_in.is_superuser,
+    )
+
+
+def _email_conflict(conflict: Optional[Sequence[str]]) -> bool:
+    """
+    Whether a taken email makes `create_if_absent` return None.
+    """
+    return conflict is None or "email" in conflict
+
+
+def _by_email(email: str) -> Executable:
+    # Looked up on every login: built and compiled once
+    stmt = lambda_stmt(lambda: select(User).where(User.email == email))
+    return cast(Executable, stmt)
+
+
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
-        return db.query(User).filter(User.email == email).first()
+        return db.execute(_by_email(email)).scalars().first()
+
+    def get_existing_emails(self, db: Session, *, emails: Iterable[str]) -> Set[str]:
+        """
+        Which of `emails` belong to a user already, in one query.
+        """
+        emails = list(set(emails))
+        if not emails:
+            return set()
+        stmt = select(User.email).where(User.email.in_(emails))
+        return set(db.execute(stmt).scalars())
 
     def create(self, db: Session, *, obj_in: UserCreate) -> User:
-        db_obj = User(
-            email=obj_in.email,
-            hashed_password=get_password_hash(obj_in.password),
-            full_name=obj_in.full_name,
-            is_superuser=obj_in.is_superuser,
+        return self._insert_one(
+            db, _new_user_row(obj_in, password_hasher.hash(obj_in.password))
         )
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
+
+    def create_if_absent(
+        self,
+        db: Session,
+        *,
+        obj_in: UserCreate,
+        conflict: Optional[Sequence[str]] = ("email",),
+    ) -> Optional[User]:
+        """
+        Create the user unless the email is taken: the user, or None.
+
+        A taken email is looked up first, so that it costs no password hash;
+        the insert still settles concurrent sign-ups with the same one.
+        """
+        if _email_conflict(conflict) and self.get_by_email(db, email=obj_in.email):
+            return None
+        row = _new_user_row(obj_in, password_hasher.hash(obj_in.password))
+        return self._insert_if_absent(db, row, conflict)
+
+    def create_many(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[UserCreate],
+        batch_size: int = 1000,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> List[User]:
+        """
+        Create many users in a single transaction: those created.
+
+        The passwords are hashed on all the hashing workers at once; `progress`
+        is called as they are. Emails must be unique within `objs_in`. A user
+        whose email is taken, even by a concurrent request, is left out by
+        `ON CONFLICT (email) DO NOTHING`: look up taken emails first to spare
+        their hashes.
+        """
+        hashed = password_hasher.hash_many(
+            [obj_in.password for obj_in in objs_in], progress=progress
+        )
+        rows = [_new_user_row(obj_in, h) for obj_in, h in zip(objs_in, hashed)]
+        return self._insert_many_if_absent(db, rows, ("email",), batch_size=batch_size)
 
     def update(
         self, db: Session, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]
@@ -31,25 +128,53 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        if update_data["password"]:
-            hashed_password = get_password_hash(update_data["password"])
+        if update_data.get("password"):
+            hashed_password = password_hasher.hash(update_data["password"])
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
+        if _claims_changed(db_obj, update_data):
+            update_data["claims_changed_at"] = datetime.utcnow()
+            # Other processes see it at their next sync of the revocations
+            revocations.revoke(db_obj.id)
         return super().update(db, db_obj=db_obj, obj_in=update_data)
 
+    def remove(self, db: Session, *, id: int) -> Optional[User]:
+        # Committed with the deletion, for the other processes to sync
+        for stmt in revocations.tombstone(id):
+            db.execute(stmt)
+        revocations.revoke(id)
+        return super().remove(db, id=id)
+
+    def _invalidate(self, *ids: Any) -> None:
+        super()._invalidate(*ids)
+        # Cached tokens would keep serving the old is_active/is_superuser
+        token_cache.invalidate(*ids)
+
     def authenticate(self, db: Session, *, email: str, password: str) -> Optional[User]:
         user = self.get_by_email(db, email=email)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        valid, new_hash = password_hasher.verify_and_update(
+            password, user.hashed_password
+        )
+        if not valid:
             return None
+        if new_hash is not None:
+            # Hashed with outdated parameters: upgrade it while we have the password
+            try:
+                user = super().update(
+                    db, db_obj=user, obj_in={"hashed_password": new_hash}
+                )
+            except StaleDataError:
+                # Changed meanwhile, by a password change maybe: rehash next time
+                pass
         return user
 
-    def is_active(self, user: User) -> bool:
+    def is_active(self, user: Union[User, Principal]) -> bool:
         return user.is_active
 
-    def is_superuser(self, user: User) -> bool:
+    def is_superuser(self, user: Union[User, Principal]) -> bool:
         return user.is_superuser
 
 
-user = CRUDUser(User)
+user = CRUDUser(User, cache=build_cache("user"))
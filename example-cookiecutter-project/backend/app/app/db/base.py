@@ -1,5 +1,7 @@
 # Import all the models, so that Base has them before being
 # imported by Alembic
 from app.db.base_class import Base  # noqa
+from app.models.deleted_user import DeletedUser  # noqa
 from app.models.item import Item  # noqa
+from app.models.refresh_token import RefreshToken  # noqa
 from app.models.user import User  # noqa
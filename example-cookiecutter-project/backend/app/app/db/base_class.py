@@ -7,6 +7,7 @@ from sqlalchemy.ext.declarative import as_declarative, declared_attr
 class Base:
     id: Any
     __name__: str
+
     # Generate __tablename__ automatically
     @declared_attr
     def __tablename__(cls) -> str:
@@ -0,0 +1,203 @@
+import abc
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+
+def _idle(engine: Engine) -> int:
+    pool = engine.pool
+    return pool.checkedin() if isinstance(pool, QueuePool) else 0
+
+
+class _HealthStats(abc.ABC):
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.checks = 0
+        self.pings = 0
+        self.disconnects = 0
+        self.failures = 0
+        self.last_check: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _checked(self, pings: int, dead: int) -> None:
+        with self._lock:
+            self.checks += 1
+            self.pings += pings
+            self.disconnects += dead
+            self.last_check = time.time()
+
+    def _failed(self) -> None:
+        with self._lock:
+            self.failures += 1
+
+    def _on_error(self, context: Any) -> None:
+        if context.is_disconnect:
+            self.wake()
+
+    @abc.abstractmethod
+    def wake(self) -> None:
+        """
+        Run the next check now, a disconnect having been hit.
+        """
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "health_checks": self.checks,
+                "health_check_pings": self.pings,
+                "health_check_disconnects": self.disconnects,
+                "health_check_failures": self.failures,
+                "last_health_check": self.last_check,
+            }
+
+
+class PoolHealthCheck(_HealthStats):
+    """
+    Pings the idle connections of an engine every `interval` seconds, in
+    place of `pool_pre_ping` on every checkout.
+
+    Checkouts then cost no extra round trip. A dead connection found by a
+    ping is a disconnect error: SQLAlchemy invalidates the whole pool, so the
+    check goes on reconnecting the connections opened before it, and requests
+    find fresh ones. A disconnect hit by a request wakes the check early.
+
+    The pool hands out its oldest idle connection first, so pinging as many
+    as are idle goes through each of them, give or take the ones requests
+    take meanwhile.
+    """
+
+    def __init__(self, engine: Engine, interval: float):
+        super().__init__(interval)
+        self.engine = engine
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        event.listen(engine, "handle_error", self._on_error)
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def check(self) -> int:
+        """
+        Ping the idle connections once: how many turned out to be dead.
+
+        Raises the error of a connection that cannot be replaced, with the
+        database down: the dead connections found until then still count.
+        """
+        pings = dead = 0
+        try:
+            for _ in range(_idle(self.engine)):
+                pings += 1
+                try:
+                    with self.engine.connect() as connection:
+                        connection.exec_driver_sql("SELECT 1")
+                except DBAPIError as e:
+                    if not e.connection_invalidated:
+                        raise
+                    dead += 1
+        finally:
+            self._checked(pings, dead)
+        return dead
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="db-pool-health", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.check()
+            except Exception:
+                # The database is down: the next check retries
+                self._failed()
+                logger.exception("Could not check the database connections")
+
+
+class AsyncPoolHealthCheck(_HealthStats):
+    """
+    The same as PoolHealthCheck for an asyncio engine, as a task of the loop
+    its connections belong to.
+    """
+
+    def __init__(self, engine: AsyncEngine, interval: float):
+        super().__init__(interval)
+        self.engine = engine
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        event.listen(engine.sync_engine, "handle_error", self._on_error)
+
+    def wake(self) -> None:
+        # Disconnects are handled on the loop's thread: no need for call_soon
+        if self._wake is not None:
+            self._wake.set()
+
+    async def acheck(self) -> int:
+        pings = dead = 0
+        try:
+            for _ in range(_idle(self.engine.sync_engine)):
+                pings += 1
+                try:
+                    async with self.engine.connect() as connection:
+                        await connection.exec_driver_sql("SELECT 1")
+                except DBAPIError as e:
+                    if not e.connection_invalidated:
+                        raise
+                    dead += 1
+        finally:
+            self._checked(pings, dead)
+        return dead
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_event_loop().create_task(self._arun())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _arun(self) -> None:
+        assert self._wake is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.acheck()
+            except Exception:
+                self._failed()
+                logger.exception("Could not check the database connections")
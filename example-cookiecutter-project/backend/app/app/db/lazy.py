@@ -0,0 +1,37 @@
+from typing import Any, Callable, Optional
+
+
+class LazySession:
+    """
+    Stands in for a session, and opens it on first use.
+
+    The session of a request that never queries, say because its user came
+    from the token cache, is never created. The session checks out its
+    connection on its first statement and gives it back on commit or on
+    `close`, after which any use opens a new one.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._session: Optional[Any] = None
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._session is None:
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    def close(self) -> None:
+        session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+
+class AsyncLazySession(LazySession):
+    async def close(self) -> None:  # type: ignore
+        session, self._session = self._session, None
+        if session is not None:
+            await session.close()
@@ -0,0 +1,158 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Type
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import Pool, QueuePool
+
+# Upper bounds, in seconds, of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolMetrics:
+    """
+    Counters of an engine's connection pool, from its events and checkouts.
+
+    The checkout wait is how long getting a connection took: next to nothing
+    when one is idle, the time to connect when the pool grows, and queueing
+    once it is exhausted. Its histogram and the live figures of the pool are
+    what to size `DB_POOL_SIZE` and `DB_MAX_OVERFLOW` by.
+    """
+
+    def __init__(self, buckets: Sequence[float] = WAIT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.wait_counts = [0] * (len(self.buckets) + 1)
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+        self.max_in_use = 0
+        self.max_overflow = 0
+        self._engine: Optional[Engine] = None
+        self._lock = threading.Lock()
+
+    def attach(self, engine: Engine) -> None:
+        """
+        Follow the pool of `engine`, and the pools it is recreated with.
+        """
+        self._engine = engine
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        event.listen(engine, "soft_invalidate", self._on_soft_invalidate)
+
+    def observe_wait(self, seconds: float) -> None:
+        index = next(
+            (i for i, bound in enumerate(self.buckets) if seconds <= bound),
+            len(self.buckets),
+        )
+        with self._lock:
+            self.wait_counts[index] += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def observe_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def _on_connect(self, dbapi_connection: Any, connection_record: Any) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(
+        self, dbapi_connection: Any, connection_record: Any, connection_proxy: Any
+    ) -> None:
+        live = self._live()
+        with self._lock:
+            self.max_in_use = max(self.max_in_use, live.get("in_use", 0))
+            self.max_overflow = max(self.max_overflow, live.get("overflow", 0))
+
+    def _on_invalidate(
+        self, dbapi_connection: Any, connection_record: Any, exception: Any
+    ) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def _on_soft_invalidate(
+        self, dbapi_connection: Any, connection_record: Any, exception: Any
+    ) -> None:
+        with self._lock:
+            self.soft_invalidations += 1
+
+    def _live(self) -> Dict[str, int]:
+        pool = self._engine.pool if self._engine is not None else None
+        if not isinstance(pool, QueuePool):
+            return {}
+        return {
+            "size": pool.size(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        }
+
+    def histogram(self) -> Dict[str, int]:
+        """
+        Cumulative checkout counts by wait upper bound, as Prometheus has them.
+        """
+        histogram: Dict[str, int] = {}
+        total = 0
+        with self._lock:
+            counts: List[int] = list(self.wait_counts)
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], counts):
+            total += count
+            histogram[bound] = total
+        return histogram
+
+    def stats(self) -> Dict[str, Any]:
+        histogram = self.histogram()
+        checkouts = histogram["+Inf"]
+        with self._lock:
+            return {
+                **self._live(),
+                "checkouts": checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "soft_invalidations": self.soft_invalidations,
+                "max_in_use": self.max_in_use,
+                "max_overflow": self.max_overflow,
+                "mean_wait_seconds": self.wait_seconds / (checkouts or 1),
+                "max_wait_seconds": self.max_wait_seconds,
+                "wait_seconds_histogram": histogram,
+            }
+
+
+class _TimedCheckout:
+    """
+    Times getting a connection from the pool, queueing included.
+    """
+
+    metrics: PoolMetrics
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()  # type: ignore
+        except TimeoutError:
+            self.metrics.observe_timeout()
+            raise
+        self.metrics.observe_wait(time.perf_counter() - started)
+        return record
+
+
+def timed_pool_class(pool_class: Type[Pool], metrics: PoolMetrics) -> Type[Pool]:
+    """
+    A subclass of `pool_class` reporting its checkout waits to `metrics`.
+
+    A class attribute rather than an instance one, since disposing of an
+    engine recreates its pool from the class.
+    """
+    return type(  # type: ignore
+        f"Timed{pool_class.__name__}",
+        (_TimedCheckout, pool_class),
+        {"metrics": metrics},
+    )
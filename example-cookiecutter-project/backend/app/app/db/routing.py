@@ -0,0 +1,177 @@
+import itertools
+import logging
+import math
+import threading
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql import ClauseElement
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind, or 0 when it has replayed all it received
+_POSTGRES_LAG = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery()
+        OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+
+def _lag(connection: Connection) -> float:
+    if connection.dialect.name != "postgresql":
+        return 0.0
+    lag = connection.exec_driver_sql(_POSTGRES_LAG).scalar()
+    return float(lag or 0.0)
+
+
+def _in_use(engine: Engine) -> int:
+    pool = engine.pool
+    return pool.checkedout() if isinstance(pool, QueuePool) else 0
+
+
+def _is_read(clause: Any) -> bool:
+    return bool(getattr(clause, "is_select", False)) and (
+        getattr(clause, "_for_update_arg", None) is None
+    )
+
+
+class ReplicaRouter:
+    """
+    Picks the replica a read-only session reads from.
+
+    Replicas lagging more than `max_lag` seconds behind the primary, or that
+    could not be reached, are left out until they catch up; with none left,
+    reads fall back to the primary. The lags are measured every `interval`
+    seconds by a background thread. Routers of the same replicas through
+    another driver, in the same order, share the measures by sharing `lags`.
+    """
+
+    def __init__(
+        self,
+        primary: Engine,
+        replicas: Sequence[Engine],
+        *,
+        balancing: str = "round_robin",
+        max_lag: float = 5.0,
+        interval: float = 5.0,
+        lags: Optional[List[float]] = None,
+    ):
+        if balancing not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica balancing: {balancing}")
+        self.primary = primary
+        self.replicas = list(replicas)
+        if lags is not None and len(lags) != len(self.replicas):
+            raise ValueError(
+                f"{len(lags)} lags shared between {len(self.replicas)} replicas"
+            )
+        self.balancing = balancing
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lags = lags if lags is not None else [0.0] * len(self.replicas)
+        self.reads = [0] * len(self.replicas)
+        self.fallbacks = 0
+        self._turn = itertools.count()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def pick(self) -> Engine:
+        candidates = [
+            index for index, lag in enumerate(self.lags) if lag <= self.max_lag
+        ]
+        if not candidates:
+            if self.replicas:
+                self.fallbacks += 1
+            return self.primary
+        if self.balancing == "least_connections":
+            index = min(candidates, key=lambda i: _in_use(self.replicas[i]))
+        else:
+            index = candidates[next(self._turn) % len(candidates)]
+        self.reads[index] += 1
+        return self.replicas[index]
+
+    def check_lag(self) -> None:
+        for index, replica in enumerate(self.replicas):
+            try:
+                with replica.connect() as connection:
+                    self.lags[index] = _lag(connection)
+            except Exception:
+                logger.exception(f"Could not measure the lag of replica {index}")
+                self.lags[index] = math.inf
+
+    def stats(self) -> List[Any]:
+        """
+        The lag and reads of each replica: a lag of None if it is unreachable.
+        """
+        return [
+            {"lag_seconds": lag if math.isfinite(lag) else None, "reads": reads}
+            for lag, reads in zip(self.lags, self.reads)
+        ]
+
+    def start(self) -> None:
+        if self._thread is not None or not self.replicas:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="db-replica-lag", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def _run(self) -> None:
+        while True:
+            self.check_lag()
+            if self._stop.wait(self.interval):
+                return
+
+
+class RoutingSession(Session):
+    """
+    A session whose reads go to a replica once marked with `read_from_replica`.
+
+    The replica is picked on the first read and kept for the session, so that
+    its reads see one consistent state. Writes, `SELECT ... FOR UPDATE` and
+    anything but a SELECT go to the primary, and so do the reads that follow
+    a write: a session reads its own writes.
+    """
+
+    def __init__(
+        self, *args: Any, router: Optional[ReplicaRouter] = None, **kwargs: Any
+    ):
+        super().__init__(*args, **kwargs)
+        self.router = router
+
+    def get_bind(
+        self,
+        mapper: Optional[Any] = None,
+        clause: Optional[ClauseElement] = None,
+        bind: Optional[Any] = None,
+        _sa_skip_events: Optional[Any] = None,
+        _sa_skip_for_implicit_returning: bool = False,
+    ) -> Any:
+        flushing = self._flushing  # type: ignore
+        if flushing or (clause is not None and not _is_read(clause)):
+            self.info.pop("read_only", None)
+        elif self.router is not None and self.info.get("read_only"):
+            if "replica" not in self.info:
+                self.info["replica"] = self.router.pick()
+            return self.info["replica"]
+        return super().get_bind(
+            mapper, clause, bind, _sa_skip_events, _sa_skip_for_implicit_returning
+        )
+
+
+def read_from_replica(db: Any) -> None:
+    """
+    Send the reads of `db`, a RoutingSession or an AsyncSession over one, to
+    a replica until it writes.
+    """
+    db.info["read_only"] = True
@@ -1,7 +1,99 @@
+from typing import Any, Dict, Type, Union
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
 
 from app.core.config import settings
+from app.db.health import AsyncPoolHealthCheck, PoolHealthCheck
+from app.db.pool_metrics import PoolMetrics, timed_pool_class
+from app.db.routing import ReplicaRouter, RoutingSession
+
+# By engine: "sync", "async", "replica0", "async_replica0"...
+pool_metrics: Dict[str, PoolMetrics] = {}
+pool_health: Dict[str, Union[PoolHealthCheck, AsyncPoolHealthCheck]] = {}
+
+
+def _pool_options(pool_class: Type[Pool], metrics: PoolMetrics) -> Dict[str, Any]:
+    return dict(
+        poolclass=timed_pool_class(pool_class, metrics),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_HEALTH_CHECK == "pre_ping",
+    )
+
+
+def _engine(name: str, uri: str) -> Engine:
+    metrics = pool_metrics[name] = PoolMetrics()
+    engine = create_engine(uri, **_pool_options(QueuePool, metrics))
+    metrics.attach(engine)
+    pool_health[name] = PoolHealthCheck(engine, settings.DB_POOL_HEALTH_CHECK_INTERVAL)
+    return engine
+
+
+def _connect_args(uri: str) -> Dict[str, Any]:
+    # asyncpg's statement cache: other drivers, such as aiosqlite, reject it
+    if make_url(uri).get_driver_name() != "asyncpg":
+        return {}
+    return {"prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE}
+
+
+def _async_engine(name: str, uri: str) -> AsyncEngine:
+    metrics = pool_metrics[name] = PoolMetrics()
+    engine = create_async_engine(
+        uri,
+        connect_args=_connect_args(uri),
+        **_pool_options(AsyncAdaptedQueuePool, metrics),
+    )
+    metrics.attach(engine.sync_engine)
+    pool_health[name] = AsyncPoolHealthCheck(
+        engine, settings.DB_POOL_HEALTH_CHECK_INTERVAL
+    )
+    return engine
+
+
+engine = _engine("sync", str(settings.SQLALCHEMY_DATABASE_URI))
+replicas = ReplicaRouter(
+    engine,
+    [
+        _engine(f"replica{index}", uri)
+        for index, uri in enumerate(settings.DB_REPLICA_URIS)
+    ],
+    balancing=settings.DB_REPLICA_BALANCING,
+    max_lag=settings.DB_REPLICA_MAX_LAG,
+    interval=settings.DB_REPLICA_LAG_INTERVAL,
+)
+SessionLocal = sessionmaker(
+    class_=RoutingSession,
+    router=replicas,
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+)
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = _async_engine("async", str(settings.ASYNC_SQLALCHEMY_DATABASE_URI))
+# The same replicas through asyncpg: the sync router measures their lag
+async_replicas = ReplicaRouter(
+    async_engine.sync_engine,
+    [
+        _async_engine(f"async_replica{index}", uri).sync_engine
+        for index, uri in enumerate(settings.ASYNC_DB_REPLICA_URIS or [])
+    ],
+    balancing=settings.DB_REPLICA_BALANCING,
+    max_lag=settings.DB_REPLICA_MAX_LAG,
+    lags=replicas.lags,
+)
+# Nothing may load implicitly under asyncio, so objects are not expired on commit
+AsyncSessionLocal = sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    router=async_replicas,
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+)
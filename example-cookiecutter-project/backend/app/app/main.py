@@ -1,13 +1,40 @@
 from fastapi import FastAPI
+from sqlalchemy.orm.exc import StaleDataError
 from starlette.middleware.cors import CORSMiddleware
 
-from app.api.api_v1.api import api_router
+from app.api.api_v1.api import api_router, async_api_router
+from app.api.errors import (
+    not_owned_handler,
+    password_hash_busy_handler,
+    rate_limited_handler,
+    stale_data_handler,
+)
 from app.core.config import settings
+from app.core.hashing import PasswordHashPoolBusy, password_hasher
+from app.core.rate_limit import RateLimited
+from app.core.revocation import revocations
+from app.crud.crud_item import NotOwnedError
+from app.db.session import pool_health, replicas
 
 app = FastAPI(
     title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json"
 )
 
+app.add_exception_handler(StaleDataError, stale_data_handler)
+app.add_exception_handler(NotOwnedError, not_owned_handler)
+app.add_exception_handler(PasswordHashPoolBusy, password_hash_busy_handler)
+app.add_exception_handler(RateLimited, rate_limited_handler)
+app.add_event_handler("shutdown", password_hasher.shutdown)
+if settings.ACCESS_TOKEN_CLAIMS:
+    app.add_event_handler("startup", revocations.start)
+    app.add_event_handler("shutdown", revocations.stop)
+if settings.DB_POOL_HEALTH_CHECK == "background":
+    for health in pool_health.values():
+        app.add_event_handler("startup", health.start)
+        app.add_event_handler("shutdown", health.stop)
+app.add_event_handler("startup", replicas.start)
+app.add_event_handler("shutdown", replicas.stop)
+
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -18,4 +45,7 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
-app.include_router(api_router, prefix=settings.API_V1_STR)
+if settings.ASYNC_ENDPOINTS:
+    app.include_router(async_api_router, prefix=settings.API_V1_STR)
+else:
+    app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -1,2 +1,4 @@
+from .deleted_user import DeletedUser
 from .item import Item
+from .refresh_token import RefreshToken
 from .user import User
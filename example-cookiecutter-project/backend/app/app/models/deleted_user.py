@@ -0,0 +1,10 @@
+from sqlalchemy import Column, DateTime, Integer
+
+from app.db.base_class import Base
+
+
+class DeletedUser(Base):
+    # The id the user had: access tokens issued to it can still be valid
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    # Kept for as long as the claims of those tokens, for the revocations
+    deleted_at = Column(DateTime, nullable=False, index=True)
@@ -1,6 +1,6 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
-from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy import Column, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import Base
@@ -10,8 +10,14 @@ if TYPE_CHECKING:
 
 
 class Item(Base):
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True)
-    description = Column(String, index=True)
-    owner_id = Column(Integer, ForeignKey("user.id"))
-    owner = relationship("User", back_populates="items")
+    id: int = Column(Integer, primary_key=True)
+    title: str = Column(String)
+    description: Optional[str] = Column(String)
+    owner_id: int = Column(Integer, ForeignKey("user.id"))
+    owner: "User" = relationship("User", back_populates="items")
+    # Bumped on every update, for optimistic concurrency control
+    version: int = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+    # Serves the owner filters and the (owner_id, id) keyset order of the list reads
+    __table_args__ = (Index("ix_item_owner_id_id", "owner_id", "id"),)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, LargeBinary
+
+from app.db.base_class import Base
+
+
+class RefreshToken(Base):
+    id = Column(Integer, primary_key=True)
+    # SHA-256 of the token: the token itself is never stored
+    token_hash = Column(LargeBinary(32), nullable=False, unique=True)
+    # The tokens rotated out of one login share a family, revoked as a whole
+    family = Column(LargeBinary(16), nullable=False, index=True)
+    user_id = Column(
+        Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    expires_at = Column(DateTime, nullable=False)
+    # When it was spent: spent tokens are kept until they expire, to detect
+    # their reuse
+    used_at = Column(DateTime)
@@ -1,6 +1,7 @@
-from typing import TYPE_CHECKING
+from datetime import datetime
+from typing import TYPE_CHECKING, List, Optional
 
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import Base
@@ -10,10 +11,16 @@ if TYPE_CHECKING:
 
 
 class User(Base):
-    id = Column(Integer, primary_key=True, index=True)
-    full_name = Column(String, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
-    hashed_password = Column(String, nullable=False)
-    is_active = Column(Boolean(), default=True)
-    is_superuser = Column(Boolean(), default=False)
-    items = relationship("Item", back_populates="owner")
+    id: int = Column(Integer, primary_key=True)
+    full_name: Optional[str] = Column(String)
+    email: str = Column(String, unique=True, index=True, nullable=False)
+    hashed_password: str = Column(String, nullable=False)
+    is_active: bool = Column(Boolean(), default=True)
+    is_superuser: bool = Column(Boolean(), default=False)
+    # When is_active or is_superuser last changed, outdating the tokens' claims
+    claims_changed_at: Optional[datetime] = Column(DateTime, index=True)
+    items: List["Item"] = relationship("Item", back_populates="owner")
+    # Bumped on every update, for optimistic concurrency control
+    version: int = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
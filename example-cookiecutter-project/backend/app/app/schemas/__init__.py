@@ -1,4 +1,5 @@
-from .item import Item, ItemCreate, ItemInDB, ItemUpdate
+from .bulk import BulkRowError
+from .item import Item, ItemBulkResult, ItemCreate, ItemInDB, ItemUpdate
 from .msg import Msg
-from .token import Token, TokenPayload
-from .user import User, UserCreate, UserInDB, UserUpdate
+from .token import Principal, Token, TokenPayload
+from .user import User, UserBulkResult, UserCreate, UserInDB, UserUpdate
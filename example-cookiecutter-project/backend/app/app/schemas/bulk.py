@@ -0,0 +1,9 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+# A row of a bulk request that was rejected
+class BulkRowError(BaseModel):
+    index: int
+    detail: Any
@@ -1,7 +1,9 @@
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel
 
+from .bulk import BulkRowError
+
 
 # Shared properties
 class ItemBase(BaseModel):
@@ -16,7 +18,7 @@ class ItemCreate(ItemBase):
 
 # Properties to receive on item update
 class ItemUpdate(ItemBase):
-    pass
+    version: Optional[int] = None
 
 
 # Properties shared by models stored in DB
@@ -24,6 +26,7 @@ class ItemInDBBase(ItemBase):
     id: int
     title: str
     owner_id: int
+    version: int
 
     class Config:
         orm_mode = True
@@ -37,3 +40,9 @@ class Item(ItemInDBBase):
 # Properties properties stored in DB
 class ItemInDB(ItemInDBBase):
     pass
+
+
+# Outcome of a bulk item creation
+class ItemBulkResult(BaseModel):
+    created: List[Item]
+    errors: List[BulkRowError]
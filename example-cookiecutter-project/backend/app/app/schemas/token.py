@@ -6,7 +6,22 @@ from pydantic import BaseModel
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
 
 
 class TokenPayload(BaseModel):
     sub: Optional[int] = None
+    exp: Optional[int] = None
+    # Authorization claims, see `security.create_user_access_token`
+    act: Optional[bool] = None
+    su: Optional[bool] = None
+
+
+class Principal(BaseModel):
+    """
+    Who a request is for, and all that authorization needs to know about them.
+    """
+
+    id: int
+    is_active: bool
+    is_superuser: bool
@@ -1,7 +1,9 @@
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, EmailStr
 
+from .bulk import BulkRowError
+
 
 # Shared properties
 class UserBase(BaseModel):
@@ -20,10 +22,12 @@ class UserCreate(UserBase):
 # Properties to receive via API on update
 class UserUpdate(UserBase):
     password: Optional[str] = None
+    version: Optional[int] = None
 
 
 class UserInDBBase(UserBase):
     id: Optional[int] = None
+    version: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -34,6 +38,12 @@ class User(UserInDBBase):
     pass
 
 
+# Outcome of a bulk user creation
+class UserBulkResult(BaseModel):
+    created: List[User]
+    errors: List[BulkRowError]
+
+
 # Additional properties stored in DB
 class UserInDB(UserInDBBase):
     hashed_password: str
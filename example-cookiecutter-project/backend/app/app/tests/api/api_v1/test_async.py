@@ -0,0 +1,39 @@
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.tests.utils.utils import get_superuser_token_headers
+
+
+def test_async_items_round_trip(async_client: TestClient) -> None:
+    headers = get_superuser_token_headers(async_client)
+    r = async_client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 200
+    assert r.json()["email"] == settings.FIRST_SUPERUSER
+
+    data = {"title": "Foo", "description": "Fighters"}
+    r = async_client.post(f"{settings.API_V1_STR}/items/", headers=headers, json=data)
+    assert r.status_code == 200
+    item = r.json()
+    assert item["title"] == "Foo"
+
+    r = async_client.put(
+        f"{settings.API_V1_STR}/items/{item['id']}",
+        headers=headers,
+        json={"title": "Bar"},
+    )
+    assert r.status_code == 200
+    assert r.json()["title"] == "Bar"
+    assert r.json()["description"] == "Fighters"
+
+    r = async_client.get(
+        f"{settings.API_V1_STR}/items/", headers=headers, params={"limit": 1}
+    )
+    assert r.status_code == 200
+    assert len(r.json()) == 1
+
+    r = async_client.delete(
+        f"{settings.API_V1_STR}/items/{item['id']}", headers=headers
+    )
+    assert r.status_code == 200
+    r = async_client.get(f"{settings.API_V1_STR}/items/{item['id']}", headers=headers)
+    assert r.status_code == 404
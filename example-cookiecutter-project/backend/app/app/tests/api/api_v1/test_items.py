@@ -1,8 +1,15 @@
+from typing import Dict, List
+
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
+from app import crud
+from app.core import security
 from app.core.config import settings
+from app.core.revocation import revocations
 from app.tests.utils.item import create_random_item
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import count_queries
 
 
 def test_create_item(
@@ -33,3 +40,134 @@ def test_read_item(
     assert content["description"] == item.description
     assert content["id"] == item.id
     assert content["owner_id"] == item.owner_id
+
+
+def test_update_item_conflict(
+    client: TestClient, superuser_token_headers: dict, db: Session
+) -> None:
+    item = create_random_item(db)
+    url = f"{settings.API_V1_STR}/items/{item.id}"
+    data = {"title": "Foo", "version": item.version}
+    response = client.put(url, headers=superuser_token_headers, json=data)
+    assert response.status_code == 200
+    assert response.json()["version"] == item.version + 1
+    response = client.put(url, headers=superuser_token_headers, json=data)
+    assert response.status_code == 409
+
+
+def test_read_items_by_cursor(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session
+) -> None:
+    user = crud.user.get_by_email(db, email=settings.EMAIL_TEST_USER)
+    assert user
+    created = {create_random_item(db, owner_id=user.id).id for _ in range(3)}
+    seen: List[int] = []
+    params: Dict[str, str] = {"limit": "2"}
+    while True:
+        r = client.get(
+            f"{settings.API_V1_STR}/items/",
+            headers=normal_user_token_headers,
+            params=params,
+        )
+        assert r.status_code == 200
+        page = r.json()
+        assert len(page) <= 2
+        seen.extend(item["id"] for item in page)
+        if "X-Next-Cursor" not in r.headers:
+            break
+        params["cursor"] = r.headers["X-Next-Cursor"]
+    assert seen == sorted(seen)
+    assert created <= set(seen)
+
+
+def test_read_items_invalid_cursor(
+    client: TestClient, normal_user_token_headers: Dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=normal_user_token_headers,
+        params={"cursor": "not-a-cursor"},
+    )
+    assert r.status_code == 400
+
+
+def test_read_items_sparse_fields(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session
+) -> None:
+    user = crud.user.get_by_email(db, email=settings.EMAIL_TEST_USER)
+    assert user
+    item = create_random_item(db, owner_id=user.id)
+    r = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=normal_user_token_headers,
+        params={"fields": "title,id", "limit": "1"},
+    )
+    assert r.status_code == 200
+    assert all(set(row) == {"id", "title"} for row in r.json())
+    assert "X-Next-Cursor" in r.headers
+    r = client.get(
+        f"{settings.API_V1_STR}/items/{item.id}",
+        headers=normal_user_token_headers,
+        params={"fields": "description"},
+    )
+    assert r.status_code == 200
+    assert r.json() == {"description": item.description}
+    r = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=normal_user_token_headers,
+        params={"fields": "id,owner"},
+    )
+    assert r.status_code == 400
+
+
+def test_create_items_bulk(
+    client: TestClient, normal_user_token_headers: Dict[str, str]
+) -> None:
+    data = [{"title": "Foo"}, {"description": "no title"}, {"title": "Bar"}]
+    r = client.post(
+        f"{settings.API_V1_STR}/items/bulk",
+        headers=normal_user_token_headers,
+        json=data,
+    )
+    assert r.status_code == 200
+    content = r.json()
+    assert [item["title"] for item in content["created"]] == ["Foo", "Bar"]
+    assert all("id" in item for item in content["created"])
+    assert [error["index"] for error in content["errors"]] == [1]
+    data = [{"title": "Foo"}] * (settings.ITEMS_BULK_MAX_SIZE + 1)
+    r = client.post(
+        f"{settings.API_V1_STR}/items/bulk",
+        headers=normal_user_token_headers,
+        json=data,
+    )
+    assert r.status_code == 422
+
+
+def test_item_of_another_user(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    url = f"{settings.API_V1_STR}/items/{item.id}"
+    response = client.get(url, headers=normal_user_token_headers)
+    assert response.status_code == 400
+    response = client.delete(url, headers=normal_user_token_headers)
+    assert response.status_code == 400
+    missing_url = f"{settings.API_V1_STR}/items/{2 ** 31 - 1}"
+    response = client.delete(missing_url, headers=normal_user_token_headers)
+    assert response.status_code == 404
+
+
+def test_read_items_with_token_claims(client: TestClient, db: Session) -> None:
+    user = create_random_user(db)
+    token = security.create_access_token(user.id, claims={"act": True, "su": False})
+    headers = {"Authorization": f"Bearer {token}"}
+    revocations.sync()
+    with count_queries(db) as statements:
+        r = client.get(f"{settings.API_V1_STR}/items/", headers=headers)
+    assert r.status_code == 200
+    assert not any('FROM "user"' in statement for statement in statements)
+
+    # Deactivation revokes the claims: the user is read from the database
+    crud.user.update(db, db_obj=user, obj_in={"is_active": False})
+    r = client.get(f"{settings.API_V1_STR}/items/", headers=headers)
+    assert r.status_code == 400
@@ -1,8 +1,18 @@
+from datetime import datetime, timedelta
 from typing import Dict
 
 from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
 
+from app import crud
+from app.core import rate_limit
 from app.core.config import settings
+from app.core.security import refresh_token_digest
+from app.models.refresh_token import RefreshToken
+from app.schemas.user import UserCreate
+from app.tests.utils.user import user_authentication_headers
+from app.tests.utils.utils import random_email, random_lower_string
+from app.utils import generate_password_reset_token
 
 
 def test_get_access_token(client: TestClient) -> None:
@@ -26,3 +36,164 @@ def test_use_access_token(
     result = r.json()
     assert r.status_code == 200
     assert "email" in result
+
+
+def test_refresh_token_rotates(client: TestClient) -> None:
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    refresh_token = r.json()["refresh_token"]
+    assert refresh_token
+
+    r = client.post(
+        f"{settings.API_V1_STR}/login/access-token",
+        data={"grant_type": "refresh_token", "refresh_token": refresh_token},
+    )
+    assert r.status_code == 200
+    tokens = r.json()
+    assert tokens["access_token"]
+    assert tokens["refresh_token"] != refresh_token
+
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token",
+        json={"refresh_token": tokens["refresh_token"]},
+    )
+    assert r.status_code == 200
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    r = client.post(f"{settings.API_V1_STR}/login/test-token", headers=headers)
+    assert r.status_code == 200
+    assert r.json()["email"] == settings.FIRST_SUPERUSER
+
+
+def spend_before_grace(db: Session, token: str) -> None:
+    table = RefreshToken.__table__  # type: ignore
+    grace = timedelta(seconds=settings.REFRESH_TOKEN_REUSE_GRACE_SECONDS)
+    db.execute(
+        table.update()
+        .where(table.c.token_hash == refresh_token_digest(token))
+        .values(used_at=datetime.utcnow() - grace - timedelta(seconds=1))
+    )
+    db.commit()
+
+
+def test_reused_refresh_token_revokes_its_family(
+    client: TestClient, db: Session
+) -> None:
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    stolen = r.json()["refresh_token"]
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token", json={"refresh_token": stolen}
+    )
+    current = r.json()["refresh_token"]
+    spend_before_grace(db, stolen)
+
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token", json={"refresh_token": stolen}
+    )
+    assert r.status_code == 400
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token", json={"refresh_token": current}
+    )
+    assert r.status_code == 400
+
+
+def test_refresh_token_spent_within_grace_keeps_its_family(client: TestClient) -> None:
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    refresh_token = r.json()["refresh_token"]
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token",
+        json={"refresh_token": refresh_token},
+    )
+    current = r.json()["refresh_token"]
+
+    # As a concurrent refresh of the same client would
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token",
+        json={"refresh_token": refresh_token},
+    )
+    assert r.status_code == 400
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token", json={"refresh_token": current}
+    )
+    assert r.status_code == 200
+
+
+def test_inactive_user_keeps_refresh_token(client: TestClient, db: Session) -> None:
+    email = random_email()
+    password = random_lower_string()
+    user = crud.user.create(db, obj_in=UserCreate(email=email, password=password))
+    login_data = {"username": email, "password": password}
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    refresh_token = r.json()["refresh_token"]
+
+    user = crud.user.update(db, db_obj=user, obj_in={"is_active": False})
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token",
+        json={"refresh_token": refresh_token},
+    )
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Inactive user"
+
+    # Refused, but not spent
+    crud.user.update(db, db_obj=user, obj_in={"is_active": True})
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token",
+        json={"refresh_token": refresh_token},
+    )
+    assert r.status_code == 200
+
+
+def test_invalid_refresh_token(client: TestClient) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token",
+        json={"refresh_token": "not-a-refresh-token"},
+    )
+    assert r.status_code == 400
+
+
+def test_login_is_rate_limited_by_account(client: TestClient) -> None:
+    limiter = rate_limit.login_by_account
+    limit, limiter.limit = limiter.limit, 2
+    login_data = {"username": settings.FIRST_SUPERUSER, "password": "wrong password"}
+    try:
+        for _ in range(2):
+            r = client.post(
+                f"{settings.API_V1_STR}/login/access-token", data=login_data
+            )
+            assert r.status_code == 400
+        r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+        assert r.status_code == 429
+        assert int(r.headers["Retry-After"]) >= 1
+    finally:
+        limiter.limit = limit
+
+
+def test_reset_password(client: TestClient, db: Session) -> None:
+    email = random_email()
+    crud.user.create(db, obj_in=UserCreate(email=email, password=random_lower_string()))
+    new_password = random_lower_string()
+    r = client.post(
+        f"{settings.API_V1_STR}/reset-password/",
+        json={
+            "token": generate_password_reset_token(email=email),
+            "new_password": new_password,
+        },
+    )
+    assert r.status_code == 200
+    user_authentication_headers(client=client, email=email, password=new_password)
+
+    r = client.post(
+        f"{settings.API_V1_STR}/reset-password/",
+        json={"token": "not-a-token", "new_password": new_password},
+    )
+    assert r.status_code == 400
@@ -1,12 +1,15 @@
 from typing import Dict
 
+import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
 from app import crud
 from app.core.config import settings
+from app.db.session import pool_metrics
 from app.schemas.user import UserCreate
-from app.tests.utils.utils import random_email, random_lower_string
+from app.tests.utils.user import user_authentication_headers
+from app.tests.utils.utils import count_queries, random_email, random_lower_string
 
 
 def test_get_users_superuser_me(
@@ -82,6 +85,64 @@ def test_create_user_existing_username(
     assert "_id" not in created_user
 
 
+def test_create_users_bulk(
+    client: TestClient, superuser_token_headers: dict, db: Session
+) -> None:
+    taken = crud.user.create(
+        db, obj_in=UserCreate(email=random_email(), password=random_lower_string())
+    )
+    first, second = random_email(), random_email()
+    data = [
+        {"email": first, "password": random_lower_string()},
+        {"email": "not an email", "password": random_lower_string()},
+        {"email": taken.email, "password": random_lower_string()},
+        {"email": second, "password": random_lower_string()},
+        {"email": first, "password": random_lower_string()},
+    ]
+    r = client.post(
+        f"{settings.API_V1_STR}/users/bulk", headers=superuser_token_headers, json=data,
+    )
+    assert r.status_code == 200
+    content = r.json()
+    assert [user["email"] for user in content["created"]] == [first, second]
+    assert [error["index"] for error in content["errors"]] == [1, 2, 4]
+    user = crud.user.get_by_email(db, email=second)
+    assert user
+    assert crud.user.authenticate(db, email=second, password=data[3]["password"])
+    data = [{"email": "not an email", "password": ""}] * (
+        settings.USERS_BULK_MAX_SIZE + 1
+    )
+    r = client.post(
+        f"{settings.API_V1_STR}/users/bulk", headers=superuser_token_headers, json=data,
+    )
+    assert r.status_code == 422
+
+
+def test_create_users_bulk_email_taken_concurrently(
+    client: TestClient,
+    superuser_token_headers: dict,
+    db: Session,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    taken = crud.user.create(
+        db, obj_in=UserCreate(email=random_email(), password=random_lower_string())
+    )
+    # As if another request created the user after the lookup
+    monkeypatch.setattr(crud.user, "get_existing_emails", lambda db, emails: set())
+    new = random_email()
+    data = [
+        {"email": taken.email, "password": random_lower_string()},
+        {"email": new, "password": random_lower_string()},
+    ]
+    r = client.post(
+        f"{settings.API_V1_STR}/users/bulk", headers=superuser_token_headers, json=data,
+    )
+    assert r.status_code == 200
+    content = r.json()
+    assert [user["email"] for user in content["created"]] == [new]
+    assert [error["index"] for error in content["errors"]] == [0]
+
+
 def test_create_user_by_normal_user(
     client: TestClient, normal_user_token_headers: Dict[str, str]
 ) -> None:
@@ -113,3 +174,65 @@ def test_retrieve_users(
     assert len(all_users) > 1
     for item in all_users:
         assert "email" in item
+
+
+def test_current_user_comes_from_token_cache(client: TestClient, db: Session) -> None:
+    email = random_email()
+    password = random_lower_string()
+    user = crud.user.create(db, obj_in=UserCreate(email=email, password=password))
+    headers = user_authentication_headers(client=client, email=email, password=password)
+    url = f"{settings.API_V1_STR}/users/me"
+    assert client.get(url, headers=headers).status_code == 200
+    with count_queries(db) as statements:
+        r = client.get(url, headers=headers)
+    assert r.status_code == 200
+    assert statements == []
+    crud.user.update(db, db_obj=user, obj_in={"is_active": False})
+    r = client.get(url, headers=headers)
+    assert r.status_code == 400
+
+
+def test_deactivate_user_drops_cached_token(
+    client: TestClient, superuser_token_headers: Dict[str, str], db: Session
+) -> None:
+    email = random_email()
+    password = random_lower_string()
+    user = crud.user.create(db, obj_in=UserCreate(email=email, password=password))
+    headers = user_authentication_headers(client=client, email=email, password=password)
+    url = f"{settings.API_V1_STR}/users/me"
+    assert client.get(url, headers=headers).status_code == 200
+    r = client.put(
+        f"{settings.API_V1_STR}/users/{user.id}",
+        headers=superuser_token_headers,
+        json={"is_active": False},
+    )
+    assert r.status_code == 200
+    assert r.json()["is_active"] is False
+    assert client.get(url, headers=headers).status_code == 400
+
+
+def test_update_own_password_from_token_cache(client: TestClient, db: Session) -> None:
+    email = random_email()
+    password = random_lower_string()
+    crud.user.create(db, obj_in=UserCreate(email=email, password=password))
+    headers = user_authentication_headers(client=client, email=email, password=password)
+    url = f"{settings.API_V1_STR}/users/me"
+    assert client.get(url, headers=headers).status_code == 200
+    # The cached user has no password hash to compare the new one with
+    new_password = random_lower_string()
+    r = client.put(url, headers=headers, json={"password": new_password})
+    assert r.status_code == 200
+    assert r.json()["email"] == email
+    user_authentication_headers(client=client, email=email, password=new_password)
+
+
+def test_current_user_from_token_cache_takes_no_connection(
+    client: TestClient, normal_user_token_headers: Dict[str, str]
+) -> None:
+    url = f"{settings.API_V1_STR}/users/me"
+    assert client.get(url, headers=normal_user_token_headers).status_code == 200
+    metrics = pool_metrics["sync"]
+    checkouts = sum(metrics.wait_counts)
+    r = client.get(url, headers=normal_user_token_headers)
+    assert r.status_code == 200
+    assert sum(metrics.wait_counts) == checkouts
@@ -1,10 +1,22 @@
 from typing import Dict, Generator
 
 import pytest
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 
+from app.api.api_v1.api import async_api_router
+from app.api.errors import (
+    not_owned_handler,
+    password_hash_busy_handler,
+    rate_limited_handler,
+    stale_data_handler,
+)
 from app.core.config import settings
+from app.core.hashing import PasswordHashPoolBusy
+from app.core.rate_limit import MemoryCounters, RateLimited, limiters
+from app.crud.crud_item import NotOwnedError
 from app.db.session import SessionLocal
 from app.main import app
 from app.tests.utils.user import authentication_token_from_email
@@ -16,12 +28,36 @@ def db() -> Generator:
     yield SessionLocal()
 
 
+@pytest.fixture(autouse=True)
+def rate_limits() -> Generator:
+    """
+    Fresh rate limit counters for each test: the suite logs in far more
+    often than any client may.
+    """
+    counters = MemoryCounters()
+    for limiter in limiters.values():
+        limiter.backend = counters
+    yield counters
+
+
 @pytest.fixture(scope="module")
 def client() -> Generator:
     with TestClient(app) as c:
         yield c
 
 
+@pytest.fixture(scope="module")
+def async_client() -> Generator:
+    async_app = FastAPI()
+    async_app.add_exception_handler(StaleDataError, stale_data_handler)
+    async_app.add_exception_handler(NotOwnedError, not_owned_handler)
+    async_app.add_exception_handler(PasswordHashPoolBusy, password_hash_busy_handler)
+    async_app.add_exception_handler(RateLimited, rate_limited_handler)
+    async_app.include_router(async_api_router, prefix=settings.API_V1_STR)
+    with TestClient(async_app) as c:
+        yield c
+
+
 @pytest.fixture(scope="module")
 def superuser_token_headers(client: TestClient) -> Dict[str, str]:
     return get_superuser_token_headers(client)
@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+from app.core.hashing import PasswordHashPool, PasswordHashPoolBusy
+
+
+def test_pool_hashes_and_verifies() -> None:
+    pool = PasswordHashPool(workers=1, queue_size=1, timeout=30)
+    try:
+        hashed = pool.hash("secret")
+        assert pool.verify("secret", hashed)
+        assert not pool.verify("not the secret", hashed)
+    finally:
+        pool.shutdown()
+
+
+def test_pool_rejects_when_saturated() -> None:
+    pool = PasswordHashPool(workers=1, queue_size=0, timeout=30)
+    try:
+        running = pool._submit(time.sleep, 0.5)
+        with pytest.raises(PasswordHashPoolBusy):
+            pool.hash("secret")
+        running.result()
+        assert pool.stats()["rejected"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_pool_expires_jobs_queued_past_deadline() -> None:
+    pool = PasswordHashPool(workers=1, queue_size=1, timeout=30)
+    try:
+        # Start the worker process first, so only the queueing counts
+        pool.hash("secret")
+        pool.timeout = 0.1
+        running = pool._submit(time.sleep, 0.5)
+        with pytest.raises(PasswordHashPoolBusy):
+            pool.hash("secret")
+        running.result()
+    finally:
+        pool.shutdown()
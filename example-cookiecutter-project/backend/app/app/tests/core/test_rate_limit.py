@@ -0,0 +1,37 @@
+import pytest
+
+from app.core.rate_limit import (
+    MemoryCounters,
+    RateLimited,
+    RedisCounters,
+    SlidingWindowLimiter,
+)
+from app.crud.cache import LocalRedis
+
+
+@pytest.mark.parametrize(
+    "backend", [MemoryCounters(), RedisCounters(LocalRedis())], ids=["memory", "redis"]
+)
+def test_limit_within_window(backend: object) -> None:
+    limiter = SlidingWindowLimiter("test", limit=3, window=60, backend=backend)
+    for _ in range(3):
+        limiter.hit("key", now=600.0)
+    with pytest.raises(RateLimited) as exc_info:
+        limiter.hit("key", now=610.0)
+    error: RateLimited = exc_info.value
+    assert error.retry_after == 50.0
+    # Other keys have their own counters
+    limiter.hit("other key", now=610.0)
+    assert limiter.stats()["allowed"] == 4
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_previous_window_is_weighed_by_overlap() -> None:
+    limiter = SlidingWindowLimiter("test", limit=4, window=60, backend=MemoryCounters())
+    for _ in range(4):
+        limiter.hit("key", now=630.0)
+    # Halfway through the next window, half of the previous 4 hits still count
+    limiter.hit("key", now=690.0)
+    limiter.hit("key", now=690.0)
+    with pytest.raises(RateLimited):
+        limiter.hit("key", now=690.0)
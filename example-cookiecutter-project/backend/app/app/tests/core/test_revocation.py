@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.revocation import BloomFilter, RevocationList
+from app.tests.utils.user import create_random_user
+
+
+def test_bloom_filter_has_no_false_negatives() -> None:
+    bloom = BloomFilter(1000)
+    for key in range(1000):
+        bloom.add(key)
+    assert all(key in bloom for key in range(1000))
+    false_positives = sum(key in bloom for key in range(1000, 11000))
+    assert false_positives < 300
+
+
+def test_unsynced_list_revokes_everyone() -> None:
+    revocations = RevocationList(window=timedelta(minutes=15), interval=10)
+    assert revocations.maybe_revoked(1)
+
+
+def test_revoke_after_sync() -> None:
+    revocations = RevocationList(window=timedelta(minutes=15), interval=10)
+    revocations.sync()
+    user_id = -1
+    assert not revocations.maybe_revoked(user_id)
+    revocations.revoke(user_id)
+    assert revocations.maybe_revoked(user_id)
+    # Kept by the next sync, even though no row of the database has it
+    revocations.sync()
+    assert revocations.maybe_revoked(user_id)
+
+
+def test_deleted_user_revoked_in_other_processes(db: Session) -> None:
+    user = create_random_user(db)
+    crud.user.remove(db, id=user.id)
+    # Another process: nothing revoked locally, the tombstone is synced
+    revocations = RevocationList(window=timedelta(minutes=15), interval=10)
+    revocations.sync()
+    assert revocations.maybe_revoked(user.id)
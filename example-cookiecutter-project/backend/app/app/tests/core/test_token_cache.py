@@ -0,0 +1,21 @@
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from app.core.token_cache import TokenCache
+from app.tests.utils.user import create_random_user
+
+
+def test_entries_keep_no_password_hash(db: Session) -> None:
+    user = create_random_user(db)
+    cache = TokenCache(ttl=60)
+    cache.set("token", user)
+    cached = cache.get("token")
+    assert cached
+    assert (cached.id, cached.email, cached.is_active) == (
+        user.id,
+        user.email,
+        user.is_active,
+    )
+    assert "hashed_password" not in inspect(cached).dict
+    cache.invalidate(user.id)
+    assert cache.get("token") is None
@@ -0,0 +1,49 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from jose import jwt
+
+from app.core.token_codec import HS256Codec, TokenError
+
+KEY = "test-secret-key"
+
+
+def test_tokens_are_interchangeable_with_jose() -> None:
+    codec = HS256Codec(KEY)
+    claims = {"exp": datetime.utcnow() + timedelta(minutes=5), "sub": "1"}
+    assert jwt.decode(codec.encode(claims), KEY, algorithms=["HS256"])["sub"] == "1"
+    token = jwt.encode(claims, KEY, algorithm="HS256")
+    assert codec.decode(token)["sub"] == "1"
+
+
+@pytest.mark.parametrize(
+    "claims",
+    [
+        {"sub": "1"},
+        {"exp": 1, "sub": "1"},
+        {"exp": "never", "sub": "1"},
+        {"exp": time.time() + 60, "nbf": time.time() + 30, "sub": "1"},
+    ],
+)
+def test_invalid_claims_are_rejected(claims: dict) -> None:
+    codec = HS256Codec(KEY)
+    with pytest.raises(TokenError):
+        codec.decode(codec.encode(claims))
+
+
+def test_other_keys_and_algorithms_are_rejected() -> None:
+    codec = HS256Codec(KEY)
+    claims = {"exp": time.time() + 60, "sub": "1"}
+    with pytest.raises(TokenError):
+        codec.decode(HS256Codec("another key").encode(claims))
+    with pytest.raises(TokenError):
+        codec.decode(jwt.encode(claims, KEY, algorithm="HS512"))
+    with pytest.raises(TokenError):
+        codec.decode("not.a.token")
+
+
+def test_decode_many() -> None:
+    codec = HS256Codec(KEY)
+    token = codec.encode({"exp": time.time() + 60, "sub": "1"})
+    assert codec.decode_many([token, token + "x"]) == [codec.decode(token), None]
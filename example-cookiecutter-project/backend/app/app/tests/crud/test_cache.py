@@ -0,0 +1,94 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.crud.cache import IdentityCache, LocalRedis, MemoryBackend, RedisBackend
+from app.crud.crud_item import CRUDItem
+from app.crud.crud_user import CRUDUser
+from app.models.item import Item
+from app.models.user import User
+from app.tests.utils.item import create_random_item
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import count_queries
+
+
+def test_get_reads_through_cache(db: Session) -> None:
+    cache = IdentityCache("item", MemoryBackend(), ttl=60)
+    crud_item = CRUDItem(Item, cache=cache)
+    item = create_random_item(db)
+    with count_queries(db) as statements:
+        first = crud_item.get(db, id=item.id)
+        second = crud_item.get(db, id=item.id)
+    assert len(statements) == 1
+    assert first and second
+    assert first.title == second.title == item.title
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_writes_invalidate_cache(db: Session) -> None:
+    cache = IdentityCache("item", RedisBackend(LocalRedis()), ttl=60)
+    crud_item = CRUDItem(Item, cache=cache)
+    item = create_random_item(db)
+    cached = crud_item.get(db, id=item.id)
+    assert cached
+    crud_item.update(db, db_obj=cached, obj_in={"title": "updated"})
+    updated = crud_item.get(db, id=item.id)
+    assert updated
+    assert updated.title == "updated"
+    crud_item.remove(db, id=item.id)
+    assert crud_item.get(db, id=item.id) is None
+
+
+def test_redis_backend_keeps_datetimes(db: Session) -> None:
+    cache = IdentityCache("user", RedisBackend(LocalRedis()), ttl=60)
+    crud_user = CRUDUser(User, cache=cache)
+    user = create_random_user(db)
+    changed_at = datetime(2026, 1, 2, 3, 4, 5, 678901)
+    crud_user.update(db, db_obj=user, obj_in={"claims_changed_at": changed_at})
+    assert crud_user.get(db, id=user.id)
+    cached = crud_user.get(db, id=user.id)
+    assert cached
+    assert cached.claims_changed_at == changed_at
+    assert cache.stats()["hits"] == 1
+
+
+class RecordingBackend(MemoryBackend):
+    def __init__(self, events: List[str]):
+        super().__init__()
+        self.events = events
+
+    def delete(self, *keys: str) -> None:
+        self.events.append("invalidate")
+        super().delete(*keys)
+
+
+def test_update_invalidates_once_committed(db: Session) -> None:
+    # Invalidated any earlier, a concurrent read could cache the old row again
+    events: List[str] = []
+    cache = IdentityCache("item", RecordingBackend(events), ttl=60)
+    crud_item = CRUDItem(Item, cache=cache)
+    item = create_random_item(db)
+
+    def record_commit(session: Session) -> None:
+        events.append("commit")
+
+    event.listen(db, "after_commit", record_commit)
+    try:
+        crud_item.update(db, db_obj=item, obj_in={"title": "updated"})
+    finally:
+        event.remove(db, "after_commit", record_commit)
+    assert events == ["commit", "invalidate"]
+
+
+def test_memory_backend_evicts_least_recently_used() -> None:
+    backend = MemoryBackend(max_size=2)
+    backend.set("a", {"id": 1}, 60)
+    backend.set("b", {"id": 2}, 60)
+    backend.get("a")
+    backend.set("c", {"id": 3}, 60)
+    assert backend.get("b") is None
+    assert backend.get("a") == {"id": 1}
+    assert backend.evictions == 1
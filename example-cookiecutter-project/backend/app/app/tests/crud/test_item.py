@@ -1,9 +1,15 @@
+from typing import Any, List
+
+import pytest
+from sqlalchemy import inspect
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 
 from app import crud
+from app.crud.crud_item import NotOwnedError
 from app.schemas.item import ItemCreate, ItemUpdate
 from app.tests.utils.user import create_random_user
-from app.tests.utils.utils import random_lower_string
+from app.tests.utils.utils import count_queries, random_lower_string
 
 
 def test_create_item(db: Session) -> None:
@@ -55,7 +61,159 @@ def test_delete_item(db: Session) -> None:
     item2 = crud.item.remove(db=db, id=item.id)
     item3 = crud.item.get(db=db, id=item.id)
     assert item3 is None
+    assert item2
     assert item2.id == item.id
     assert item2.title == title
     assert item2.description == description
     assert item2.owner_id == user.id
+
+
+def test_get_page_by_owner(db: Session) -> None:
+    user = create_random_user(db)
+    items = [
+        crud.item.create_with_owner(
+            db=db, obj_in=ItemCreate(title=random_lower_string()), owner_id=user.id
+        )
+        for _ in range(3)
+    ]
+    page, cursor = crud.item.get_page_by_owner(db=db, owner_id=user.id, limit=2)
+    assert [item.id for item in page] == [item.id for item in items[:2]]
+    assert cursor
+    page, cursor = crud.item.get_page_by_owner(
+        db=db, owner_id=user.id, cursor=cursor, limit=2
+    )
+    assert [item.id for item in page] == [items[2].id]
+    assert cursor is None
+
+
+def test_get_multi_by_owner(db: Session) -> None:
+    users = [create_random_user(db) for _ in range(2)]
+    for user in users:
+        crud.item.create_many_with_owner(
+            db=db,
+            objs_in=[ItemCreate(title=random_lower_string()) for _ in range(3)],
+            owner_id=user.id,
+        )
+    # Each call reuses the same statement with its own owner, page and options
+    for user in users:
+        items = crud.item.get_multi_by_owner(db=db, owner_id=user.id, skip=1, limit=1)
+        assert [item.owner_id for item in items] == [user.id]
+        items = crud.item.get_multi_by_owner(db=db, owner_id=user.id)
+        assert len(items) == 3
+        assert all("owner" in inspect(item).unloaded for item in items)
+        items = crud.item.get_multi_by_owner(db=db, owner_id=user.id, load=["owner"])
+        assert all("owner" not in inspect(item).unloaded for item in items)
+
+
+def test_create_many_items(db: Session) -> None:
+    user = create_random_user(db)
+    items_in = [ItemCreate(title=random_lower_string()) for _ in range(3)]
+    items = crud.item.create_many_with_owner(
+        db=db, objs_in=items_in, owner_id=user.id, batch_size=2
+    )
+    assert [item.title for item in items] == [item_in.title for item_in in items_in]
+    assert all(item.owner_id == user.id for item in items)
+    stored_items = crud.item.get_multi_by_owner(db=db, owner_id=user.id)
+    assert {item.id for item in stored_items} == {item.id for item in items}
+
+
+def test_item_writes_are_single_statements(db: Session) -> None:
+    user = create_random_user(db)
+    item_in = ItemCreate(title=random_lower_string())
+    with count_queries(db) as statements:
+        item = crud.item.create_with_owner(db=db, obj_in=item_in, owner_id=user.id)
+    assert len(statements) == 1
+    with count_queries(db) as statements:
+        item = crud.item.update(db=db, db_obj=item, obj_in={"title": "updated"})
+    assert len(statements) == 1
+    assert item.title == "updated"
+    with count_queries(db) as statements:
+        crud.item.remove(db=db, id=item.id)
+    assert len(statements) == 1
+
+
+def test_update_item_checks_version(db: Session) -> None:
+    user = create_random_user(db)
+    item_in = ItemCreate(title=random_lower_string())
+    item = crud.item.create_with_owner(db=db, obj_in=item_in, owner_id=user.id)
+    with count_queries(db) as statements:
+        crud.item.update(db=db, db_obj=item, obj_in={"title": item.title})
+    assert statements == []
+    item2 = crud.item.update(
+        db=db, db_obj=item, obj_in=ItemUpdate(title="first", version=item.version)
+    )
+    assert item2.version == 2
+    with pytest.raises(StaleDataError):
+        crud.item.update(
+            db=db, db_obj=item, obj_in=ItemUpdate(title="second", version=1)
+        )
+    stored_item = crud.item.get(db=db, id=item.id)
+    assert stored_item
+    assert stored_item.title == "first"
+
+
+def test_get_page_by_owner_with_fields(db: Session) -> None:
+    user = create_random_user(db)
+    item_in = ItemCreate(title=random_lower_string(), description="not loaded")
+    crud.item.create_with_owner(db=db, obj_in=item_in, owner_id=user.id)
+    with count_queries(db) as statements:
+        page, cursor = crud.item.get_page_by_owner(
+            db=db, owner_id=user.id, fields=["title"]
+        )
+    assert "description" not in statements[0]
+    # Plain rows, when only some fields are selected
+    rows: List[Any] = page
+    assert [tuple(row) for row in rows] == [(item_in.title, user.id, page[0].id)]
+    assert cursor is None
+
+
+def test_owned_writes_are_single_statements(db: Session) -> None:
+    user = create_random_user(db)
+    item_in = ItemCreate(title=random_lower_string())
+    item = crud.item.create_with_owner(db=db, obj_in=item_in, owner_id=user.id)
+    with count_queries(db) as statements:
+        updated = crud.item.update_owned(
+            db=db,
+            id=item.id,
+            owner_id=user.id,
+            obj_in={"title": "updated", "description": item.description},
+        )
+    assert len(statements) == 1
+    assert updated and updated.title == "updated"
+    assert updated.version == item.version + 1
+    with count_queries(db) as statements:
+        unchanged = crud.item.update_owned(
+            db=db, id=item.id, owner_id=user.id, obj_in={"title": "updated"}
+        )
+    assert len(statements) == 1
+    assert unchanged and unchanged.version == updated.version
+    with pytest.raises(StaleDataError):
+        crud.item.update_owned(
+            db=db,
+            id=item.id,
+            owner_id=user.id,
+            obj_in={"title": "stale", "version": item.version},
+        )
+    with count_queries(db) as statements:
+        removed = crud.item.remove_owned(db=db, id=item.id, owner_id=user.id)
+    assert len(statements) == 1
+    assert removed and removed.id == item.id
+    assert crud.item.get_owned(db=db, id=item.id, owner_id=user.id) is None
+
+
+def test_owned_lookups_reject_other_owners(db: Session) -> None:
+    user = create_random_user(db)
+    other = create_random_user(db)
+    item_in = ItemCreate(title=random_lower_string())
+    item = crud.item.create_with_owner(db=db, obj_in=item_in, owner_id=user.id)
+    with pytest.raises(NotOwnedError):
+        crud.item.get_owned(db=db, id=item.id, owner_id=other.id)
+    with pytest.raises(NotOwnedError):
+        crud.item.update_owned(
+            db=db, id=item.id, owner_id=other.id, obj_in={"title": "stolen"}
+        )
+    with pytest.raises(NotOwnedError):
+        crud.item.remove_owned(db=db, id=item.id, owner_id=other.id)
+    stored_item = crud.item.get_owned(db=db, id=item.id, owner_id=None)
+    assert stored_item
+    assert stored_item.title == item_in.title
@@ -1,10 +1,18 @@
 from fastapi.encoders import jsonable_encoder
+from passlib.hash import bcrypt
 from sqlalchemy.orm import Session
 
 from app import crud
-from app.core.security import verify_password
+from app.core.hashing import password_hasher
+from app.core.security import pwd_context, verify_password
 from app.schemas.user import UserCreate, UserUpdate
-from app.tests.utils.utils import random_email, random_lower_string
+from app.tests.utils.item import create_random_item
+from app.tests.utils.utils import count_queries, random_email, random_lower_string
+
+
+def _submitted_hashes() -> float:
+    stats = password_hasher.stats()
+    return stats["completed"] + stats["in_flight"]
 
 
 def test_create_user(db: Session) -> None:
@@ -16,6 +24,33 @@ def test_create_user(db: Session) -> None:
     assert hasattr(user, "hashed_password")
 
 
+def test_create_user_if_absent(db: Session) -> None:
+    email = random_email()
+    user_in = UserCreate(email=email, password=random_lower_string())
+    user = crud.user.create_if_absent(db, obj_in=user_in)
+    assert user
+    assert user.email == email
+    hashes = _submitted_hashes()
+    with count_queries(db) as statements:
+        assert crud.user.create_if_absent(db, obj_in=user_in) is None
+    assert len(statements) == 1
+    # The taken email was found before hashing the password
+    assert _submitted_hashes() == hashes
+
+
+def test_upsert_user(db: Session) -> None:
+    row = {"email": random_email(), "hashed_password": "x", "full_name": "Before"}
+    user, inserted = crud.user.upsert(db, obj_in=row, conflict=["email"])
+    assert inserted
+    assert user.full_name == "Before"
+    row["full_name"] = "After"
+    updated, inserted = crud.user.upsert(db, obj_in=row, conflict=["email"])
+    assert not inserted
+    assert updated.id == user.id
+    assert updated.full_name == "After"
+    assert updated.version == user.version + 1
+
+
 def test_authenticate_user(db: Session) -> None:
     email = random_email()
     password = random_lower_string()
@@ -80,6 +115,19 @@ def test_get_user(db: Session) -> None:
     assert jsonable_encoder(user) == jsonable_encoder(user_2)
 
 
+def test_get_user_by_email(db: Session) -> None:
+    users = [
+        crud.user.create(
+            db, obj_in=UserCreate(email=random_email(), password=random_lower_string())
+        )
+        for _ in range(2)
+    ]
+    for user in users:
+        found = crud.user.get_by_email(db, email=user.email)
+        assert found and found.id == user.id
+    assert crud.user.get_by_email(db, email=random_email()) is None
+
+
 def test_update_user(db: Session) -> None:
     password = random_lower_string()
     email = random_email()
@@ -92,3 +140,46 @@ def test_update_user(db: Session) -> None:
     assert user_2
     assert user.email == user_2.email
     assert verify_password(new_password, user_2.hashed_password)
+
+
+def test_get_page_loads_items_in_constant_queries(db: Session) -> None:
+    for _ in range(3):
+        create_random_item(db)
+    counts = []
+    for limit in (1, 3):
+        with count_queries(db) as statements:
+            users, _ = crud.user.get_page(db, limit=limit, load=["items"])
+            for user in users:
+                list(user.items)
+        counts.append(len(statements))
+    assert counts == [2, 2]
+
+
+def test_load_related_batches_detached_users(db: Session) -> None:
+    items = [create_random_item(db) for _ in range(3)]
+    users = []
+    for item in items:
+        # Detached copies whenever the identity cache is on
+        user = crud.user.get(db, id=item.owner_id)
+        assert user
+        users.append(user)
+    with count_queries(db) as statements:
+        crud.user.load_related(db, users, "items")
+    assert len(statements) == 1
+    assert [[i.id for i in user.items] for user in users] == [
+        [item.id] for item in items
+    ]
+
+
+def test_authenticate_rehashes_outdated_hash(db: Session) -> None:
+    email = random_email()
+    password = random_lower_string()
+    user = crud.user.create(db, obj_in=UserCreate(email=email, password=password))
+    outdated_hash = bcrypt.using(rounds=4).hash(password)
+    crud.user.update(db, db_obj=user, obj_in={"hashed_password": outdated_hash})
+    assert crud.user.authenticate(db, email=email, password=password)
+    stored_user = crud.user.get_by_email(db, email=email)
+    assert stored_user
+    assert stored_user.hashed_password != outdated_hash
+    assert not pwd_context.needs_update(stored_user.hashed_password)
+    assert verify_password(password, stored_user.hashed_password)
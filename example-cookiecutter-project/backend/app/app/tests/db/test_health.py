@@ -0,0 +1,71 @@
+import sqlite3
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from app.core.config import settings
+from app.db.health import PoolHealthCheck
+
+
+def test_health_check_replaces_killed_connections(tmp_path: Path) -> None:
+    path = tmp_path / "health.db"
+    opened: List[Any] = []
+    available = True
+
+    def connect() -> Any:
+        if not available:
+            raise sqlite3.OperationalError("unable to open database file")
+        opened.append(sqlite3.connect(path, check_same_thread=False))
+        return opened[-1]
+
+    engine = create_engine(
+        "sqlite://", creator=connect, poolclass=QueuePool, pool_size=2
+    )
+    health = PoolHealthCheck(engine, interval=60)
+    connections = [engine.connect() for _ in range(2)]
+    for connection in connections:
+        connection.close()
+    assert health.check() == 0
+
+    # The database goes away with its connections, and comes back later
+    for dbapi_connection in opened:
+        dbapi_connection.close()
+    available = False
+    with pytest.raises(OperationalError):
+        health.check()
+    available = True
+    assert health.check() == 0
+    assert health.stats()["health_check_disconnects"] == 1
+
+    # Requests get the connections the check reopened
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT 1").scalar() == 1
+    assert len(opened) == 4
+
+
+def test_health_check_replaces_terminated_backends(db: Session) -> None:
+    engine = create_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI),
+        pool_size=2,
+        connect_args={"application_name": "health-check-test"},
+    )
+    health = PoolHealthCheck(engine, interval=60)
+    connections = [engine.connect() for _ in range(2)]
+    for connection in connections:
+        connection.close()
+    with db.get_bind().connect() as admin:
+        admin.execute(
+            text(
+                "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+                "WHERE application_name = 'health-check-test'"
+            )
+        )
+    assert health.check() == 1
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT 1").scalar() == 1
+    engine.dispose()
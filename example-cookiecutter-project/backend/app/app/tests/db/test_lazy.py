@@ -0,0 +1,70 @@
+import asyncio
+from typing import List, cast
+
+from fastapi import APIRouter, BackgroundTasks, Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from app.api import deps
+from app.db.lazy import AsyncLazySession, LazySession
+from app.db.session import engine
+
+
+def test_session_is_opened_on_first_use() -> None:
+    engine = create_engine("sqlite://")
+    opened: List[Session] = []
+
+    def factory() -> Session:
+        opened.append(Session(engine))
+        return opened[-1]
+
+    db = LazySession(factory)
+    assert not db.opened
+    db.close()
+    assert opened == []
+    assert db.execute(text("SELECT 1")).scalar() == 1
+    assert db.execute(text("SELECT 2")).scalar() == 2
+    assert db.opened and len(opened) == 1
+    db.close()
+    assert not db.opened
+    assert db.execute(text("SELECT 3")).scalar() == 3
+    assert len(opened) == 2
+
+
+class FakeAsyncSession:
+    closed = False
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def test_async_session_is_closed_when_opened() -> None:
+    session = FakeAsyncSession()
+    db = AsyncLazySession(lambda: session)
+    asyncio.run(db.close())
+    assert not db.opened
+    assert db.closed is False
+    assert db.opened
+    asyncio.run(db.close())
+    assert session.closed
+    assert not db.opened
+
+
+def test_connection_is_released_before_background_tasks() -> None:
+    in_use: List[int] = []
+    router = APIRouter(route_class=deps.SessionReleasingRoute)
+
+    @router.get("/")
+    def query(tasks: BackgroundTasks, db: Session = Depends(deps.get_db)) -> int:
+        pool = cast(QueuePool, engine.pool)
+        tasks.add_task(lambda: in_use.append(pool.checkedout()))
+        in_use.append(pool.checkedout())
+        return db.execute(text("SELECT 1")).scalar_one()
+
+    app = FastAPI()
+    app.include_router(router)
+    assert TestClient(app).get("/").json() == 1
+    in_use_before, in_use_after = in_use
+    assert in_use_after == in_use_before
@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+from app.db.pool_metrics import PoolMetrics, timed_pool_class
+
+
+def test_pool_metrics_follow_checkouts() -> None:
+    metrics = PoolMetrics(buckets=(1.0,))
+    engine = create_engine(
+        "sqlite://",
+        poolclass=timed_pool_class(QueuePool, metrics),
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.01,
+    )
+    metrics.attach(engine)
+    first = engine.connect()
+    second = engine.connect()
+    assert metrics.stats()["in_use"] == 2
+    assert metrics.stats()["overflow"] == 1
+    with pytest.raises(TimeoutError):
+        engine.connect()
+    second.invalidate()
+    second.close()
+    first.close()
+    stats = metrics.stats()
+    assert stats["in_use"] == 0
+    assert stats["checkouts"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["connects"] == 2
+    assert stats["invalidations"] == 1
+    assert stats["max_in_use"] == 2
+    assert stats["max_overflow"] == 1
+    assert stats["wait_seconds_histogram"] == {"1.0": 2, "+Inf": 2}
+
+
+def test_pool_metrics_survive_dispose() -> None:
+    metrics = PoolMetrics()
+    engine = create_engine("sqlite://", poolclass=timed_pool_class(QueuePool, metrics))
+    metrics.attach(engine)
+    engine.dispose()
+    engine.connect().close()
+    assert metrics.stats()["checkouts"] == 1
+    assert metrics.stats()["connects"] == 1
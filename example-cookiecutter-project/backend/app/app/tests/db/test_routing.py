@@ -0,0 +1,91 @@
+import json
+import math
+from pathlib import Path
+from typing import List
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from app.db.routing import ReplicaRouter, RoutingSession, read_from_replica
+
+metadata = MetaData()
+notes = Table(
+    "note", metadata, Column("id", Integer, primary_key=True), Column("body", String)
+)
+
+
+def databases(tmp_path: Path, count: int) -> List[Engine]:
+    engines = []
+    for index in range(count):
+        engine = create_engine(
+            f"sqlite:///{tmp_path / f'{index}.db'}", poolclass=QueuePool
+        )
+        metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(notes.insert().values(body=f"database {index}"))
+        engines.append(engine)
+    return engines
+
+
+def read(db: RoutingSession) -> str:
+    return db.execute(select(notes.c.body)).scalar_one()
+
+
+def test_read_only_sessions_read_from_replica(tmp_path: Path) -> None:
+    primary, replica = databases(tmp_path, 2)
+    router = ReplicaRouter(primary, [replica])
+    db = RoutingSession(bind=primary, router=router)
+    assert read(db) == "database 0"
+    read_from_replica(db)
+    assert read(db) == "database 1"
+    db.execute(notes.update().values(body="written"))
+    # The write went to the primary, and so do the reads after it
+    assert read(db) == "written"
+    db.commit()
+    db.close()
+
+
+def test_replicas_take_turns(tmp_path: Path) -> None:
+    primary, *replicas = databases(tmp_path, 3)
+    router = ReplicaRouter(primary, replicas)
+    assert [router.pick() for _ in range(4)] == replicas * 2
+
+
+def test_least_connections(tmp_path: Path) -> None:
+    primary, *replicas = databases(tmp_path, 3)
+    router = ReplicaRouter(primary, replicas, balancing="least_connections")
+    with replicas[0].connect():
+        assert router.pick() is replicas[1]
+    assert router.pick() is replicas[0]
+
+
+def test_lagging_replicas_are_skipped(tmp_path: Path) -> None:
+    primary, *replicas = databases(tmp_path, 3)
+    router = ReplicaRouter(primary, replicas, max_lag=1.0)
+    router.lags[0] = 10.0
+    assert {router.pick() for _ in range(3)} == {replicas[1]}
+    router.lags[1] = math.inf
+    assert router.pick() is primary
+    router.check_lag()
+    assert router.lags == [0.0, 0.0]
+    assert router.stats()[1]["reads"] == 3
+
+
+def test_unreachable_replicas_report_no_lag(tmp_path: Path) -> None:
+    (primary,) = databases(tmp_path, 1)
+    unreachable = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    router = ReplicaRouter(primary, [unreachable])
+    router.check_lag()
+    assert router.pick() is primary
+    # The stats endpoint's JSON has no infinity
+    assert json.dumps(router.stats(), allow_nan=False)
+    assert router.stats()[0]["lag_seconds"] is None
+
+
+def test_shared_lags_match_the_replicas(tmp_path: Path) -> None:
+    primary, *replicas = databases(tmp_path, 3)
+    router = ReplicaRouter(primary, replicas)
+    with pytest.raises(ValueError):
+        ReplicaRouter(primary, replicas[:1], lags=router.lags)
@@ -1,8 +1,11 @@
 import random
 import string
-from typing import Dict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
 
 from fastapi.testclient import TestClient
+from sqlalchemy.event import listen, remove
+from sqlalchemy.orm import Session
 
 from app.core.config import settings
 
@@ -25,3 +28,23 @@ def get_superuser_token_headers(client: TestClient) -> Dict[str, str]:
     a_token = tokens["access_token"]
     headers = {"Authorization": f"Bearer {a_token}"}
     return headers
+
+
+@contextmanager
+def count_queries(db: Session) -> Iterator[List[str]]:
+    """
+    Collect the SQL statements sent through the session's engine.
+    """
+    statements: List[str] = []
+
+    def before_cursor_execute(
+        conn: Any, cursor: Any, statement: str, *args: Any
+    ) -> None:
+        statements.append(statement)
+
+    engine = db.get_bind()
+    listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        remove(engine, "before_cursor_execute", before_cursor_execute)
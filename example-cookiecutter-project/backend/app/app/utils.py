@@ -1,13 +1,13 @@
 import logging
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Sequence
 
 import emails
 from emails.template import JinjaTemplate
-from jose import jwt
 
 from app.core.config import settings
+from app.core.token_codec import TokenError, token_codec
 
 
 def send_email(
@@ -18,9 +18,9 @@ def send_email(
 ) -> None:
     assert settings.EMAILS_ENABLED, "no provided configuration for email variables"
     message = emails.Message(
-        subject=JinjaTemplate(subject_template),
-        html=JinjaTemplate(html_template),
-        mail_from=(settings.EMAILS_FROM_NAME, settings.EMAILS_FROM_EMAIL),
+        subject=JinjaTemplate(subject_template),  # type: ignore
+        html=JinjaTemplate(html_template),  # type: ignore
+        mail_from=(settings.EMAILS_FROM_NAME, str(settings.EMAILS_FROM_EMAIL)),
     )
     smtp_options = {"host": settings.SMTP_HOST, "port": settings.SMTP_PORT}
     if settings.SMTP_TLS:
@@ -87,20 +87,35 @@ def send_new_account_email(email_to: str, username: str, password: str) -> None:
     )
 
 
+def send_new_account_emails(users_in: Sequence[Any]) -> None:
+    """
+    Send the new account email to each of `users_in`, going on past failures.
+    """
+    for user_in in users_in:
+        try:
+            send_new_account_email(
+                email_to=user_in.email,
+                username=user_in.email,
+                password=user_in.password,
+            )
+        except Exception:
+            logging.exception(
+                f"Could not send the new account email to {user_in.email}"
+            )
+
+
 def generate_password_reset_token(email: str) -> str:
     delta = timedelta(hours=settings.EMAIL_RESET_TOKEN_EXPIRE_HOURS)
     now = datetime.utcnow()
     expires = now + delta
     exp = expires.timestamp()
-    encoded_jwt = jwt.encode(
-        {"exp": exp, "nbf": now, "sub": email}, settings.SECRET_KEY, algorithm="HS256",
-    )
+    encoded_jwt = token_codec.encode({"exp": exp, "nbf": now, "sub": email})
     return encoded_jwt
 
 
 def verify_password_reset_token(token: str) -> Optional[str]:
     try:
-        decoded_token = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        return decoded_token["email"]
-    except jwt.JWTError:
+        decoded_token = token_codec.decode(token)
+        return decoded_token["sub"]
+    except TokenError:
         return None